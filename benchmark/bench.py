@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+離線效能基準測試
+
+以 benchmark/fixtures/ 的時間表頁面量測解析、合併、CSV 輸出，並啟動本機假站台
+（benchmark/fake_site.py）與 API 服務，量測 N 個並行用戶端呼叫 /run 的延遲與吞吐量；
+結果可存為基準 JSON，之後的執行會與基準比較，慢於門檻即以非零狀態結束；
+執行前先以 tool/check_dom_extract.py 的離線比對確認 EXTRACT_MODE=js 與 extract_meeting_info()
+在 fixtures 上結果一致，不一致時同樣以非零狀態結束
+
+使用方式:
+1. 執行全部測試: python benchmark/bench.py
+2. 只測解析與合併: python benchmark/bench.py --suite parser merge
+3. 儲存基準: python benchmark/bench.py --save benchmark/baseline.json
+4. 與基準比較（預設讀取 benchmark/baseline.json）: python benchmark/bench.py --compare benchmark/baseline.json
+5. 指定並行用戶端數: python benchmark/bench.py --suite e2e --clients 1 4 8 --requests 10
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark.fake_site import FIXTURE_DATE, FIXTURES_DIR, create_fake_site, load_fixtures  # noqa: E402
+from tool.check_dom_extract import check_offline, expand_paths  # noqa: E402
+from utils.convert_to_csv import render_csv  # noqa: E402
+from utils.extract_meeting_info import extract_meeting_info  # noqa: E402
+from utils.pipeline import collect, merge, page_sort_key, parse  # noqa: E402
+
+SUITES = ('parser', 'merge', 'csv', 'e2e')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# 合併與 CSV 測試模擬的資料量：所有建築物一天的上下午頁面
+BENCH_BUILDINGS = ('4', '6', '10', '12', '15', '19', '20', '22')
+
+
+def summarize(samples: List[float], **extra) -> dict:
+    """每次執行耗時（秒）的統計，欄位與 pytest-benchmark 相同"""
+    mean = statistics.fmean(samples)
+    return {
+        'min': min(samples),
+        'max': max(samples),
+        'mean': mean,
+        'median': statistics.median(samples),
+        'stddev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'rounds': len(samples),
+        'ops': 1 / mean if mean else 0.0,
+        **extra,
+    }
+
+
+def measure(func: Callable[[], object], rounds: int, min_time: float = 0.05) -> dict:
+    """
+    重複執行 func：先暖機並決定每輪的次數，使每輪至少 min_time 秒，再取每輪的平均單次耗時
+
+    Returns:
+        dict: summarize() 的統計，另含 iterations（每輪次數）
+    """
+    start = time.perf_counter()
+    func()
+    once = time.perf_counter() - start
+    iterations = max(1, int(min_time / once)) if once else 1000
+
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        samples.append((time.perf_counter() - start) / iterations)
+    return summarize(samples, iterations=iterations)
+
+
+def fixture_captures(buildings=BENCH_BUILDINGS):
+    """以 fixture 時間表建立多個建築物的 PageCapture（上下午各一頁）"""
+    pages = load_fixtures(FIXTURES_DIR)
+    captures = []
+    for building_id in buildings:
+        captures.extend(collect(building_id, building_id, FIXTURE_DATE, pages['MORNING'], pages['AFTERNOON']))
+    return sorted(captures, key=page_sort_key)
+
+
+def bench_parser(args) -> Dict[str, dict]:
+    pages = load_fixtures(FIXTURES_DIR)
+    timetables = [pages['MORNING'], pages['AFTERNOON']]
+    captures = fixture_captures(buildings=('6',))
+    return {
+        'parser/extract_meeting_info': measure(lambda: [extract_meeting_info(page) for page in timetables],
+                                               args.rounds),
+        'parser/pipeline_parse': measure(lambda: list(parse(captures)), args.rounds),
+    }
+
+
+def bench_merge(args) -> Dict[str, dict]:
+    parsed_pages = list(parse(fixture_captures()))
+    return {'merge/8_buildings': measure(lambda: merge(parsed_pages), args.rounds)}
+
+
+def bench_csv(args) -> Dict[str, dict]:
+    meetings = merge(list(parse(fixture_captures()))).meetings
+    return {'csv/render_8_buildings': measure(lambda: render_csv(meetings), args.rounds)}
+
+
+def start_server(app, host: str = '127.0.0.1'):
+    """在背景執行緒以多執行緒 WSGI 伺服器啟動 app，回傳 (伺服器, 網址)"""
+    from werkzeug.serving import make_server
+
+    server = make_server(host, 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, name=f'bench-{app.name}', daemon=True)
+    thread.start()
+    return server, f'http://{host}:{server.server_port}'
+
+
+def run_clients(url: str, body: dict, clients: int, requests_per_client: int) -> dict:
+    """
+    N 個用戶端各自依序送出 requests_per_client 次 /run，回傳延遲統計與吞吐量
+
+    Returns:
+        dict: summarize() 的延遲統計，另含 p95、throughput（請求/秒）、errors、clients
+    """
+    import requests
+
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def client():
+        nonlocal errors
+        with requests.Session() as http:
+            for _ in range(requests_per_client):
+                start = time.perf_counter()
+                try:
+                    ok = http.post(f'{url}/run', json=body, timeout=120).status_code == 200
+                except requests.RequestException:
+                    ok = False
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    errors += 0 if ok else 1
+
+    threads = [threading.Thread(target=client, name=f'bench-client-{n}') for n in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    return summarize(latencies, p95=ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                     throughput=len(latencies) / wall, errors=errors, clients=clients)
+
+
+def bench_e2e(args) -> Dict[str, dict]:
+    """
+    啟動假站台與 API 服務量測 /run（預設 HTTP 引擎；--engine selenium 需要本機 Chrome）：
+    cold 每次都略過快取重新爬取假站台，warm 全部命中結果快取（只量測 API 本身的開銷）
+    """
+    site = create_fake_site(args.site_latency)
+    site_server, site_url = start_server(site)
+
+    # API 在匯入時讀取設定，必須先指向假站台；不寫入歷史資料庫
+    os.environ.update(BOOKING_BASE_URL=site_url, BOOKING_USERNAME='benchmark',
+                      BOOKING_PASSWORD=os.getenv('FAKE_SITE_PASSWORD', 'benchmark'),
+                      HISTORY_DB_PATH='', PIPELINE_DEBUG_DIR='')
+    import booking_meeting_room_api as api
+
+    api_server, api_url = start_server(api.app)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    results = {}
+    try:
+        for mode, refresh in (('cold', True), ('warm', False)):
+            body = {'date': FIXTURE_DATE, 'buildings': args.buildings, 'engine': args.engine, 'refresh': refresh}
+            for clients in args.clients:
+                # API 的大量日誌會干擾計時與輸出，預設不顯示
+                with open(os.devnull, 'w') as devnull, \
+                        (contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)):
+                    run_clients(api_url, body, 1, 1)  # 暖機：登入 HTTP session、填入快取
+                    results[f'e2e/run_{mode}_c{clients}'] = run_clients(api_url, body, clients, args.requests)
+    finally:
+        api_server.shutdown()
+        site_server.shutdown()
+    return results
+
+
+RUNNERS = {
+    'parser': bench_parser,
+    'merge': bench_merge,
+    'csv': bench_csv,
+    'e2e': bench_e2e,
+}
+
+
+def format_seconds(value: float) -> str:
+    if value >= 1:
+        return f'{value:.2f} s'
+    if value >= 1e-3:
+        return f'{value * 1e3:.2f} ms'
+    return f'{value * 1e6:.1f} µs'
+
+
+def print_results(results: Dict[str, dict]) -> None:
+    # 中文標題佔兩格寬，欄寬扣除字數以對齊
+    print(f"{'名稱':<32} {'最小':>8} {'中位數':>7} {'平均':>8} {'標準差':>7} {'次/秒':>8}")
+    for name, stats in results.items():
+        line = (f"{name:<34} {format_seconds(stats['min']):>10} {format_seconds(stats['median']):>10} "
+                f"{format_seconds(stats['mean']):>10} {format_seconds(stats['stddev']):>10} {stats['ops']:>10.1f}")
+        if 'throughput' in stats:
+            line += f"  p95 {format_seconds(stats['p95'])}，吞吐量 {stats['throughput']:.1f} 請求/秒"
+            if stats['errors']:
+                line += f"，失敗 {stats['errors']} 次"
+        print(line)
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """
+    以中位數與基準比較，e2e 另比較吞吐量
+
+    Returns:
+        List[str]: 慢於門檻的測試名稱
+    """
+    regressions = []
+    print(f"📏 與基準比較（門檻 {threshold:.0%}）：")
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"   🆕 {name}: 基準中沒有此項")
+            continue
+        ratio = stats['median'] / base['median'] if base['median'] else 1.0
+        slower = ratio > 1 + threshold
+        if 'throughput' in stats and base.get('throughput'):
+            slower = slower or stats['throughput'] < base['throughput'] * (1 - threshold)
+        mark = '🔺' if slower else ('🟢' if ratio < 1 - threshold else '⚪')
+        line = f"   {mark} {name}: {format_seconds(base['median'])} -> {format_seconds(stats['median'])}（{ratio - 1:+.1%}）"
+        if 'throughput' in stats and base.get('throughput'):
+            line += f"，吞吐量 {base['throughput']:.1f} -> {stats['throughput']:.1f} 請求/秒"
+        print(line)
+        if slower:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='以 fixture 與本機假站台量測解析、合併、CSV 與 /run 的效能')
+    parser.add_argument('--suite', nargs='+', choices=SUITES, default=list(SUITES), help='要執行的測試（預設全部）')
+    parser.add_argument('--rounds', type=int, default=10, help='微基準的輪數（預設 10）')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4], help='e2e 並行用戶端數（預設 1 4）')
+    parser.add_argument('--requests', type=int, default=10, help='e2e 每個用戶端的請求數（預設 10）')
+    parser.add_argument('--buildings', nargs='+', default=['6', '12'], help='e2e 每次 /run 查詢的建築物')
+    parser.add_argument('--engine', choices=['http', 'selenium'], default='http', help='e2e 使用的查詢引擎（預設 http）')
+    parser.add_argument('--site-latency', type=float, default=0.0, help='假站台每個請求的延遲秒數（預設 0）')
+    parser.add_argument('--save', metavar='PATH', help='將結果存為基準 JSON')
+    parser.add_argument('--compare', metavar='PATH', help=f'與基準 JSON 比較（預設 {DEFAULT_BASELINE}，存在時才比較）')
+    parser.add_argument('--threshold', type=float, default=0.15, help='中位數慢於基準多少比例視為退步（預設 0.15）')
+    parser.add_argument('--verbose', action='store_true', help='e2e 時顯示 API 日誌')
+    args = parser.parse_args()
+
+    print("🚀 執行瀏覽器內擷取一致性檢查 ...")
+    if check_offline(expand_paths([FIXTURES_DIR])):
+        print("❌ EXTRACT_MODE=js 與 extract_meeting_info() 在 fixtures 上的結果不一致")
+        sys.exit(1)
+
+    results: Dict[str, dict] = {}
+    for suite in args.suite:
+        print(f"🚀 執行 {suite} ...")
+        results.update(RUNNERS[suite](args))
+    print_results(results)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                            'cpus': os.cpu_count()},
+                'results': results,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"💾 基準已儲存：{args.save}")
+
+    baseline_path = args.compare or (DEFAULT_BASELINE if os.path.exists(DEFAULT_BASELINE) and not args.save else None)
+    if baseline_path:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} 項慢於基準：{', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ 沒有慢於基準的項目")
+
+
+if __name__ == '__main__':
+    main()
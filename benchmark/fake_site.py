@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本機假預約站台
+
+以 benchmark/fixtures/ 中依 mrm101w 頁面結構建立的合成頁面（登入、上午 / 下午時間表、預訂表單，
+並非實際擷取的頁面）模擬預約系統，讓 HTTP 引擎與 Selenium 都能離線查詢與預訂；
+時間表頁面依表單送出的日期、建築物與時段替換後回傳
+
+使用方式:
+1. 啟動站台: python benchmark/fake_site.py --port 5055
+2. 模擬網路延遲: python benchmark/fake_site.py --port 5055 --latency 0.2
+3. API 改查假站台: BOOKING_BASE_URL=http://127.0.0.1:5055 python booking_meeting_room_api.py
+   （帳號任意，密碼為 FAKE_SITE_PASSWORD，預設 benchmark）
+"""
+
+import argparse
+import os
+import threading
+import time
+
+from flask import Flask, redirect, request, session
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# 時間表 fixture 擷取時的日期與建築物，回傳前替換為查詢的值
+FIXTURE_DATE = '2025/07/10'
+FIXTURE_BUILDING = '6'
+
+INDEX_PATH = '/frontend/mrm101w/index'
+
+
+def load_fixtures(fixtures_dir: str = FIXTURES_DIR) -> dict:
+    """讀取所有 fixture 頁面：login、MORNING、AFTERNOON、booking_form"""
+    names = {
+        'login': 'login.html',
+        'MORNING': 'timetable_morning.html',
+        'AFTERNOON': 'timetable_afternoon.html',
+        'booking_form': 'booking_form.html',
+    }
+    pages = {}
+    for key, filename in names.items():
+        with open(os.path.join(fixtures_dir, filename), 'r', encoding='utf-8') as f:
+            pages[key] = f.read()
+    return pages
+
+
+def render_timetable(template: str, date: str, building_id: str) -> str:
+    """將時間表 fixture 的日期與選取的建築物換成查詢值"""
+    page = template.replace(f'value="{FIXTURE_DATE}"', f'value="{date}"')
+    if building_id != FIXTURE_BUILDING:
+        page = page.replace(f'<option value="{FIXTURE_BUILDING}" selected>', f'<option value="{FIXTURE_BUILDING}">')
+        page = page.replace(f'<option value="{building_id}">', f'<option value="{building_id}" selected>')
+    return page
+
+
+def create_fake_site(latency: float = 0.0, password: str = None, fixtures_dir: str = FIXTURES_DIR) -> Flask:
+    """
+    建立假站台
+
+    Args:
+        latency (float): 每個請求額外等待的秒數（模擬實際站台的回應時間）
+        password (str): 登入密碼，預設為環境變數 FAKE_SITE_PASSWORD 或 benchmark
+        fixtures_dir (str): fixture 目錄
+
+    Returns:
+        Flask: 站台 app；app.config['BOOKINGS'] 保存收到的預訂，app.config['REQUESTS'] 為請求數
+    """
+    pages = load_fixtures(fixtures_dir)
+    password = password or os.getenv('FAKE_SITE_PASSWORD', 'benchmark')
+    counter_lock = threading.Lock()
+
+    site = Flask(__name__)
+    site.secret_key = 'fake-booking-site'
+    site.config['BOOKINGS'] = []
+    site.config['REQUESTS'] = 0
+
+    @site.before_request
+    def simulate_latency():
+        with counter_lock:
+            site.config['REQUESTS'] += 1
+        if latency > 0:
+            time.sleep(latency)
+
+    @site.route(INDEX_PATH)
+    def index():
+        if not session.get('user'):
+            return pages['login']
+        return render_timetable(pages[session.get('period', 'MORNING')], session.get('date', FIXTURE_DATE),
+                                session.get('building', FIXTURE_BUILDING))
+
+    @site.route('/frontend/login', methods=['POST'])
+    def login():
+        if request.form.get('KEY') == password and request.form.get('username'):
+            session['user'] = request.form['username']
+        return redirect(INDEX_PATH)
+
+    @site.route('/frontend/mrm101w/search', methods=['POST'])
+    def search():
+        if not session.get('user'):
+            return pages['login']
+        period = request.form.get('selectedTimePeriod') or session.get('period', 'MORNING')
+        session['period'] = period if period in ('MORNING', 'AFTERNOON') else 'MORNING'
+        session['date'] = request.form.get('startDate') or FIXTURE_DATE
+        session['building'] = request.form.get('searchBeanBuildingPK') or FIXTURE_BUILDING
+        return render_timetable(pages[session['period']], session['date'], session['building'])
+
+    @site.route('/frontend/mrm101w3/index')
+    def booking_form():
+        if not session.get('user'):
+            return pages['login']
+        return pages['booking_form']
+
+    @site.route('/frontend/mrm101w3/book', methods=['POST'])
+    def book():
+        if not session.get('user'):
+            return pages['login']
+        site.config['BOOKINGS'].append(dict(request.form, date=session.get('date'),
+                                            building=session.get('building')))
+        return redirect(INDEX_PATH)
+
+    return site
+
+
+def main():
+    parser = argparse.ArgumentParser(description='以 fixture 頁面模擬預約系統的本機站台')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--latency', type=float, default=0.0, help='每個請求額外等待的秒數')
+    args = parser.parse_args()
+
+    print(f"🧪 假預約站台 http://{args.host}:{args.port}{INDEX_PATH} - 延遲 {args.latency:.2f} 秒")
+    create_fake_site(args.latency).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,32 @@
-from flask import Flask, request, jsonify, Response
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+from flask import Flask, request, jsonify, Response, g, stream_with_context
+import atexit
+import csv
+import io
+import json
 import time
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import groupby
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select
-from utils.convert_to_csv import process_files, write_output, write_output_csv
-from utils.extract_meeting_info import process_html_file
+from utils.availability import AvailabilityIndex
+from utils.buildings import BUILDING_CONFIG
+from utils.chrome_lifecycle import ChromeLifecycle
+from utils.chromedriver import resolve_chromedriver
+from utils.concurrency import RouteLimiter
+from utils.dom_extract import extract_meetings_in_page, resolve_extract_mode
+from utils.driver_pool import DriverPool, DriverPoolTimeout, booking_index_url
+from utils.history_store import HISTORY_FIELDS, ORGANIZER_MATCH_MODES, HistoryStore
+from utils.http_engine import HttpSessionPool, resolve_engine
+from utils.job_queue import JOB_DONE, JobQueue, JobQueueFull
+from utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricFamily, get_metrics, inc, observe, span
+from utils.pipeline import CSV_FIELDNAMES, collect, page_sort_key, parse, render_csv, run_pipeline
+from utils.records import format_minutes, to_minutes
+from utils.result_cache import ResultCache, cache_status, normalize_date
+from utils.room_index import RoomIndex, UnknownRoomError
+from utils.waits import PageWaiter, StepTimer, is_timetable_page
 import os
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -17,17 +37,28 @@ load_dotenv()
 
 app = Flask(__name__)
 
-# 建築物配置
-BUILDING_CONFIG = {
-    '4': '仁愛大樓',
-    '6': '松仁大樓',
-    '10': '國泰證券總公司',
-    '12': '瑞湖大樓',
-    '15': '信義安和大樓',
-    '19': '台中忠明大樓',
-    '20': 'A3置地廣場',
-    '22': '高雄資訊開發中心'
-}
+# 已登入瀏覽器連線池（首次使用時建立）
+_driver_pool = None
+_driver_pool_lock = threading.Lock()
+# 瀏覽器行程的記憶體 / 借用時間上限與孤兒行程回收（create_app 時啟動背景掃描）
+_chrome_lifecycle = ChromeLifecycle.from_env()
+# 無瀏覽器 HTTP 查詢 session 池（首次使用時建立）
+_http_pool = None
+# (建築物, 日期) 查詢結果快取
+_result_cache = ResultCache.from_env()
+# 歷史會議記錄資料庫（設定 HISTORY_DB_PATH 時啟用，查詢結果會自動匯入）
+_history_store = HistoryStore.from_env(BUILDING_CONFIG)
+# /jobs 背景查詢工作佇列
+_job_queue = JobQueue.from_env()
+# 切換時段與送出表單時的等待設定
+_page_waiter = PageWaiter.from_env()
+# 各建築物的會議室預訂按鈕索引（取代寫死的 XPath）
+_room_index = RoomIndex.from_env()
+# 爬蟲與預訂路由的並行上限（依瀏覽器連線池大小），額滿時回應 429
+_route_limiter = RouteLimiter.from_env(int(os.getenv('DRIVER_POOL_SIZE', '2')))
+_shutdown_lock = threading.Lock()
+_shutdown_done = False
+
 
 # 根路徑 - API 服務狀態
 @app.route('/', methods=['GET'])
@@ -40,9 +71,16 @@ def home():
         'endpoints': {
             'GET /': 'Service status check',
             'GET /health': 'Health check',
+            'GET /metrics': 'Prometheus metrics (stage timings, pool / cache hits, errors)',
             'GET /buildings': 'Get available buildings list',
             'POST /run': 'Query meeting room availability',
-            'POST /book': 'Book meeting room'
+            'POST /run/range': 'Query a date range in one session (streamed CSV)',
+            'POST /jobs': 'Queue a /run query and return a job id',
+            'GET /jobs/<id>': 'Job status and CSV result',
+            'GET /history': 'Query stored meeting history (room, from, to)',
+            'GET /free-slots': 'Free rooms and slots for a building/date/time window',
+            'POST /book': 'Book meeting room',
+            'POST /book/batch': 'Book many slots grouped by building/date'
         },
         'available_buildings': BUILDING_CONFIG
     })
@@ -50,129 +88,486 @@ def home():
 # 健康檢查端點
 @app.route('/health', methods=['GET'])
 def health_check():
-    """健康檢查端點"""
+    """健康檢查端點；關閉服務期間回應 503，讓負載平衡器不再導入流量"""
+    draining = _route_limiter.draining
     return jsonify({
-        'status': 'healthy',
+        'status': 'draining' if draining else 'healthy',
         'timestamp': time.time(),
-        'service': 'booking-api'
-    })
+        'service': 'booking-api',
+        'driver_pool': _driver_pool.stats() if _driver_pool else None,
+        'chrome': _chrome_lifecycle.stats(),
+        'result_cache': _result_cache.stats(),
+        'jobs': _job_queue.stats(),
+        'room_index': _room_index.stats(),
+        'limits': _route_limiter.stats(),
+        'stages': get_metrics().stage_summary()
+    }), 503 if draining else 200
 
-# API 路由：根據提供的登入資訊和日期，進行會議室查詢
-@app.route('/run', methods=['POST'])
-def run_booking():
-    # 開始計時
-    start_time = time.time()
-    print(f"🕐 開始執行會議室查詢 - {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time))}")
-    
-    data = request.json
 
-    username = os.getenv('BOOKING_USERNAME')
-    password = os.getenv('BOOKING_PASSWORD')
-    print(f"使用帳號: {username}")
-    current_date = data.get('date', '2025/07/10')
+get_metrics().describe('http_request_duration_seconds', 'Time spent handling a request, by route')
+get_metrics().describe('http_requests_total', 'Requests by route, method and status code')
+get_metrics().describe('errors_total', 'Crawl failures that do not raise, by kind')
+get_metrics().describe('rejected_total', 'Requests rejected by the per-route concurrency limit or during shutdown')
 
-    # 取得要查詢的建築物列表，如果沒有指定則使用預設值
-    default_buildings = data.get('default_buildings', ['6'])  # A3置地廣場
-    buildings = data.get('buildings', default_buildings)
-    if isinstance(buildings, str):
-        buildings = [buildings]  # 如果是單個字串，轉換為列表
 
-    print(f"要查詢的建築物: {[BUILDING_CONFIG.get(b, f'未知建築物({b})') for b in buildings]}")
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
 
-    if not username or not password:
-        return jsonify({'error': '環境變數中缺少帳號或密碼'}), 500
-    
-    # Selenium 驅動程式設置 - 優化啟動速度並自動管理 ChromeDriver
-    selenium_start_time = time.time()
-    print(f"🚀 啟動瀏覽器 - {time.strftime('%H:%M:%S', time.localtime(selenium_start_time))}")
-    
-    options = webdriver.ChromeOptions()
-    options.add_experimental_option("detach", True)
-    # Chrome 瀏覽器路徑 (macOS)
-    # options.binary_location = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
-    # ubuntu
-    options.binary_location = "/usr/bin/google-chrome"
-    # 效能優化選項
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--disable-gpu')
-    options.add_argument('--disable-extensions')
-    options.add_argument('--disable-images')  # 不載入圖片，節省時間
-    options.add_argument('--disable-logging')
-    options.add_argument('--disable-notifications')
-    options.add_experimental_option('useAutomationExtension', False)
-    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+
+@app.before_request
+def enforce_route_limit():
+    """爬蟲與預訂路由超過並行上限時回應 429 與 Retry-After；關閉服務期間回應 503"""
+    route = request.url_rule.rule if request.url_rule else None
+    if route is None or _route_limiter.acquire(route):
+        g.limited_route = route
+        return None
+    retry_after = _route_limiter.retry_after(route)
+    if _route_limiter.draining:
+        inc('rejected_total', endpoint=route, reason='shutdown')
+        response = jsonify({'error': '服務即將關閉，請稍後再試'})
+        response.status_code = 503
+    else:
+        inc('rejected_total', endpoint=route, reason='limit')
+        print(f"🚦 {route} 同時處理的請求已達上限 {_route_limiter.limits[route]}，請 {retry_after} 秒後重試")
+        response = jsonify({'error': f'請求過多，請於 {retry_after} 秒後再試', 'retry_after': retry_after})
+        response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+@app.teardown_request
+def release_route_limit(error=None):
+    """請求結束（串流回應為輸出完畢）後歸還名額"""
+    route = g.pop('limited_route', None)
+    if route is not None:
+        started = g.get('request_start')
+        _route_limiter.release(route, time.perf_counter() - started if started is not None else None)
+
+
+@app.after_request
+def record_request_metrics(response):
+    """記錄每個路由的回應時間與狀態碼（串流回應只計到開始輸出為止）"""
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    started = g.get('request_start')
+    if started is not None:
+        observe('http_request_duration_seconds', time.perf_counter() - started, endpoint=endpoint)
+    inc('http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
+
+def collect_component_metrics():
+    """
+    將連線池、快取、工作佇列與會議室索引的統計轉為 /metrics 的指標
     
-    # 使用 webdriver-manager 自動管理 ChromeDriver
-    try:
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
-        print("✅ ChromeDriver 初始化成功")
-    except Exception as e:
-        print(f"❌ ChromeDriver 初始化失敗: {e}")
-        return jsonify({'error': f'瀏覽器驅動程式初始化失敗: {e}'}), 500
+    Returns:
+        List[MetricFamily]: 尚未建立的元件（例如還沒借用過的瀏覽器連線池）不輸出樣本
+    """
+    families = []
+    pool = _driver_pool.stats() if _driver_pool else None
+    if pool:
+        families += [
+            MetricFamily('driver_pool_checkouts_total', 'counter', 'Driver pool checkouts by warm (hit) or new browser (miss)',
+                         [({'result': 'hit'}, pool['hits']), ({'result': 'miss'}, pool['misses'])]),
+            MetricFamily('driver_pool_recycled_total', 'counter', 'Browsers discarded by the pool',
+                         [({}, pool['recycled'])]),
+            MetricFamily('driver_pool_browsers', 'gauge', 'Browsers in the pool by state',
+                         [({'state': 'live'}, pool['live']), ({'state': 'idle'}, pool['idle'])]),
+            MetricFamily('driver_pool_size', 'gauge', 'Maximum browsers in the pool', [({}, pool['size'])]),
+        ]
+
+    chrome = _chrome_lifecycle.stats()
+    if chrome['supported']:
+        families += [
+            MetricFamily('chrome_processes', 'gauge', 'chrome / chromedriver processes seen by the last reaper scan',
+                         [({'state': 'live'}, chrome['live_processes']), ({'state': 'leaked'}, chrome['leaked_processes'])]),
+            MetricFamily('chrome_sessions', 'gauge', 'Browsers registered with the lifecycle manager',
+                         [({}, chrome['sessions'])]),
+            MetricFamily('chrome_memory_bytes', 'gauge', 'Resident memory of all registered browser process trees',
+                         [({}, chrome['memory_mb'] * 1024 * 1024)]),
+            MetricFamily('chrome_reaped_total', 'counter', 'Leaked or orphaned chrome / chromedriver processes killed',
+                         [({}, chrome['reaped'])]),
+            MetricFamily('chrome_sessions_killed_total', 'counter', 'Checked-out browsers killed for exceeding a limit',
+                         [({'reason': reason}, count) for reason, count in chrome['killed'].items()]),
+        ]
+
+    cache = _result_cache.stats()
+    families += [
+        MetricFamily('result_cache_lookups_total', 'counter', 'Result cache lookups by outcome',
+                     [({'result': 'hit'}, cache['hits']), ({'result': 'miss'}, cache['misses'])]),
+        MetricFamily('result_cache_invalidations_total', 'counter', 'Result cache entries invalidated by bookings',
+                     [({}, cache['invalidations'])]),
+        MetricFamily('result_cache_entries', 'gauge', 'Entries currently in the result cache', [({}, cache['entries'])]),
+    ]
+
+    jobs = _job_queue.stats()
+    families += [
+        MetricFamily('jobs_submitted_total', 'counter', 'Jobs submitted to /jobs', [({}, jobs['submitted'])]),
+        MetricFamily('jobs_deduplicated_total', 'counter', 'Jobs answered by an identical in-flight job',
+                     [({}, jobs['deduplicated'])]),
+        MetricFamily('jobs', 'gauge', 'Jobs by state',
+                     [({'state': 'queued'}, jobs['queued']), ({'state': 'running'}, jobs['running'])]),
+    ]
+
+    rooms = _room_index.stats()
+    limits = _route_limiter.stats()
+    families += [
+        MetricFamily('route_active_requests', 'gauge', 'Requests in progress on concurrency-limited routes',
+                     [({'endpoint': route}, info['active']) for route, info in limits['routes'].items()]),
+        MetricFamily('route_concurrency_limit', 'gauge', 'Concurrency limit per route',
+                     [({'endpoint': route}, info['limit']) for route, info in limits['routes'].items()]),
+    ]
+
+    families += [
+        MetricFamily('room_index_lookups_total', 'counter', 'Room index lookups by cached (hit) or re-read (refresh)',
+                     [({'result': 'hit'}, rooms['hits']), ({'result': 'refresh'}, rooms['refreshes'])]),
+    ]
+    return families
+
+
+# Prometheus 指標端點
+@app.route('/metrics', methods=['GET'])
+def get_metrics_text():
+    """各階段耗時直方圖、錯誤計數，以及連線池 / 快取的命中統計（Prometheus 文字格式）"""
+    return Response(get_metrics().render(collect_component_metrics()), content_type=METRICS_CONTENT_TYPE)
+
+
+class CrawlError(Exception):
+    """爬蟲流程中無法繼續的錯誤，訊息會直接回傳給 API 呼叫端"""
+
+
+def get_driver_pool():
+    """取得（必要時建立）全域的已登入瀏覽器連線池"""
+    global _driver_pool
+    with _driver_pool_lock:
+        if _driver_pool is None:
+            _driver_pool = DriverPool.from_env(os.getenv('BOOKING_USERNAME'), os.getenv('BOOKING_PASSWORD'),
+                                               lifecycle=_chrome_lifecycle)
+            _driver_pool.start_health_probe(float(os.getenv('DRIVER_PROBE_INTERVAL', '60')))
+            print(f"🏊 瀏覽器連線池已建立 - 大小 {_driver_pool.size}")
+        return _driver_pool
+
+
+def get_http_pool():
+    """取得（必要時建立）全域的 HTTP 查詢 session 池"""
+    global _http_pool
+    with _driver_pool_lock:
+        if _http_pool is None:
+            _http_pool = HttpSessionPool(os.getenv('BOOKING_USERNAME'), os.getenv('BOOKING_PASSWORD'),
+                                         size=int(os.getenv('HTTP_POOL_SIZE', '4')),
+                                         checkout_timeout=float(os.getenv('HTTP_CHECKOUT_TIMEOUT', '30')))
+        return _http_pool
+
+
+def set_query_date(driver, start_date, end_date=None):
+    """一次性設置查詢頁的開始與結束日期，避免重複定位元素"""
+    start_date_input = driver.find_element(By.ID, 'startDate')
+    end_date_input = driver.find_element(By.ID, 'endDate')
+
+    # 批量執行JavaScript，減少往返次數
+    driver.execute_script("""
+        var startInput = arguments[0];
+        var endInput = arguments[1];
+        
+        startInput.value = arguments[2];
+        endInput.value = arguments[3];
+        
+        var event = new Event('change', { bubbles: true });
+        startInput.dispatchEvent(event);
+        endInput.dispatchEvent(event);
+    """, start_date_input, end_date_input, start_date, end_date or start_date)
+
+
+
+def snapshot_page(driver):
+    """
+    取得目前時段的資料
     
-    driver.get('https://booking.cathayholdings.com/frontend/mrm101w/index?')
-    # 登入
-    driver.implicitly_wait(3)  # 進一步減少隱式等待時間
+    Returns:
+        html 模式為 page_source；js 模式（EXTRACT_MODE=js）為瀏覽器內擷取的 ExtractedPage（會議記錄與會議室列表），
+        頁面沒有時間表時為 None
+    """
+    with span('page_fetch'):
+        if resolve_extract_mode() == 'js':
+            return extract_meetings_in_page(driver)
+        return driver.page_source
+
+
+def page_complete(page_data):
+    """snapshot_page() 的結果是否包含時間表"""
+    if isinstance(page_data, str):
+        return is_timetable_page(page_data)
+    return page_data is not None
+
+
+def select_building(driver, select, building_id):
+    """
+    在建築物下拉選單選擇建築物，並等待舊建築物的時間表被替換、新時間表穩定
+
+    已是目前選擇的建築物時不會觸發表單送出，只等待頁面穩定
+
+    Returns:
+        bool: 時間表是否在時限內更新
+    """
+    if select.first_selected_option.get_attribute('value') == building_id:
+        return _page_waiter.settled(driver)
+    return _page_waiter.replaced(driver, lambda: select.select_by_value(building_id))
+
+
+def click_period(driver, period):
+    """點擊 MORNING / AFTERNOON 時段按鈕"""
+    driver.execute_script("""
+        let btn = document.querySelector('button[name="selectedTimePeriod"][value="' + arguments[0] + '"]');
+        if (btn) btn.click();
+    """, period)
+
+
+def switch_period(driver, period, timer, required=True):
+    """
+    切換時段並等待時間表更新
     
-    # 使用顯式等待確保登入元素載入
-    email = WebDriverWait(driver, 10).until(
-        EC.presence_of_element_located((By.NAME, 'username'))
-    )
-    email.send_keys(username)
-    password_field = driver.find_element(By.ID, 'KEY')
-    password_field.send_keys(password)
+    Args:
+        driver: Chrome WebDriver
+        period (str): MORNING 或 AFTERNOON
+        timer (StepTimer): 記錄步驟耗時
+        required (bool): 為 True 時，時間表在時限內沒有更新視為失敗並回傳 None
+        
+    Returns:
+        切換後的 snapshot_page() 結果，失敗時為 None
+    """
+    with timer.step(f'switch_{period.lower()}'), span('period_switch'):
+        changed = _page_waiter.after(driver, lambda: click_period(driver, period))
+    if not changed:
+        print(f"⚠️ 切換到 {period} 後 {_page_waiter.timeout:.0f} 秒內時間表沒有更新")
+        if required:
+            return None
+    return snapshot_page(driver)
+
 
-    # 點擊登入按鈕
-    login_button = driver.find_element(By.ID, 'btnLogin')
-    login_button.click()
+def collect_building_pages(driver, building_name):
+    """
+    智能收集單一建築物上午與下午的頁面原始碼
     
-    login_start_time = time.time()
-    print(f"🔐 執行登入 - {time.strftime('%H:%M:%S', time.localtime(login_start_time))}")
+    先判斷目前頁面所在時段再切換到另一個時段，必要時改用備用方法依序收集；
+    切換後等待時間表實際更新，不使用固定秒數
+    
+    Args:
+        driver: 已選好日期與建築物的 Chrome WebDriver
+        building_name (str): 建築物名稱（僅用於日誌）
+        
+    Returns:
+        Tuple: (上午, 下午) 的 snapshot_page() 結果，收集失敗時為 None
+    """
+    building_morning_data = None
+    building_afternoon_data = None
+    timer = StepTimer(building_name)
     
-    # 等待登入完成並檢查是否成功
-    try:
-        # 等待頁面元素出現，確認登入成功
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, 'startDate'))
-        )
-        # 移除不必要的sleep，依賴顯式等待即可
-        login_end_time = time.time()
-        print(f"✅ 登入成功 - 耗時 {login_end_time - login_start_time:.2f} 秒")
-    except Exception as e:
-        print(f"登入可能失敗或頁面載入超時: {e}")
-        driver.quit()
-        return jsonify({'error': '登入失敗或頁面載入超時'}), 500
-
-    # 一次性設置日期，避免重複定位元素
     try:
-        start_date_input = driver.find_element(By.ID, 'startDate')
-        end_date_input = driver.find_element(By.ID, 'endDate')
-
-        # 批量執行JavaScript，減少往返次數
-        driver.execute_script("""
-            var startInput = arguments[0];
-            var endInput = arguments[1];
-            var dateValue = arguments[2];
+        print(f"⚡ 智能收集 {building_name} 上下午數據...")
+        
+        # 檢測當前頁面是上午還是下午時段 - 改進檢測邏輯
+        current_period = driver.execute_script("""
+            let morningBtn = document.querySelector('button[name="selectedTimePeriod"][value="MORNING"]');
+            let afternoonBtn = document.querySelector('button[name="selectedTimePeriod"][value="AFTERNOON"]');
+            
+            // 方法1: 檢查按鈕的 class 屬性
+            if (morningBtn && (morningBtn.classList.contains('active') || morningBtn.classList.contains('selected') || morningBtn.classList.contains('btn-primary'))) {
+                return 'MORNING';
+            }
+            if (afternoonBtn && (afternoonBtn.classList.contains('active') || afternoonBtn.classList.contains('selected') || afternoonBtn.classList.contains('btn-primary'))) {
+                return 'AFTERNOON';
+            }
+            
+            // 方法2: 檢查按鈕的 style 屬性
+            if (morningBtn && morningBtn.style.backgroundColor && morningBtn.style.backgroundColor !== 'transparent') {
+                return 'MORNING';
+            }
+            if (afternoonBtn && afternoonBtn.style.backgroundColor && afternoonBtn.style.backgroundColor !== 'transparent') {
+                return 'AFTERNOON';
+            }
+            
+            // 方法3: 檢查 aria-pressed 或 data-* 屬性
+            if (morningBtn && (morningBtn.getAttribute('aria-pressed') === 'true' || morningBtn.dataset.selected === 'true')) {
+                return 'MORNING';
+            }
+            if (afternoonBtn && (afternoonBtn.getAttribute('aria-pressed') === 'true' || afternoonBtn.dataset.selected === 'true')) {
+                return 'AFTERNOON';
+            }
             
-            startInput.value = dateValue;
-            endInput.value = dateValue;
+            // 方法4: 檢查按鈕的 disabled 狀態（未選中的可能是 disabled）
+            if (morningBtn && !morningBtn.disabled && afternoonBtn && afternoonBtn.disabled) {
+                return 'MORNING';
+            }
+            if (afternoonBtn && !afternoonBtn.disabled && morningBtn && morningBtn.disabled) {
+                return 'AFTERNOON';
+            }
+            
+            // 方法5: 檢查頁面內容中的時間表格或數據
+            let timeElements = document.querySelectorAll('.time, .hour, [class*="time"]');
+            let foundAfternoon = false;
+            let foundMorning = false;
+            
+            for (let element of timeElements) {
+                let text = element.textContent || element.innerText;
+                if (text.includes('13:') || text.includes('14:') || text.includes('15:') || text.includes('16:') || text.includes('17:')) {
+                    foundAfternoon = true;
+                }
+                if (text.includes('08:') || text.includes('09:') || text.includes('10:') || text.includes('11:') || text.includes('12:')) {
+                    foundMorning = true;
+                }
+            }
+            
+            if (foundAfternoon && !foundMorning) return 'AFTERNOON';
+            if (foundMorning && !foundAfternoon) return 'MORNING';
+            
+            // 方法6: 檢查頁面 URL 或表單隱藏字段
+            let hiddenInputs = document.querySelectorAll('input[type="hidden"]');
+            for (let input of hiddenInputs) {
+                if (input.name.includes('period') || input.name.includes('time')) {
+                    if (input.value === 'AFTERNOON' || input.value === 'PM') return 'AFTERNOON';
+                    if (input.value === 'MORNING' || input.value === 'AM') return 'MORNING';
+                }
+            }
             
-            var event = new Event('change', { bubbles: true });
-            startInput.dispatchEvent(event);
-            endInput.dispatchEvent(event);
-        """, start_date_input, end_date_input, current_date)
+            // 如果所有方法都無法確定，記錄詳細信息並預設為上午
+            console.log('無法確定當前時段，按鈕狀態:');
+            console.log('Morning button classes:', morningBtn ? morningBtn.className : 'not found');
+            console.log('Afternoon button classes:', afternoonBtn ? afternoonBtn.className : 'not found');
+            console.log('Morning button style:', morningBtn ? morningBtn.style.cssText : 'not found');
+            console.log('Afternoon button style:', afternoonBtn ? afternoonBtn.style.cssText : 'not found');
+            
+            return 'MORNING';  // 預設為上午
+        """)
+        
+        print(f"🔍 {building_name} 當前時段: {current_period}")
+        
+        if current_period == 'MORNING':
+            # 當前是上午，先截取上午數據
+            print(f"📅 {building_name} 截取上午數據...")
+            with timer.step('settle'):
+                _page_waiter.settled(driver)  # 確保頁面穩定
+            building_morning_data = snapshot_page(driver)
+            
+            # 驗證數據是否確實是上午時段
+            morning_verification = driver.execute_script("""
+                let content = document.body.innerHTML;
+                let afternoonTimes = (content.match(/1[3-7]:/g) || []).length;
+                let morningTimes = (content.match(/0[8-9]:|1[0-2]:/g) || []).length;
+                return {afternoon: afternoonTimes, morning: morningTimes};
+            """)
+            
+            if morning_verification['afternoon'] > morning_verification['morning']:
+                print(f"⚠️ {building_name} 檢測到時段不匹配！重新檢測...")
+                current_period = 'AFTERNOON'
+                building_afternoon_data = building_morning_data
+                building_morning_data = None
+            
+            if building_morning_data is not None:
+                # 切換到下午
+                print(f"🔄 {building_name} 切換到下午...")
+                building_afternoon_data = switch_period(driver, 'AFTERNOON', timer)
+            else:
+                # 切換到上午獲取正確數據
+                print(f"🔄 {building_name} 切換到上午...")
+                building_morning_data = switch_period(driver, 'MORNING', timer)
+            
+        else:  # AFTERNOON
+            # 當前是下午，先截取下午數據
+            print(f"🌆 {building_name} 截取下午數據...")
+            with timer.step('settle'):
+                _page_waiter.settled(driver)  # 確保頁面穩定
+            building_afternoon_data = snapshot_page(driver)
+            
+            # 驗證數據是否確實是下午時段
+            afternoon_verification = driver.execute_script("""
+                let content = document.body.innerHTML;
+                let afternoonTimes = (content.match(/1[3-7]:/g) || []).length;
+                let morningTimes = (content.match(/0[8-9]:|1[0-2]:/g) || []).length;
+                return {afternoon: afternoonTimes, morning: morningTimes};
+            """)
+            
+            if afternoon_verification['morning'] > afternoon_verification['afternoon']:
+                print(f"⚠️ {building_name} 檢測到時段不匹配！重新檢測...")
+                current_period = 'MORNING'
+                building_morning_data = building_afternoon_data
+                building_afternoon_data = None
+            
+            if building_afternoon_data is not None:
+                # 切換到上午
+                print(f"🔄 {building_name} 切換到上午...")
+                building_morning_data = switch_period(driver, 'MORNING', timer)
+            else:
+                # 切換到下午獲取正確數據
+                print(f"🔄 {building_name} 切換到下午...")
+                building_afternoon_data = switch_period(driver, 'AFTERNOON', timer)
         
+        # 驗證數據完整性：兩個時段都已更新且包含時間表
+        if page_complete(building_morning_data) and page_complete(building_afternoon_data):
+            print(f"✅ {building_name} 智能數據收集成功")
+        else:
+            print(f"⚠️ {building_name} 數據可能不完整，使用備用方法...")
+            # 備用方法：強制按順序收集；頁面沒有反應（已在該時段）時仍使用目前頁面
+            building_morning_data = switch_period(driver, 'MORNING', timer, required=False)
+            building_afternoon_data = switch_period(driver, 'AFTERNOON', timer, required=False)
+            print(f"✅ {building_name} 備用方法收集完成")
+            
+    except Exception as e:
+        print(f"❌ {building_name} 數據收集失敗: {e}")
+        return None, None
+    finally:
+        timer.report()
+
+    return building_morning_data, building_afternoon_data
+
+
+def build_building_data(building_id, building_name, current_date, building_morning_data,
+                        building_afternoon_data, building_start_time):
+    """
+    將單一建築物的上下午頁面包裝為處理流程的輸入（collect 階段）
+    
+    Returns:
+        Optional[dict]: 建築物資訊（building_id, building_name, captures, elapsed），資料不完整時為 None
+    """
+    if building_morning_data is None or building_afternoon_data is None:
+        inc('errors_total', kind='incomplete_building')
+        building_end_time = time.time()
+        print(f"❌ 建築物 {building_name} 數據收集不完整，跳過 - 耗時 {building_end_time - building_start_time:.2f} 秒")
+        return None
+
+    building_end_time = time.time()
+    print(f"✅ 成功收集建築物 {building_name} 的數據 - 總耗時 {building_end_time - building_start_time:.2f} 秒")
+    return {
+        'building_id': building_id,
+        'building_name': building_name,
+        'captures': collect(building_id, building_name, current_date, building_morning_data, building_afternoon_data),
+        'elapsed': building_end_time - building_start_time
+    }
+
+
+def iter_building_pages(driver, current_date, buildings):
+    """
+    在已登入的瀏覽器中設定日期後，依序查詢多個建築物的上下午頁面
+    
+    Args:
+        driver: 位於 mrm101w/index 的已登入 Chrome WebDriver
+        current_date (str): 查詢日期 (YYYY/MM/DD)
+        buildings (List[str]): 建築物 ID 列表
+        
+    Yields:
+        Tuple[str, str, Optional[str], Optional[str], float]:
+            (建築物 ID, 建築物名稱, 上午頁面, 下午頁面, 開始查詢時間)，選擇建築物失敗者略過
+        
+    Raises:
+        CrawlError: 日期設置失敗或無法定位建築物選擇器
+    """
+    try:
+        with span('date_set'):
+            set_query_date(driver, current_date)
         print(f"📅 日期設置完成: {current_date}")
     except Exception as e:
         print(f"日期設置失敗: {e}")
-        driver.quit()
-        return jsonify({'error': '日期設置失敗'}), 500
+        raise CrawlError('日期設置失敗')
 
-    # 儲存所有建築物的數據
-    all_building_data = []
-    
     # 預先定位下拉選單元素，避免重複查找
     try:
         dropdown = driver.find_element(By.ID, 'searchBeanBuildingPK')
@@ -180,8 +575,7 @@ def run_booking():
         print("📍 建築物選擇器已定位")
     except Exception as e:
         print(f"無法定位建築物選擇器: {e}")
-        driver.quit()
-        return jsonify({'error': '無法定位建築物選擇器'}), 500
+        raise CrawlError('無法定位建築物選擇器')
 
     # 遍歷每個建築物進行查詢 - 進一步優化
     for building_id in buildings:
@@ -191,483 +585,867 @@ def run_booking():
 
         # 選擇建築物
         try:
-            select.select_by_value(building_id)
-            # 移除固定等待，使用動態檢測
+            with span('building_select'):
+                selected = select_building(driver, select, building_id)
         except Exception as e:
             print(f"選擇建築物失敗 - {building_name}: {e}")
             continue
+        if not selected:
+            # 時間表仍是前一個建築物的內容，不能當成這個建築物的資料
+            print(f"⚠️ 選擇 {building_name} 後 {_page_waiter.timeout:.0f} 秒內時間表沒有更新，跳過")
+            continue
 
         # 智能優化：先判斷當前時段再收集數據
-        building_morning_data = None
-        building_afternoon_data = None
+        building_morning_data, building_afternoon_data = collect_building_pages(driver, building_name)
+        yield building_id, building_name, building_morning_data, building_afternoon_data, building_start_time
+
+
+def record_history(parsed_pages):
+    """將新解析的頁面匯入歷史資料庫；未啟用或匯入失敗時不影響查詢結果"""
+    if _history_store is None:
+        return
+    try:
+        for page in parsed_pages:
+            _history_store.ingest_meetings(page.meetings, page.building_id, page.building_name, source='api')
+    except Exception as e:
+        print(f"⚠️ 匯入歷史資料庫失敗: {e}")
+
+
+def crawl_buildings(driver, current_date, buildings):
+    """
+    在已登入的瀏覽器中依序查詢多個建築物，收集上下午頁面
+    
+    Args:
+        driver: 位於 mrm101w/index 的已登入 Chrome WebDriver
+        current_date (str): 查詢日期 (YYYY/MM/DD)
+        buildings (List[str]): 建築物 ID 列表
+        
+    Returns:
+        List[dict]: 成功收集的建築物資訊（building_id, building_name, captures, elapsed）
         
+    Raises:
+        CrawlError: 日期設置失敗或無法定位建築物選擇器
+    """
+    # 儲存所有建築物的數據
+    all_building_data = []
+
+    for building_id, building_name, building_morning_data, building_afternoon_data, building_start_time \
+            in iter_building_pages(driver, current_date, buildings):
+        building_data = build_building_data(building_id, building_name, current_date,
+                                            building_morning_data, building_afternoon_data, building_start_time)
+        if building_data:
+            all_building_data.append(building_data)
+
+    return all_building_data
+
+
+def crawl_buildings_http(current_date, buildings):
+    """
+    以無瀏覽器的 HTTP 引擎查詢多個建築物，輸出格式與 crawl_buildings() 相同
+    
+    Raises:
+        HttpEngineError / requests.RequestException: 登入或查詢失敗
+    """
+    all_building_data = []
+    with get_http_pool().checkout() as session:
+        for building_id in buildings:
+            building_start_time = time.time()
+            building_name = BUILDING_CONFIG.get(building_id, f'未知建築物({building_id})')
+            print(f"🌐 HTTP 查詢建築物: {building_name} (ID: {building_id})")
+
+            building_morning_data, building_afternoon_data = session.fetch_building(current_date, building_id)
+            building_data = build_building_data(building_id, building_name, current_date,
+                                                building_morning_data, building_afternoon_data, building_start_time)
+            if building_data:
+                all_building_data.append(building_data)
+    return all_building_data
+
+
+def crawl_concurrently(crawl_one, buildings, workers):
+    """
+    以有限數量的工作執行緒平行查詢多個建築物
+    
+    Args:
+        crawl_one (Callable[[str], List[dict]]): 查詢單一建築物的函式
+        buildings (List[str]): 建築物 ID 列表
+        workers (int): 最多同時查詢的建築物數量
+        
+    Returns:
+        List[dict]: 依 buildings 原始順序合併的建築物資訊
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='crawl') as executor:
+        futures = {executor.submit(crawl_one, building_id): building_id for building_id in buildings}
+        for future in as_completed(futures):
+            building_id = futures[future]
+            try:
+                results[building_id] = future.result()
+            except Exception as e:
+                building_name = BUILDING_CONFIG.get(building_id, f'未知建築物({building_id})')
+                print(f"❌ {building_name} 平行查詢失敗: {e}")
+
+    # 依請求順序合併，確保輸出順序固定
+    return [building_data for building_id in buildings for building_data in results.get(building_id, [])]
+
+
+def crawl_building_selenium(current_date, building_id):
+    """借用獨立的瀏覽器查詢單一建築物（供平行查詢使用）"""
+    with get_driver_pool().checkout() as driver:
+        return crawl_buildings(driver, current_date, [building_id])
+
+
+def crawl(current_date, buildings, engine='selenium', workers=1):
+    """
+    依指定引擎與平行度查詢多個建築物的上下午頁面
+    
+    Args:
+        current_date (str): 查詢日期 (YYYY/MM/DD)
+        buildings (List[str]): 建築物 ID 列表
+        engine (str): 'http' 或 'selenium'；http 失敗或資料不完整時退回 selenium
+        workers (int): 平行查詢的工作數，1 表示在單一 session 中依序查詢
+        
+    Returns:
+        List[dict]: 成功收集的建築物資訊，依 buildings 順序排列
+        
+    Raises:
+        CrawlError: 依序查詢時日期設置失敗或無法定位建築物選擇器
+        DriverPoolTimeout: 等不到可用的瀏覽器
+    """
+    workers = max(1, min(workers, len(buildings)))
+    all_building_data = []
+
+    # HTTP 引擎：不啟動瀏覽器，直接重播查詢表單；失敗時退回 Selenium
+    if engine == 'http':
+        print(f"🌐 使用 HTTP 引擎查詢 - 平行數 {workers}")
         try:
-            print(f"⚡ 智能收集 {building_name} 上下午數據...")
-            
-            # 檢測當前頁面是上午還是下午時段 - 改進檢測邏輯
-            current_period = driver.execute_script("""
-                let morningBtn = document.querySelector('button[name="selectedTimePeriod"][value="MORNING"]');
-                let afternoonBtn = document.querySelector('button[name="selectedTimePeriod"][value="AFTERNOON"]');
-                
-                // 方法1: 檢查按鈕的 class 屬性
-                if (morningBtn && (morningBtn.classList.contains('active') || morningBtn.classList.contains('selected') || morningBtn.classList.contains('btn-primary'))) {
-                    return 'MORNING';
-                }
-                if (afternoonBtn && (afternoonBtn.classList.contains('active') || afternoonBtn.classList.contains('selected') || afternoonBtn.classList.contains('btn-primary'))) {
-                    return 'AFTERNOON';
-                }
-                
-                // 方法2: 檢查按鈕的 style 屬性
-                if (morningBtn && morningBtn.style.backgroundColor && morningBtn.style.backgroundColor !== 'transparent') {
-                    return 'MORNING';
-                }
-                if (afternoonBtn && afternoonBtn.style.backgroundColor && afternoonBtn.style.backgroundColor !== 'transparent') {
-                    return 'AFTERNOON';
-                }
-                
-                // 方法3: 檢查 aria-pressed 或 data-* 屬性
-                if (morningBtn && (morningBtn.getAttribute('aria-pressed') === 'true' || morningBtn.dataset.selected === 'true')) {
-                    return 'MORNING';
-                }
-                if (afternoonBtn && (afternoonBtn.getAttribute('aria-pressed') === 'true' || afternoonBtn.dataset.selected === 'true')) {
-                    return 'AFTERNOON';
-                }
-                
-                // 方法4: 檢查按鈕的 disabled 狀態（未選中的可能是 disabled）
-                if (morningBtn && !morningBtn.disabled && afternoonBtn && afternoonBtn.disabled) {
-                    return 'MORNING';
-                }
-                if (afternoonBtn && !afternoonBtn.disabled && morningBtn && morningBtn.disabled) {
-                    return 'AFTERNOON';
-                }
-                
-                // 方法5: 檢查頁面內容中的時間表格或數據
-                let timeElements = document.querySelectorAll('.time, .hour, [class*="time"]');
-                let foundAfternoon = false;
-                let foundMorning = false;
-                
-                for (let element of timeElements) {
-                    let text = element.textContent || element.innerText;
-                    if (text.includes('13:') || text.includes('14:') || text.includes('15:') || text.includes('16:') || text.includes('17:')) {
-                        foundAfternoon = true;
-                    }
-                    if (text.includes('08:') || text.includes('09:') || text.includes('10:') || text.includes('11:') || text.includes('12:')) {
-                        foundMorning = true;
-                    }
-                }
-                
-                if (foundAfternoon && !foundMorning) return 'AFTERNOON';
-                if (foundMorning && !foundAfternoon) return 'MORNING';
-                
-                // 方法6: 檢查頁面 URL 或表單隱藏字段
-                let hiddenInputs = document.querySelectorAll('input[type="hidden"]');
-                for (let input of hiddenInputs) {
-                    if (input.name.includes('period') || input.name.includes('time')) {
-                        if (input.value === 'AFTERNOON' || input.value === 'PM') return 'AFTERNOON';
-                        if (input.value === 'MORNING' || input.value === 'AM') return 'MORNING';
-                    }
-                }
-                
-                // 如果所有方法都無法確定，記錄詳細信息並預設為上午
-                console.log('無法確定當前時段，按鈕狀態:');
-                console.log('Morning button classes:', morningBtn ? morningBtn.className : 'not found');
-                console.log('Afternoon button classes:', afternoonBtn ? afternoonBtn.className : 'not found');
-                console.log('Morning button style:', morningBtn ? morningBtn.style.cssText : 'not found');
-                console.log('Afternoon button style:', afternoonBtn ? afternoonBtn.style.cssText : 'not found');
-                
-                return 'MORNING';  // 預設為上午
-            """)
-            
-            print(f"🔍 {building_name} 當前時段: {current_period}")
-            
-            if current_period == 'MORNING':
-                # 當前是上午，先截取上午數據
-                print(f"📅 {building_name} 截取上午數據...")
-                time.sleep(0.2)  # 確保頁面穩定
-                building_morning_data = driver.page_source
-                
-                # 驗證數據是否確實是上午時段
-                morning_verification = driver.execute_script("""
-                    let content = document.body.innerHTML;
-                    let afternoonTimes = (content.match(/1[3-7]:/g) || []).length;
-                    let morningTimes = (content.match(/0[8-9]:|1[0-2]:/g) || []).length;
-                    return {afternoon: afternoonTimes, morning: morningTimes};
-                """)
-                
-                if morning_verification['afternoon'] > morning_verification['morning']:
-                    print(f"⚠️ {building_name} 檢測到時段不匹配！重新檢測...")
-                    current_period = 'AFTERNOON'
-                    building_afternoon_data = building_morning_data
-                    building_morning_data = None
-                
-                if building_morning_data:
-                    # 切換到下午
-                    print(f"🔄 {building_name} 切換到下午...")
-                    driver.execute_script("""
-                        let afternoonBtn = document.querySelector('button[name="selectedTimePeriod"][value="AFTERNOON"]');
-                        if (afternoonBtn) afternoonBtn.click();
-                    """)
-                    time.sleep(0.3)
-                    building_afternoon_data = driver.page_source
-                else:
-                    # 切換到上午獲取正確數據
-                    print(f"🔄 {building_name} 切換到上午...")
-                    driver.execute_script("""
-                        let morningBtn = document.querySelector('button[name="selectedTimePeriod"][value="MORNING"]');
-                        if (morningBtn) morningBtn.click();
-                    """)
-                    time.sleep(0.3)
-                    building_morning_data = driver.page_source
-                
-            else:  # AFTERNOON
-                # 當前是下午，先截取下午數據
-                print(f"🌆 {building_name} 截取下午數據...")
-                time.sleep(0.2)  # 確保頁面穩定
-                building_afternoon_data = driver.page_source
-                
-                # 驗證數據是否確實是下午時段
-                afternoon_verification = driver.execute_script("""
-                    let content = document.body.innerHTML;
-                    let afternoonTimes = (content.match(/1[3-7]:/g) || []).length;
-                    let morningTimes = (content.match(/0[8-9]:|1[0-2]:/g) || []).length;
-                    return {afternoon: afternoonTimes, morning: morningTimes};
-                """)
-                
-                if afternoon_verification['morning'] > afternoon_verification['afternoon']:
-                    print(f"⚠️ {building_name} 檢測到時段不匹配！重新檢測...")
-                    current_period = 'MORNING'
-                    building_morning_data = building_afternoon_data
-                    building_afternoon_data = None
-                
-                if building_afternoon_data:
-                    # 切換到上午
-                    print(f"🔄 {building_name} 切換到上午...")
-                    driver.execute_script("""
-                        let morningBtn = document.querySelector('button[name="selectedTimePeriod"][value="MORNING"]');
-                        if (morningBtn) morningBtn.click();
-                    """)
-                    time.sleep(0.3)
-                    building_morning_data = driver.page_source
-                else:
-                    # 切換到下午獲取正確數據
-                    print(f"🔄 {building_name} 切換到下午...")
-                    driver.execute_script("""
-                        let afternoonBtn = document.querySelector('button[name="selectedTimePeriod"][value="AFTERNOON"]');
-                        if (afternoonBtn) afternoonBtn.click();
-                    """)
-                    time.sleep(0.3)
-                    building_afternoon_data = driver.page_source
-            
-            # 快速驗證數據完整性
-            if (building_morning_data and len(building_morning_data) > 30000 and building_afternoon_data and len(building_afternoon_data) > 30000):
-                print(f"✅ {building_name} 智能數據收集成功")
+            if workers > 1:
+                all_building_data = crawl_concurrently(
+                    lambda building_id: crawl_buildings_http(current_date, [building_id]), buildings, workers)
             else:
-                print(f"⚠️ {building_name} 數據可能不完整，使用備用方法...")
-                # 備用方法：強制按順序收集
-                driver.execute_script("""
-                    let morningBtn = document.querySelector('button[name="selectedTimePeriod"][value="MORNING"]');
-                    if (morningBtn) morningBtn.click();
-                """)
-                time.sleep(0.8)
-                building_morning_data = driver.page_source
-                
-                driver.execute_script("""
-                    let afternoonBtn = document.querySelector('button[name="selectedTimePeriod"][value="AFTERNOON"]');
-                    if (afternoonBtn) afternoonBtn.click();
-                """)
-                time.sleep(0.8)
-                building_afternoon_data = driver.page_source
-                print(f"✅ {building_name} 備用方法收集完成")
-                
+                all_building_data = crawl_buildings_http(current_date, buildings)
         except Exception as e:
-            print(f"❌ {building_name} 數據收集失敗: {e}")
-            continue
+            print(f"⚠️ HTTP 引擎查詢失敗，改用 Selenium: {e}")
+        if len(all_building_data) == len(buildings):
+            return all_building_data
+        print("⚠️ HTTP 引擎資料不完整，改用 Selenium")
 
-        # 儲存檔案和建築物資訊
-        # 處理保存數據並添加性能監測
-        if building_morning_data and building_afternoon_data:
-            period_switch_time = time.time() - building_start_time
-            print(f"⚡ {building_name} 時段切換總耗時: {period_switch_time:.2f}秒 (智能優化)")
-            
-            morning_file_name = f'./tmp/{building_id}_{current_date.replace("/", "")}_morning.html'
-            afternoon_file_name = f'./tmp/{building_id}_{current_date.replace("/", "")}_afternoon.html'
-            
-            # 批量寫入檔案以提高效率
-            try:
-                with open(morning_file_name, 'w', encoding='utf-8-sig') as f:
-                    f.write(building_morning_data)
-                with open(afternoon_file_name, 'w', encoding='utf-8-sig') as f:
-                    f.write(building_afternoon_data)
-                    
-                building_end_time = time.time()
-                all_building_data.append({
-                    'building_id': building_id,
-                    'building_name': building_name,
-                    'morning_file': morning_file_name,
-                    'afternoon_file': afternoon_file_name
-                })
-                print(f"✅ 成功收集建築物 {building_name} 的數據 - 總耗時 {building_end_time - building_start_time:.2f} 秒")
-                
-            except Exception as e:
-                print(f"檔案寫入失敗 - {building_name}: {e}")
-                continue
+    # 借用已登入的瀏覽器（連線池會重置到查詢頁）
+    pool = get_driver_pool()
+    workers = min(workers, pool.size)
+    print(f"🚀 借用瀏覽器 - {time.strftime('%H:%M:%S', time.localtime(time.time()))} - 平行數 {workers}")
+    if workers > 1:
+        return crawl_concurrently(
+            lambda building_id: crawl_building_selenium(current_date, building_id), buildings, workers)
+
+    with pool.checkout() as driver:
+        print("✅ 已取得登入中的瀏覽器")
+        return crawl_buildings(driver, current_date, buildings)
+
+
+def query_meetings(current_date, buildings, engine='selenium', workers=1, refresh=False, start_time=None):
+    """
+    查詢多個建築物的會議室資料並輸出 CSV；快取中已有的建築物不再爬取
+    
+    Args:
+        current_date (str): 查詢日期 (YYYY/MM/DD)
+        buildings (List[str]): 建築物 ID 列表
+        engine (str): 'http' 或 'selenium'
+        workers (int): 平行查詢的工作數
+        refresh (bool): 略過快取，全部重新爬取
+        start_time (float, optional): 請求開始時間，用於統計總執行時間
+        
+    Returns:
+        dict: csv（CSV 內容）、cache（HIT / PARTIAL / MISS）、meetings（會議記錄數）、duplicates（移除的重複記錄數）、
+            unparsed（時間格式無法解析而未輸出的記錄數）
+        
+    Raises:
+        CrawlError: 爬取或處理失敗，訊息可直接回傳給呼叫端
+        DriverPoolTimeout: 等不到可用的瀏覽器
+    """
+    start_time = start_time or time.time()
+
+    # 先從快取取得已查詢過的建築物，只爬取其餘建築物
+    cached_pages = []
+    missing_buildings = []
+    for building_id in buildings:
+        pages = None if refresh else _result_cache.get(building_id, current_date)
+        if pages is None:
+            missing_buildings.append(building_id)
         else:
-            building_end_time = time.time()
-            print(f"❌ 建築物 {building_name} 數據收集不完整，跳過 - 耗時 {building_end_time - building_start_time:.2f} 秒")
+            cached_pages.extend(pages)
+    x_cache = cache_status(len(buildings) - len(missing_buildings), len(buildings))
+    print(f"🗃️ 快取 {x_cache} - 命中 {len(buildings) - len(missing_buildings)}/{len(buildings)} 個建築物")
 
-    driver.quit()
+    selenium_start_time = time.time()
+    all_building_data = []
+    if missing_buildings:
+        try:
+            with span('crawl'):
+                all_building_data = crawl(current_date, missing_buildings, engine, workers)
+        except (CrawlError, DriverPoolTimeout):
+            raise
+        except Exception as e:
+            print(f"❌ ChromeDriver 初始化或登入失敗: {e}")
+            raise CrawlError(f'瀏覽器驅動程式初始化或登入失敗: {e}')
     
     crawling_end_time = time.time()
     print(f"🕷️ 爬蟲階段完成 - 總耗時 {crawling_end_time - selenium_start_time:.2f} 秒")
 
     # 檢查是否有成功收集到數據
-    if not all_building_data:
-        return jsonify({'error': '沒有成功收集到任何建築物的數據'}), 500
+    if not all_building_data and not cached_pages:
+        raise CrawlError('沒有成功收集到任何建築物的數據')
 
     print(f"📊 成功收集到 {len(all_building_data)} 個建築物的數據")
 
-    # 處理所有建築物的檔案 - 並行處理優化
+    # 解析與合併 - 直接在記憶體中處理，不再寫入 tmp/ 與 output/
     processing_start_time = time.time()
-    print(f"⚙️ 開始處理檔案 - {time.strftime('%H:%M:%S', time.localtime(processing_start_time))}")
+    print(f"⚙️ 開始處理頁面 - {time.strftime('%H:%M:%S', time.localtime(processing_start_time))}")
+
+    # 依原本 tmp 檔名排序（{building}_{date}_{period}），維持既有的輸出順序
+    captures = sorted(
+        (capture for building_data in all_building_data for capture in building_data['captures']),
+        key=page_sort_key
+    )
+
+    try:
+        result = run_pipeline(captures, debug_dir=os.getenv('PIPELINE_DEBUG_DIR'), cached_pages=cached_pages)
+        with span('render'):
+            csv_content = render_csv(result.meetings)
+    except Exception as e:
+        print(f"❌ 處理頁面時發生錯誤：{e}")
+        raise CrawlError(f'處理頁面時發生錯誤：{e}')
+
+    # 新爬取的建築物寫入快取（上下午兩頁一組）與歷史資料庫
+    for building_id, pages in groupby(result.parsed_pages, key=lambda page: page.building_id):
+        _result_cache.put(building_id, current_date, tuple(pages))
+    record_history(result.parsed_pages)
+
+    total_meetings = result.total_meetings
+    print(f"📈 總共處理了 {result.pages} 個頁面、{total_meetings} 筆會議記錄")
+    if result.duplicates:
+        print(f"🧹 已移除 {result.duplicates} 筆重複的會議記錄（上下午頁面重複出現的跨中午會議）")
+    if result.unparsed:
+        print(f"⚠️ {result.unparsed} 筆會議的時間格式無法解析，未輸出")
     
-    all_file_list = []
+    # 計算總執行時間
+    end_time = time.time()
+    total_time = end_time - start_time
+    processing_time = end_time - processing_start_time
     
-    # 並行處理檔案以提高效率
+    print(f"📝 頁面處理完成 - 耗時 {processing_time:.2f} 秒")
+    print(f"🏁 總執行時間: {total_time:.2f} 秒")
+    print(f"📈 平均每個建築物耗時: {total_time / len(buildings):.2f} 秒")
+
+    # 效能統計
+    print("📊 效能統計：")
+    print(f"   🗃️ 快取: {x_cache}（命中 {len(buildings) - len(missing_buildings)}/{len(buildings)}）")
+    print(f"   🕷️ 爬蟲耗時: {crawling_end_time - selenium_start_time:.2f} 秒")
+    print(f"   ⚙️ 處理耗時: {processing_time:.2f} 秒")
+    print(f"   🏁 總執行時間: {total_time:.2f} 秒")
+    print(f"   📈 平均每建築物: {total_time / len(buildings):.2f} 秒")
     for building_data in all_building_data:
-        morning_file = building_data['morning_file']
-        afternoon_file = building_data['afternoon_file']
-        building_name = building_data['building_name']
+        print(f"   🏢 {building_data['building_name']}: {building_data['elapsed']:.2f} 秒")
+    print(f"   📄 生成記錄數: {total_meetings} 筆（移除重複 {result.duplicates} 筆）")
 
-        # 快速檔案存在性檢查
-        if not (os.path.exists(morning_file) and os.path.exists(afternoon_file)):
-            print(f"警告：{building_name} HTML檔案不完整")
-            continue
+    return {'csv': csv_content, 'cache': x_cache, 'meetings': total_meetings, 'duplicates': result.duplicates,
+            'unparsed': result.unparsed}
 
-        print(f"📁 處理 {building_name} 檔案...")
 
-        # 批量處理HTML檔案
-        try:
-            # 處理早上的HTML檔案
-            processed_morning = morning_file[:-5]  # 移除 .html 擴展名
-            morning_meetings = process_html_file(morning_file, processed_morning)
-            
-            # 處理下午的HTML檔案
-            processed_afternoon = afternoon_file[:-5]  # 移除 .html 擴展名
-            afternoon_meetings = process_html_file(afternoon_file, processed_afternoon)
-            
-            total_meetings = len(morning_meetings) + len(afternoon_meetings)
-            print(f"✅ {building_name} 處理完成：提取 {total_meetings} 筆記錄")
-            
-            # 添加處理後的檔案到列表
-            all_file_list.extend([processed_morning, processed_afternoon])
-            
-        except Exception as e:
-            print(f"❌ 處理 {building_name} 檔案時發生錯誤：{e}")
-            continue
+def parse_query_params(data):
+    """
+    解析 /run 與 /jobs 共用的查詢參數
+    
+    Returns:
+        dict: date、buildings、engine、workers、refresh
+    """
+    # 取得要查詢的建築物列表，如果沒有指定則使用預設值
+    default_buildings = data.get('default_buildings', ['6'])  # A3置地廣場
+    buildings = data.get('buildings', default_buildings)
+    if isinstance(buildings, str):
+        buildings = [buildings]  # 如果是單個字串，轉換為列表
+
+    return {
+        'date': data.get('date', '2025/07/10'),
+        'buildings': list(buildings),
+        'engine': resolve_engine(data.get('engine')),
+        # 平行查詢的工作數（1 表示在單一瀏覽器中依序查詢）
+        'workers': int(data.get('crawl_workers') or os.getenv('CRAWL_WORKERS', '1')),
+        # refresh 為 true 時略過快取，重新爬取並更新快取
+        'refresh': bool(data.get('refresh')),
+    }
+
+
+# API 路由：根據提供的登入資訊和日期，進行會議室查詢
+@app.route('/run', methods=['POST'])
+def run_booking():
+    # 開始計時
+    start_time = time.time()
+    print(f"🕐 開始執行會議室查詢 - {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time))}")
+    
+    data = request.json
+
+    username = os.getenv('BOOKING_USERNAME')
+    password = os.getenv('BOOKING_PASSWORD')
+    print(f"使用帳號: {username}")
+    params = parse_query_params(data)
+    current_date = params['date']
+    buildings = params['buildings']
+
+    print(f"要查詢的建築物: {[BUILDING_CONFIG.get(b, f'未知建築物({b})') for b in buildings]}")
 
-    if not all_file_list:
-        return jsonify({'error': '沒有成功處理任何檔案'}), 500
+    if not username or not password:
+        return jsonify({'error': '環境變數中缺少帳號或密碼'}), 500
 
-    # 合併並生成最終輸出文件 - 優化檔案處理
-    buildings_str = '_'.join([data['building_id'] for data in all_building_data])
-    output_file = f'./output/{current_date.replace("/", "")}_buildings_{buildings_str}_combined_output.txt'
-    output_csv = f'./output/{current_date.replace("/", "")}_buildings_{buildings_str}_combined.csv'
+    # 串流模式：逐建築物、逐時段解析後立即輸出，不寫入中間檔案
+    fmt = resolve_stream_format(data)
+    if data.get('stream') or fmt == 'ndjson':
+        print(f"📡 串流模式 ({fmt})")
+        response = Response(
+            stream_with_context(generate_meeting_stream([current_date], buildings, params['engine'],
+                                                        fmt, params['refresh'])),
+            mimetype=STREAM_FORMATS[fmt]
+        )
+        response.headers['X-Cache'] = range_cache_status([current_date], buildings, params['refresh'])
+        return response
 
-    print(f"📊 合併處理 {len(all_file_list)} 個檔案...")
+    try:
+        outcome = query_meetings(current_date, buildings, params['engine'], params['workers'],
+                                 params['refresh'], start_time)
+    except CrawlError as e:
+        return jsonify({'error': str(e)}), 500
+    except DriverPoolTimeout as e:
+        print(f"❌ 瀏覽器忙碌中: {e}")
+        return jsonify({'error': f'瀏覽器忙碌中，請稍後再試: {e}'}), 503
 
-    # 快速檔案存在性檢查（簡化調試輸出）
-    valid_files = [f for f in all_file_list if os.path.exists(f)]
-    if len(valid_files) != len(all_file_list):
-        print(f"⚠️ 警告：{len(all_file_list) - len(valid_files)} 個檔案不存在")
+    response = Response(outcome['csv'], mimetype='text/csv')
+    response.headers['X-Cache'] = outcome['cache']
+    response.headers['X-Duplicates-Dropped'] = str(outcome['duplicates'])
+    response.headers['X-Unparsed-Dropped'] = str(outcome['unparsed'])
+    return response
 
-    # 處理會議數據
-    meeting_data = process_files(sorted(valid_files))
-    total_meetings = sum(len(meetings) for meetings in meeting_data.values())
-    print(f"📈 總共處理了 {total_meetings} 筆會議記錄")
 
-    # 並行寫入輸出檔案
+def run_query_job(params):
+    """在背景工作中執行查詢，錯誤訊息與 /run 相同"""
     try:
-        write_output(meeting_data, output_file)
-        write_output_csv(meeting_data, output_csv)
-        print(f"📄 輸出檔案已生成：{output_csv}")
-    except Exception as e:
-        print(f"❌ 輸出檔案生成失敗：{e}")
-        return jsonify({'error': f'輸出檔案生成失敗：{e}'}), 500
-    
-    # 計算總執行時間
-    end_time = time.time()
-    total_time = end_time - start_time
-    processing_time = end_time - processing_start_time
+        return query_meetings(params['date'], params['buildings'], params['engine'], params['workers'],
+                              params['refresh'])
+    except DriverPoolTimeout as e:
+        raise CrawlError(f'瀏覽器忙碌中，請稍後再試: {e}')
+
+
+# API 路由：建立背景查詢工作，立即回傳 job id
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    data = request.get_json() or {}
+
+    if not os.getenv('BOOKING_USERNAME') or not os.getenv('BOOKING_PASSWORD'):
+        return jsonify({'error': '環境變數中缺少帳號或密碼'}), 500
+
+    params = parse_query_params(data)
+    # 相同日期、建築物與引擎的工作在執行中時直接共用
+    key = json.dumps([params['date'], params['buildings'], params['engine'], params['refresh']], ensure_ascii=False)
+    try:
+        job, created = _job_queue.submit(key, lambda: run_query_job(params), params)
+    except JobQueueFull as e:
+        return jsonify({'error': f'{e}，請稍後再試'}), 429
+
+    print(f"🧾 {'建立' if created else '合併至'}工作 {job.id[:8]} - {params['date']} {params['buildings']}")
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'deduplicated': not created,
+        'status_url': f'/jobs/{job.id}'
+    }), 202
+
+
+# API 路由：查詢背景工作狀態與結果
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = _job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': f'找不到工作: {job_id}'}), 404
+
+    # 完成的工作可直接以 CSV 取得結果
+    if job.status == JOB_DONE and (request.args.get('format') or '').lower() == 'csv':
+        response = Response(job.result['csv'], mimetype='text/csv')
+        response.headers['X-Cache'] = job.result['cache']
+        response.headers['X-Duplicates-Dropped'] = str(job.result['duplicates'])
+        response.headers['X-Unparsed-Dropped'] = str(job.result['unparsed'])
+        return response
+
+    body = job.to_dict()
+    if job.status == JOB_DONE:
+        body['result'] = job.result['csv']
+        body['meetings'] = job.result['meetings']
+        body['duplicates'] = job.result['duplicates']
+        body['unparsed'] = job.result['unparsed']
+        body['cache'] = job.result['cache']
+    return jsonify(body)
+
+
+def iter_range_pages(dates, buildings, engine='selenium'):
+    """
+    在單一已登入的 session 中逐日查詢多個建築物，避免每天重新啟動瀏覽器並登入
     
-    print(f"📝 檔案處理完成 - 耗時 {processing_time:.2f} 秒")
-    print(f"🏁 總執行時間: {total_time:.2f} 秒")
-    print(f"📈 平均每個建築物耗時: {total_time / len(all_building_data):.2f} 秒")
+    Args:
+        dates (List[str]): 查詢日期列表 (YYYY/MM/DD)
+        buildings (List[str]): 建築物 ID 列表
+        engine (str): 'http' 或 'selenium'；http 失敗時剩餘日期改用 selenium
+        
+    Yields:
+        Tuple[str, str, str, Optional[str], Optional[str], Optional[str]]:
+            (日期, 建築物 ID, 建築物名稱, 上午頁面, 下午頁面, 錯誤訊息)；當天查詢失敗時每個建築物各一筆，頁面為 None
+    """
+    remaining = list(dates)
+
+    if engine == 'http':
+        try:
+            with get_http_pool().checkout() as session:
+                while remaining:
+                    day = remaining[0]
+                    # 一天的所有建築物都取得後才輸出，退回 selenium 時不會重複
+                    pages = [
+                        (building_id, BUILDING_CONFIG.get(building_id, f'未知建築物({building_id})'),
+                         *session.fetch_building(day, building_id))
+                        for building_id in buildings
+                    ]
+                    for page in pages:
+                        yield (day, *page, None)
+                    remaining.pop(0)
+        except Exception as e:
+            print(f"⚠️ HTTP 引擎查詢失敗，剩餘 {len(remaining)} 天改用 Selenium: {e}")
+
+    if not remaining:
+        return
+
+    pool = get_driver_pool()
+    with pool.checkout() as driver:
+        for day in remaining:
+            # 整段區間共用一次借用，每天重新計時，避免長區間被當成卡住的借用而結束瀏覽器
+            pool.touch(driver)
+            try:
+                for building_id, building_name, morning, afternoon, _ in iter_building_pages(driver, day, buildings):
+                    yield day, building_id, building_name, morning, afternoon, None
+            except CrawlError as e:
+                print(f"❌ {day} 查詢失敗: {e}")
+                for building_id in buildings:
+                    yield day, building_id, BUILDING_CONFIG.get(building_id, f'未知建築物({building_id})'), \
+                        None, None, str(e)
+
+
+def date_range(start_date, end_date):
+    """
+    產生起訖日期之間（含）的所有日期
     
-    # 返回處理結果 - 優化輸出
-    try:
-        with open(output_csv, 'r', encoding='utf-8-sig') as csv_file:
-            csv_content = csv_file.read()
-
-        # 效能統計
-        print("📊 效能統計：")
-        print(f"   🕷️ 爬蟲耗時: {crawling_end_time - selenium_start_time:.2f} 秒")
-        print(f"   ⚙️ 處理耗時: {processing_time:.2f} 秒")
-        print(f"   🏁 總執行時間: {total_time:.2f} 秒")
-        print(f"   📈 平均每建築物: {total_time / len(all_building_data):.2f} 秒")
-        print(f"   📄 生成記錄數: {total_meetings} 筆")
+    Args:
+        start_date (str): 開始日期 (YYYY/MM/DD)
+        end_date (str): 結束日期 (YYYY/MM/DD)
         
-        return Response(csv_content, mimetype='text/csv')
+    Returns:
+        List[str]: 日期列表 (YYYY/MM/DD)
         
-    except Exception as e:
-        print(f"❌ 讀取輸出檔案失敗：{e}")
-        return jsonify({'error': f'讀取輸出檔案失敗：{e}'}), 500
-
-meeting_room_xpath = {
-    '3303': '//*[@id="timeTableMeetingRoom"]/div[2]/button[1]',
-    '3304': '//*[@id="timeTableMeetingRoom"]/div[4]/button[1]',
-    '3305': '//*[@id="timeTableMeetingRoom"]/div[6]/button[1]',
-    '3307': '//*[@id="timeTableMeetingRoom"]/div[8]/button[1]',
-    '3309': '//*[@id="timeTableMeetingRoom"]/div[10]/button[1]',
-    '3310': '//*[@id="timeTableMeetingRoom"]/div[12]/button[1]',
-    '3311': '//*[@id="timeTableMeetingRoom"]/div[14]/button[1]'
-}
+    Raises:
+        ValueError: 日期格式錯誤或結束日期早於開始日期
+    """
+    start = datetime.strptime(start_date, '%Y/%m/%d').date()
+    end = datetime.strptime(end_date, '%Y/%m/%d').date()
+    if end < start:
+        raise ValueError('結束日期早於開始日期')
+    return [(start + timedelta(days=offset)).strftime('%Y/%m/%d') for offset in range((end - start).days + 1)]
+
 
-songren_room_xpath = {
-    '15F-15樓接待大廳': '//*[@id="timeTableMeetingRoom"]/div[10]/button[1]',
-    '15F-階梯教室': '//*[@id="timeTableMeetingRoom"]/div[12]/button[1]',
-    '15F-深水炸彈-1(15-1)': '//*[@id="timeTableMeetingRoom"]/div[14]/button[1]',
-    '15F-深水炸彈-2(15-2)': '//*[@id="timeTableMeetingRoom"]/div[16]/button[1]',
-    '15F-老經典(15-3)': '//*[@id="timeTableMeetingRoom"]/div[18]/button[1]',
-    '15F-香格里拉(15-4)(觀察室)': '//*[@id="timeTableMeetingRoom"]/div[20]/button[1]',
-    '15F-血腥瑪麗(15-5)(受訪室)': '//*[@id="timeTableMeetingRoom"]/div[22]/button[1]',
-    '15F-亞歷山大(15-10)': '//*[@id="timeTableMeetingRoom"]/div[24]/button[1]',
-    '15F-琴通寧(15-11)': '//*[@id="timeTableMeetingRoom"]/div[26]/button[1]',
-    '4F-微風Chill室': '//*[@id="timeTableMeetingRoom"]/div[48]/button[1]',
-    '4F-滴大地': '//*[@id="timeTableMeetingRoom"]/div[50]/button[1]',
-    '4F-光影綠谷': '//*[@id="timeTableMeetingRoom"]/div[52]/button[1]',
-    '4F-剛果秘境': '//*[@id="timeTableMeetingRoom"]/div[54]/button[1]',
-    '4F-未來綠洲': '//*[@id="timeTableMeetingRoom"]/div[56]/button[1]',
-    '4F-森林之光': '//*[@id="timeTableMeetingRoom"]/div[58]/button[1]',
-    '4F-優勝美地': '//*[@id="timeTableMeetingRoom"]/div[60]/button[1]',
-    '4F-亞馬遜雨林': '//*[@id="timeTableMeetingRoom"]/div[62]/button[1]',
-    '4F-安新芽': '//*[@id="timeTableMeetingRoom"]/div[64]/button[1]',
-    '3F-HIVE': '//*[@id="timeTableMeetingRoom"]/div[66]/button[1]',
-    '3F-Kafka': '//*[@id="timeTableMeetingRoom"]/div[68]/button[1]',
-    '3F-中心樹投影3': '//*[@id="timeTableMeetingRoom"]/div[70]/button[1]',
-    '3F-中心樹投影5': '//*[@id="timeTableMeetingRoom"]/div[72]/button[1]',
-    '3F-Scala': '//*[@id="timeTableMeetingRoom"]/div[74]/button[1]',
-    '3F-中心樹投影6': '//*[@id="timeTableMeetingRoom"]/div[76]/button[1]',
-    '3F-Matlab': '//*[@id="timeTableMeetingRoom"]/div[78]/button[1]',
-    '3F-中心樹投影4': '//*[@id="timeTableMeetingRoom"]/div[80]/button[1]',
-    '3F-Python': '//*[@id="timeTableMeetingRoom"]/div[82]/button[1]',
-    '3F-Julia': '//*[@id="timeTableMeetingRoom"]/div[84]/button[1]',
-    '3F-中心樹投影1': '//*[@id="timeTableMeetingRoom"]/div[86]/button[1]',
-    '3F-R': '//*[@id="timeTableMeetingRoom"]/div[88]/button[1]',
-    '3F-Spark': '//*[@id="timeTableMeetingRoom"]/div[90]/button[1]',
-    '3F-SQL': '//*[@id="timeTableMeetingRoom"]/div[92]/button[1]',
-    '3F-Base': '//*[@id="timeTableMeetingRoom"]/div[94]/button[1]',
-    '3F-Java': '//*[@id="timeTableMeetingRoom"]/div[96]/button[1]',
-    '3F-C++': '//*[@id="timeTableMeetingRoom"]/div[98]/button[1]'
+# 串流回應支援的格式
+STREAM_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
 }
+# CSV 串流中標示查詢失敗的列（第一欄）
+STREAM_ERROR_MARKER = '#ERROR'
 
-@app.route('/book', methods=['POST'])
-def book_meeting_room():
-    # 從請求中獲取輸入
-    data = request.get_json()
-    room_number = data.get('room_number', '3303')  # 默認房間號
-    start_date = data.get('start_date', '2024/09/19')
-    end_date = start_date
-    meeting_subject = data.get('meeting_subject', '技術討論')
-    attendance_number = '1'
-    time_from_value = data.get('time_from', '08:00')
-    time_to_value = data.get('time_to', '09:00')
 
-    # 取得要預訂的建築物，如果沒有指定則使用預設值 (A3置地廣場)
-    building_id = data.get('building_id', '6')
-    building_name = BUILDING_CONFIG.get(building_id, f'未知建築物({building_id})')
-    print(f"要預訂的建築物: {building_name} (ID: {building_id})")
+def csv_line(row):
+    """將一列資料轉為 CSV 字串（含換行）"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(row)
+    return buffer.getvalue()
 
-    # 啟動 Chrome driver - 使用 webdriver-manager
-    options = webdriver.ChromeOptions()
-    options.add_experimental_option("detach", True)
-    # options.binary_location = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
-    options.binary_location = "/usr/bin/google-chrome"    
-    try:
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
-        print("✅ ChromeDriver 初始化成功 (booking)")
-    except Exception as e:
-        print(f"❌ ChromeDriver 初始化失敗 (booking): {e}")
-        return jsonify({'error': f'瀏覽器驅動程式初始化失敗: {e}'}), 500
+
+def resolve_stream_format(data):
+    """
+    決定串流格式：請求參數 format 優先，其次依 Accept 標頭，預設 CSV
     
-    # 打開頁面
-    driver.get('https://booking.cathayholdings.com/frontend/mrm101w/index?')
+    Returns:
+        str: 'csv' 或 'ndjson'
+    """
+    fmt = (data.get('format') or '').lower()
+    if fmt in STREAM_FORMATS:
+        return fmt
+    best = request.accept_mimetypes.best_match(list(STREAM_FORMATS.values()))
+    return 'ndjson' if best == STREAM_FORMATS['ndjson'] else 'csv'
 
-    # time.sleep(2)
-    driver.implicitly_wait(10)
 
-    # 登錄過程
-    username = os.getenv('BOOKING_USERNAME')
-    password = os.getenv('BOOKING_PASSWORD')
+def render_stream_error(fmt, day, building_id, building_name, message):
+    """
+    將查詢失敗的日期 / 建築物轉為串流輸出的文字片段（串流已開始，無法再改 HTTP 狀態碼）
+
+    NDJSON 為帶 error 欄位的一行；CSV 為第一欄是 #ERROR 的一列
+    """
+    if fmt == 'ndjson':
+        return json.dumps({'error': message, 'date': day, 'building_id': building_id, 'building_name': building_name},
+                          ensure_ascii=False) + '\n'
+    return csv_line([STREAM_ERROR_MARKER, day, building_name, message])
+
+
+def render_stream_rows(meetings, fmt, building_id, period):
+    """將一個時段解析出的會議記錄（MeetingBatch）轉為串流輸出的文字片段"""
+    if fmt == 'ndjson':
+        return ''.join(
+            json.dumps({**dict(zip(CSV_FIELDNAMES, record.to_row())), 'building_id': building_id, 'period': period},
+                       ensure_ascii=False) + '\n'
+            for record in meetings
+        )
+    return ''.join(csv_line(record.to_row()) for record in meetings)
+
+
+def day_cached(day, buildings):
+    """該日所有建築物是否都已在快取中"""
+    return all(_result_cache.peek(building_id, day) for building_id in buildings)
+
+
+def range_cache_status(dates, buildings, refresh=False):
+    """
+    串流回應的 X-Cache 值：以 (建築物, 日期) 為單位計算命中比例
+
+    Returns:
+        str: HIT、MISS 或 PARTIAL
+    """
+    if refresh:
+        return cache_status(0, len(dates) * len(buildings))
+    hits = sum(_result_cache.peek(building_id, day) for day in dates for building_id in buildings)
+    return cache_status(hits, len(dates) * len(buildings))
+
+
+def iter_range_parsed(dates, buildings, engine, refresh=False):
+    """
+    依日期順序產生各建築物解析後的上下午頁面；快取已齊全的日期直接取用，
+    其餘連續日期在同一個 session 中爬取並寫入快取
     
-    if not username or not password:
-        driver.quit()
-        return jsonify({'error': '環境變數中缺少帳號或密碼'}), 500
+    Yields:
+        Tuple[str, List[ParsedPage], Optional[dict]]: (日期, [上午, 下午], 失敗資訊)；
+            查詢失敗或資料不完整時頁面為空，失敗資訊為 {building_id, building_name, error}
+    """
+    for cached, run in groupby(dates, key=lambda day: not refresh and day_cached(day, buildings)):
+        run = list(run)
+        if cached:
+            for day in run:
+                for building_id in buildings:
+                    pages = _result_cache.get(building_id, day)
+                    if pages is not None:
+                        yield day, sorted(pages, key=lambda page: page.period != 'MORNING'), None
+            continue
+
+        for day, building_id, building_name, morning, afternoon, error in iter_range_pages(run, buildings, engine):
+            if morning is None or afternoon is None:
+                if error is None:
+                    print(f"❌ {day} {building_name} 數據收集不完整，跳過")
+                    inc('errors_total', kind='incomplete_building')
+                yield day, [], {'building_id': building_id, 'building_name': building_name,
+                                'error': error or '數據收集不完整'}
+                continue
+            pages = list(parse(collect(building_id, building_name, day, morning, afternoon)))
+            _result_cache.put(building_id, day, tuple(pages))
+            record_history(pages)
+            yield day, pages, None
+
+
+def generate_meeting_stream(dates, buildings, engine, fmt, refresh=False):
+    """
+    逐建築物、逐時段解析並輸出會議記錄，不寫入任何中間檔案
     
-    email = driver.find_element(By.NAME, 'username')
-    email.send_keys(username)
-    password_field = driver.find_element(By.ID, 'KEY')
-    password_field.send_keys(password)
+    Args:
+        dates (List[str]): 查詢日期列表 (YYYY/MM/DD)
+        buildings (List[str]): 建築物 ID 列表
+        engine (str): 'http' 或 'selenium'
+        fmt (str): 'csv' 或 'ndjson'
+        refresh (bool): 略過快取，全部重新爬取
+        
+    Yields:
+        str: CSV 或 NDJSON 文字片段
+    """
+    start_time = time.time()
+    total_meetings = 0
+    duplicates = 0
+    unparsed = 0
+    failures = 0
+    done_days = set()
 
-    # 點擊登入按鈕
-    login_button = driver.find_element(By.ID, 'btnLogin')
-    login_button.click()
+    if fmt == 'csv':
+        yield csv_line(CSV_FIELDNAMES)
 
-    # time.sleep(5)
-    driver.implicitly_wait(10)
+    for day, pages, failure in iter_range_parsed(dates, buildings, engine, refresh):
+        if failure is not None:
+            failures += 1
+            yield render_stream_error(fmt, day, failure['building_id'], failure['building_name'], failure['error'])
+        # 同一建築物同一天的上下午頁面共用去重集合，跨中午的會議只輸出一次
+        seen = set()
+        for page in pages:
+            with span('render'):
+                meetings, dropped = page.meetings.unique(seen)
+                chunk = render_stream_rows(meetings, fmt, page.building_id, page.period)
+            total_meetings += len(meetings)
+            duplicates += dropped
+            yield chunk
+            if page.unparsed:
+                unparsed += len(page.unparsed)
+                yield render_stream_error(fmt, day, page.building_id, page.building_name,
+                                          f'{page.period} {len(page.unparsed)} 筆時間格式無法解析的記錄未輸出')
 
-    # 選擇開始日期
-    start_date_input = driver.find_element(By.ID, 'startDate')
-    driver.execute_script(f"""
-        var input = arguments[0];
-        input.value = '{start_date}';
-        var event = new Event('change', {{ bubbles: true }});
-        input.dispatchEvent(event);
-    """, start_date_input)
-
-    # time.sleep(1)
-    driver.implicitly_wait(10)
+        if len(dates) > 1 and day not in done_days:
+            done_days.add(day)
+            print(f"📆 區間查詢進度 {len(done_days)}/{len(dates)} 天 - 已耗時 {time.time() - start_time:.2f} 秒")
 
-    # 選擇結束日期
-    end_date_input = driver.find_element(By.ID, 'endDate')
-    driver.execute_script(f"""
-        var input = arguments[0];
-        input.value = '{end_date}';
-        var event = new Event('change', {{ bubbles: true }});
-        input.dispatchEvent(event);
-    """, end_date_input)
-
-    # time.sleep(1)
+    print(f"🏁 串流查詢完成 - {len(dates)} 天，{total_meetings} 筆記錄（移除重複 {duplicates} 筆，"
+          f"時間無法解析 {unparsed} 筆，失敗 {failures} 個建築物日），總耗時 {time.time() - start_time:.2f} 秒")
+
+
+# API 路由：查詢一段日期區間，在同一個登入 session 中逐日爬取並串流回傳
+@app.route('/run/range', methods=['POST'])
+def run_booking_range():
+    data = request.json or {}
+
+    if not os.getenv('BOOKING_USERNAME') or not os.getenv('BOOKING_PASSWORD'):
+        return jsonify({'error': '環境變數中缺少帳號或密碼'}), 500
+
+    start_date = data.get('start_date')
+    end_date = data.get('end_date', start_date)
+    if not start_date:
+        return jsonify({'error': '缺少 start_date'}), 400
+    try:
+        dates = date_range(start_date, end_date)
+    except ValueError as e:
+        return jsonify({'error': f'日期區間錯誤: {e}'}), 400
+
+    max_days = int(os.getenv('RANGE_MAX_DAYS', '366'))
+    if len(dates) > max_days:
+        return jsonify({'error': f'日期區間超過上限 {max_days} 天'}), 400
+
+    buildings = data.get('buildings', ['6'])
+    if isinstance(buildings, str):
+        buildings = [buildings]
+    engine = resolve_engine(data.get('engine'))
+    fmt = resolve_stream_format(data)
+    refresh = bool(data.get('refresh'))
+
+    print(f"🗓️ 區間查詢 {start_date} ~ {end_date}（{len(dates)} 天）- 建築物: {[BUILDING_CONFIG.get(b, f'未知建築物({b})') for b in buildings]}")
+
+    response = Response(stream_with_context(generate_meeting_stream(dates, buildings, engine, fmt, refresh)),
+                        mimetype=STREAM_FORMATS[fmt])
+    response.headers['X-Cache'] = range_cache_status(dates, buildings, refresh)
+    return response
+
+
+# API 路由：查詢歷史會議記錄（需設定 HISTORY_DB_PATH）
+@app.route('/history', methods=['GET'])
+def get_history():
+    if _history_store is None:
+        return jsonify({'error': '未啟用歷史資料庫，請設定環境變數 HISTORY_DB_PATH'}), 503
+
+    args = request.args
+    try:
+        limit = int(args['limit']) if args.get('limit') else None
+    except ValueError:
+        return jsonify({'error': 'limit 必須為整數'}), 400
+    organizer_match = (args.get('organizer_match') or 'contains').lower()
+    if organizer_match not in ORGANIZER_MATCH_MODES:
+        return jsonify({'error': f"organizer_match 必須為 {' 或 '.join(ORGANIZER_MATCH_MODES)}"}), 400
+
+    meetings = _history_store.query(
+        room=args.get('room'),
+        date_from=args.get('from'),
+        date_to=args.get('to'),
+        building=args.get('building'),
+        organizer=args.get('organizer'),
+        limit=limit,
+        organizer_match=organizer_match
+    )
+
+    if (args.get('format') or '').lower() == 'csv':
+        content = csv_line(HISTORY_FIELDS) + ''.join(csv_line([m[f] for f in HISTORY_FIELDS]) for m in meetings)
+        return Response(content, mimetype='text/csv')
+    return jsonify({'count': len(meetings), 'meetings': meetings})
+
+
+def preflight_enabled():
+    """依環境變數 BOOK_PREFLIGHT 決定送出預訂前是否先檢查時段衝突，預設開啟"""
+    return os.getenv('BOOK_PREFLIGHT', 'true').lower() not in ('0', 'false', 'no', 'off')
+
+
+def load_schedule(building_id, query_date, engine='selenium', browser=True):
+    """
+    取得單一建築物當天的解析結果：優先使用快取，否則重新爬取並寫入快取
+
+    Args:
+        engine (str): 快取未命中時的查詢引擎
+        browser (bool): False 時只用快取與 HTTP 引擎，HTTP 失敗也不退回 Selenium（dry_run 不啟動瀏覽器）
+
+    Returns:
+        Tuple[ParsedPage, ...]: 上下午頁面的解析結果
+
+    Raises:
+        CrawlError: 無法取得該建築物的時間表
+        DriverPoolTimeout: 等不到可用的瀏覽器
+    """
+    pages = _result_cache.get(building_id, query_date)
+    if pages is not None:
+        return pages
+
+    if browser:
+        all_building_data = crawl(query_date, [building_id], engine)
+    else:
+        try:
+            all_building_data = crawl_buildings_http(query_date, [building_id])
+        except Exception as e:
+            raise CrawlError(f'HTTP 引擎查詢失敗: {e}')
+    if not all_building_data:
+        raise CrawlError('沒有成功收集到該建築物的數據')
+    pages = tuple(parse(sorted(all_building_data[0]['captures'], key=page_sort_key)))
+    _result_cache.put(building_id, query_date, pages)
+    record_history(pages)
+    return pages
+
+
+def booked_slot_info(room, slot):
+    """已預訂時段轉為回應中的衝突說明"""
+    return {'room': room, 'time': slot.time_info, 'subject': slot.subject, 'organizer': slot.organizer}
+
+
+def find_conflicts(availability, room_number, time_from, time_to):
+    """
+    查詢與欲預訂時段重疊的會議
+
+    Returns:
+        List[dict]: 重疊的會議（room、time、subject、organizer），沒有衝突時為空列表
+    """
+    room = availability.resolve_room(room_number) or room_number
+    return [booked_slot_info(room, slot)
+            for slot in availability.conflicts(room_number, to_minutes(time_from), to_minutes(time_to))]
+
+
+def parse_booking_window(time_from, time_to):
+    """
+    檢查預訂時段格式
+
+    Returns:
+        Optional[str]: 錯誤訊息，格式正確時為 None
+    """
+    try:
+        start, end = to_minutes(time_from), to_minutes(time_to)
+    except (AttributeError, ValueError):
+        return f'時間格式錯誤，應為 HH:MM: {time_from}~{time_to}'
+    if end <= start:
+        return f'結束時間必須晚於開始時間: {time_from}~{time_to}'
+    return None
+
+
+# API 路由：查詢時段內的空閒會議室，回傳排序後的空檔而非整份 CSV
+@app.route('/free-slots', methods=['GET'])
+def get_free_slots():
+    args = request.args
+    building_id = args.get('building') or args.get('building_id') or '6'
+    query_date = args.get('date')
+    if not query_date:
+        return jsonify({'error': '缺少 date 參數 (YYYY/MM/DD)'}), 400
+    query_date = normalize_date(query_date)
+
+    time_from = args.get('from') or os.getenv('FREE_SLOTS_DAY_START', '08:00')
+    time_to = args.get('to') or os.getenv('FREE_SLOTS_DAY_END', '18:00')
+    window_error = parse_booking_window(time_from, time_to)
+    if window_error:
+        return jsonify({'error': window_error}), 400
+    window_start, window_end = to_minutes(time_from), to_minutes(time_to)
+
+    try:
+        duration = int(args.get('duration') or window_end - window_start)
+        limit = int(args['limit']) if args.get('limit') else None
+    except ValueError:
+        return jsonify({'error': 'duration 與 limit 必須為整數（分鐘 / 筆數）'}), 400
+    if duration <= 0:
+        return jsonify({'error': 'duration 必須大於 0'}), 400
+
+    if not os.getenv('BOOKING_USERNAME') or not os.getenv('BOOKING_PASSWORD'):
+        return jsonify({'error': '環境變數中缺少帳號或密碼'}), 500
+
+    try:
+        pages = load_schedule(building_id, query_date, resolve_engine(args.get('engine')))
+    except DriverPoolTimeout as e:
+        return jsonify({'error': f'瀏覽器忙碌中，請稍後再試: {e}'}), 503
+    except Exception as e:
+        print(f"❌ 無法取得建築物 {building_id} {query_date} 的時間表: {e}")
+        return jsonify({'error': f'無法取得時間表: {e}'}), 500
+
+    availability = AvailabilityIndex.from_pages(pages, query_date)
+    free_rooms = availability.find_free_rooms(window_start, window_end, duration)
+    room_filter = args.get('room')
+    if room_filter:
+        free_rooms = [(room, free) for room, free in free_rooms if room_filter in room]
+    total = len(free_rooms)
+    if limit is not None:
+        free_rooms = free_rooms[:limit]
+
+    print(f"🟢 {building_id} {query_date} {time_from}~{time_to} 可連續使用 {duration} 分鐘的會議室 {total} 間")
+    return jsonify({
+        'building_id': building_id,
+        'building_name': BUILDING_CONFIG.get(building_id, f'未知建築物({building_id})'),
+        'date': query_date,
+        'from': format_minutes(window_start),
+        'to': format_minutes(window_end),
+        'duration': duration,
+        'count': total,
+        'rooms': [{
+            'room': room,
+            'fully_free': free[0] == (window_start, window_end),
+            'slots': [{'from': format_minutes(slot.start), 'to': format_minutes(slot.end), 'minutes': slot.minutes}
+                      for slot in free]
+        } for room, free in free_rooms]
+    })
+
+
+def perform_booking(driver, building_id, room_number, start_date, end_date, meeting_subject,
+                    time_from_value, time_to_value, attendance_number='1'):
+    """
+    在已登入的瀏覽器中完成一筆會議室預訂
+    
+    Args:
+        driver: 位於 mrm101w/index 的已登入 Chrome WebDriver
+        building_id (str): 建築物 ID
+        room_number (str): 會議室名稱（時間表上顯示的名稱，或可唯一辨識的部分名稱）
+        start_date (str): 開始日期 (YYYY/MM/DD)
+        end_date (str): 結束日期 (YYYY/MM/DD)
+        meeting_subject (str): 會議名稱
+        time_from_value (str): 開始時間 (HH:MM)
+        time_to_value (str): 結束時間 (HH:MM)
+        attendance_number (str): 與會人數
+        
+    Raises:
+        UnknownRoomError: 該建築物的時間表中找不到此會議室
+    """
+    building_name = BUILDING_CONFIG.get(building_id, f'未知建築物({building_id})')
     driver.implicitly_wait(10)
 
+    # 選擇開始與結束日期
+    set_query_date(driver, start_date, end_date)
+
     # 選擇大樓
     dropdown = driver.find_element(By.ID, 'searchBeanBuildingPK')
     select = Select(dropdown)
-    select.select_by_value(building_id)
+    # 等待舊建築物的時間表被替換、新時間表載入後，從索引取得對應房間的預訂按鈕
+    if not select_building(driver, select, building_id):
+        raise TimeoutException(f'選擇建築物 {building_name} 後時間表沒有更新')
     print(f"已選擇建築物: {building_name} (ID: {building_id})")
 
-    # time.sleep(3)
-    driver.implicitly_wait(10)
-
-    # 點擊對應房間的按鈕
-    # xpath_value = meeting_room_xpath.get(room_number)
-    xpath_value = songren_room_xpath.get(room_number)
-    book_btn = driver.find_element(By.XPATH, xpath_value)
+    book_btn = driver.find_element(*_room_index.locate(driver, building_id, room_number))
     book_btn.click()
 
-    # time.sleep(1)
-    driver.implicitly_wait(10)
-
     # 填寫會議名稱
     input_box = driver.find_element(By.ID, 'subject')
     input_box.clear()
@@ -677,16 +1455,13 @@ def book_meeting_room():
     time_from = WebDriverWait(driver, 10).until(
         EC.presence_of_element_located((By.ID, 'mrm101w3_appointmentTime_timeFrom'))
     )
-    driver.execute_script(f'arguments[0].value = "{time_from_value}";', time_from)
+    driver.execute_script('arguments[0].value = arguments[1];', time_from, time_from_value)
 
     # 設置結束時間
     time_to = WebDriverWait(driver, 10).until(
         EC.presence_of_element_located((By.ID, 'mrm101w3_appointmentTime_timeTo'))
     )
-    driver.execute_script(f'arguments[0].value = "{time_to_value}";', time_to)
-
-    # time.sleep(1)
-    driver.implicitly_wait(10)
+    driver.execute_script('arguments[0].value = arguments[1];', time_to, time_to_value)
 
     # 填寫人數
     attendance = driver.find_element(By.ID, 'attendance')
@@ -696,19 +1471,288 @@ def book_meeting_room():
     next_step = driver.find_element(By.ID, 'getBookRoomStatus')
     next_step.click()
 
-    # time.sleep(4)
-    driver.implicitly_wait(10)
-
     # 最終提交
-    go_book = driver.find_element(By.ID, 'goBooking')
+    go_book = WebDriverWait(driver, _page_waiter.timeout).until(
+        EC.element_to_be_clickable((By.ID, 'goBooking'))
+    )
     go_book.click()
 
-    time.sleep(15)
-    # driver.implicitly_wait(10)
-    driver.quit()
+    # 等待送出後的頁面載入完成，取代固定等待 15 秒
+    submit_start = time.time()
+    if _page_waiter.submission(driver, go_book):
+        print(f"📨 預訂已送出 - 等待 {time.time() - submit_start:.2f} 秒")
+    else:
+        print(f"⚠️ 預訂送出後 {_page_waiter.submit_timeout:.0f} 秒內頁面沒有回應")
+
+
+@app.route('/book', methods=['POST'])
+def book_meeting_room():
+    # 從請求中獲取輸入
+    data = request.get_json()
+    room_number = data.get('room_number', '3303')  # 默認房間號
+    start_date = data.get('start_date', '2024/09/19')
+    end_date = start_date
+    meeting_subject = data.get('meeting_subject', '技術討論')
+    time_from_value = data.get('time_from', '08:00')
+    time_to_value = data.get('time_to', '09:00')
+
+    # 取得要預訂的建築物，如果沒有指定則使用預設值 (A3置地廣場)
+    building_id = data.get('building_id', '6')
+    building_name = BUILDING_CONFIG.get(building_id, f'未知建築物({building_id})')
+    print(f"要預訂的建築物: {building_name} (ID: {building_id})")
+
+    # dry_run 只檢查時段是否可預訂，不開啟預訂表單
+    dry_run = bool(data.get('dry_run'))
+
+    window_error = parse_booking_window(time_from_value, time_to_value)
+    if window_error:
+        return jsonify({'error': window_error}), 400
+
+    if not os.getenv('BOOKING_USERNAME') or not os.getenv('BOOKING_PASSWORD'):
+        return jsonify({'error': '環境變數中缺少帳號或密碼'}), 500
+
+    # 送出前先以當天的時間表檢查衝突，衝突時不必操作預訂表單
+    if dry_run or preflight_enabled():
+        try:
+            pages = load_schedule(building_id, start_date, resolve_engine(data.get('engine')), browser=not dry_run)
+            availability = AvailabilityIndex.from_pages(pages, normalize_date(start_date))
+            conflicts = find_conflicts(availability, room_number, time_from_value, time_to_value)
+        except (CrawlError, DriverPoolTimeout) as e:
+            if dry_run:
+                print(f"❌ 無法取得 {building_name} 的時間表 (dry_run): {e}")
+                return jsonify({'error': f'無法取得時間表，請稍後再試: {e}'}), 503
+            print(f"⚠️ 無法取得 {building_name} 的時間表，略過衝突檢查: {e}")
+            conflicts = []
+        except Exception as e:
+            if dry_run:
+                print(f"❌ 衝突檢查失敗 (dry_run): {e}")
+                return jsonify({'error': f'衝突檢查失敗: {e}'}), 500
+            print(f"⚠️ 衝突檢查失敗，直接送出預訂: {e}")
+            conflicts = []
+
+        if conflicts:
+            print(f"⛔ {room_number} {start_date} {time_from_value}~{time_to_value} 與 {len(conflicts)} 筆會議重疊")
+            return jsonify({'error': '預訂時段與既有會議重疊', 'conflicts': conflicts}), 409
+        if dry_run:
+            return jsonify({'status': 'available', 'dry_run': True,
+                            'message': 'Time slot is available'})
+
+    # 借用已登入的瀏覽器，預訂完成後由連線池重置回查詢頁
+    try:
+        with get_driver_pool().checkout() as driver:
+            print("✅ 已取得登入中的瀏覽器 (booking)")
+            try:
+                with span('booking'):
+                    perform_booking(driver, building_id, room_number, start_date, end_date, meeting_subject,
+                                    time_from_value, time_to_value)
+            except UnknownRoomError as e:
+                # 會議室名稱錯誤與瀏覽器狀態無關，在借用區塊內處理，瀏覽器照常歸還連線池而不被回收
+                print(f"❌ {building_name} 沒有會議室 {room_number}")
+                return jsonify({'error': f'未知的會議室: {room_number}', 'available_rooms': e.available}), 400
+    except DriverPoolTimeout as e:
+        print(f"❌ 瀏覽器忙碌中 (booking): {e}")
+        return jsonify({'error': f'瀏覽器忙碌中，請稍後再試: {e}'}), 503
+    except Exception as e:
+        print(f"❌ 預訂失敗 (booking): {e}")
+        return jsonify({'error': f'預訂失敗: {e}'}), 500
+
+    # 預訂成功後該建築物當天的查詢結果已變動
+    _result_cache.invalidate(building_id, {start_date, end_date})
 
     return jsonify({'status': 'success', 'message': 'Meeting room booked successfully!'})
 
+
+# 批次預訂每個項目的必填欄位
+BATCH_BOOKING_FIELDS = ('building_id', 'room_number', 'date', 'time_from', 'time_to', 'subject')
+
+
+def normalize_batch_item(position, item):
+    """
+    整理批次預訂的單一項目（接受 /book 的 start_date / meeting_subject 寫法）
+    
+    Returns:
+        dict: 項目內容與 index（原始順序），缺少欄位時含 error
+    """
+    item = item if isinstance(item, dict) else {}
+    booking = {
+        'index': position,
+        'building_id': str(item.get('building_id', '')),
+        'room_number': item.get('room_number'),
+        'date': item.get('date') or item.get('start_date'),
+        'time_from': item.get('time_from'),
+        'time_to': item.get('time_to'),
+        'subject': item.get('subject') or item.get('meeting_subject'),
+        'attendance': str(item.get('attendance', '1')),
+    }
+    missing = [field for field in BATCH_BOOKING_FIELDS if not booking[field]]
+    if missing:
+        booking['error'] = f'缺少欄位: {", ".join(missing)}'
+    else:
+        window_error = parse_booking_window(booking['time_from'], booking['time_to'])
+        if window_error:
+            booking['error'] = window_error
+    return booking
+
+
+def return_to_index(driver):
+    """預訂完成後回到 mrm101w/index 查詢頁，準備下一筆預訂"""
+    driver.get(booking_index_url())
+    WebDriverWait(driver, _page_waiter.timeout).until(
+        EC.presence_of_element_located((By.ID, 'startDate'))
+    )
+
+
+def load_group_availability(building_id, query_date):
+    """
+    取得批次預訂一組（建築物/日期）的可用性索引；BOOK_PREFLIGHT 關閉或無法取得時間表時回傳 None
+
+    Returns:
+        Optional[AvailabilityIndex]: 可用性索引
+    """
+    if not preflight_enabled():
+        return None
+    try:
+        pages = load_schedule(building_id, query_date, resolve_engine())
+    except Exception as e:
+        print(f"⚠️ 無法取得建築物 {building_id} {query_date} 的時間表，略過衝突檢查: {e}")
+        return None
+    return AvailabilityIndex.from_pages(pages, normalize_date(query_date))
+
+
+def book_group(bookings):
+    """
+    在同一個已登入的瀏覽器中依序預訂同一建築物、同一天的多個時段
+    
+    送出前先以當天的時間表檢查衝突；預訂成功的時段會加入索引，
+    同一批次中彼此重疊的項目只有第一筆會送出
+    
+    Args:
+        bookings (List[dict]): normalize_batch_item() 整理後的項目
+        
+    Returns:
+        List[dict]: 每個項目的結果（index、status、error、elapsed，衝突時另含 conflicts）
+    """
+    results = []
+    availability = load_group_availability(bookings[0]['building_id'], bookings[0]['date'])
+    if availability is not None:
+        pending = []
+        for booking in bookings:
+            conflicts = find_conflicts(availability, booking['room_number'], booking['time_from'], booking['time_to'])
+            if conflicts:
+                print(f"⛔ 批次預訂 #{booking['index']} {booking['room_number']} "
+                      f"{booking['time_from']}~{booking['time_to']} 與 {len(conflicts)} 筆會議重疊")
+                results.append({'index': booking['index'], 'status': 'failed', 'error': '預訂時段與既有會議重疊',
+                                'conflicts': conflicts, 'elapsed': 0.0})
+            else:
+                pending.append(booking)
+        bookings = pending
+        if not bookings:
+            return results
+
+    try:
+        with get_driver_pool().checkout() as driver:
+            for position, booking in enumerate(bookings):
+                if position:
+                    return_to_index(driver)
+                item_start = time.time()
+                result = {'index': booking['index'], 'status': 'success'}
+                try:
+                    if availability is not None:
+                        conflicts = find_conflicts(availability, booking['room_number'],
+                                                   booking['time_from'], booking['time_to'])
+                        if conflicts:
+                            # 與同一批次中先前成功預訂的項目重疊
+                            result.update(status='failed', error='預訂時段與既有會議重疊', conflicts=conflicts,
+                                          elapsed=0.0)
+                            results.append(result)
+                            continue
+                    with span('booking'):
+                        perform_booking(driver, booking['building_id'], booking['room_number'], booking['date'],
+                                        booking['date'], booking['subject'], booking['time_from'],
+                                        booking['time_to'], booking['attendance'])
+                    _result_cache.invalidate(booking['building_id'], [booking['date']])
+                    if availability is not None:
+                        availability.add(availability.resolve_room(booking['room_number']) or booking['room_number'],
+                                         to_minutes(booking['time_from']), to_minutes(booking['time_to']),
+                                         f"{normalize_date(booking['date'])} {booking['time_from']}~{booking['time_to']}",
+                                         booking['subject'])
+                except UnknownRoomError as e:
+                    result.update(status='failed', error=f'未知的會議室: {booking["room_number"]}',
+                                  available_rooms=e.available)
+                except Exception as e:
+                    result.update(status='failed', error=f'預訂失敗: {e}')
+                result['elapsed'] = round(time.time() - item_start, 2)
+                print(f"{'✅' if result['status'] == 'success' else '❌'} 批次預訂 #{booking['index']} "
+                      f"{booking['room_number']} {booking['date']} {booking['time_from']}~{booking['time_to']} "
+                      f"- {result['elapsed']:.2f} 秒")
+                results.append(result)
+    except DriverPoolTimeout as e:
+        error = f'瀏覽器忙碌中，請稍後再試: {e}'
+    except Exception as e:
+        error = f'預訂失敗: {e}'
+    else:
+        return results
+
+    # 借不到瀏覽器或回到查詢頁失敗：尚未處理的項目標記為失敗
+    done = {result['index'] for result in results}
+    results.extend({'index': booking['index'], 'status': 'failed', 'error': error}
+                   for booking in bookings if booking['index'] not in done)
+    return results
+
+
+# API 路由：批次預訂，依建築物與日期分組後在同一個登入 session 中完成
+@app.route('/book/batch', methods=['POST'])
+def book_meeting_rooms_batch():
+    start_time = time.time()
+    data = request.get_json() or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'items 必須為非空的列表'}), 400
+
+    max_items = int(os.getenv('BOOK_BATCH_MAX_ITEMS', '100'))
+    if len(items) > max_items:
+        return jsonify({'error': f'單次批次預訂上限為 {max_items} 筆'}), 400
+
+    if not os.getenv('BOOKING_USERNAME') or not os.getenv('BOOKING_PASSWORD'):
+        return jsonify({'error': '環境變數中缺少帳號或密碼'}), 500
+
+    bookings = [normalize_batch_item(position, item) for position, item in enumerate(items)]
+    results = [{'index': booking['index'], 'status': 'failed', 'error': booking['error']}
+               for booking in bookings if 'error' in booking]
+
+    # 依 (建築物, 日期) 分組，保持項目原本的先後順序；2025/07/18 與 2025-07-18 視為同一天
+    groups = {}
+    for booking in bookings:
+        if 'error' not in booking:
+            groups.setdefault((booking['building_id'], normalize_date(booking['date'])), []).append(booking)
+
+    print(f"📚 批次預訂 {len(items)} 筆 - {len(groups)} 組（建築物/日期）")
+    if groups:
+        # 全部項目都未通過檢查時不建立瀏覽器連線池
+        concurrency = int(data.get('concurrency') or os.getenv('BOOK_BATCH_CONCURRENCY', '1'))
+        workers = max(1, min(concurrency, get_driver_pool().size, len(groups)))
+        print(f"🧵 批次預訂平行數 {workers}")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='book') as executor:
+            for group_results in executor.map(book_group, groups.values()):
+                results.extend(group_results)
+
+    # 依原始順序回傳每個項目的結果
+    results.sort(key=lambda result: result['index'])
+    for result in results:
+        result.update({field: bookings[result['index']][field] for field in BATCH_BOOKING_FIELDS})
+
+    succeeded = sum(1 for result in results if result['status'] == 'success')
+    status = 'success' if succeeded == len(results) else ('partial' if succeeded else 'failed')
+    print(f"🏁 批次預訂完成 - 成功 {succeeded}/{len(results)}，總耗時 {time.time() - start_time:.2f} 秒")
+
+    return jsonify({
+        'status': status,
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'elapsed': round(time.time() - start_time, 2),
+        'results': results
+    })
+
 # 新增 API 端點：取得可用的建築物列表
 @app.route('/buildings', methods=['GET'])
 def get_buildings():
@@ -720,6 +1764,64 @@ def get_buildings():
         'message': '可用的建築物列表'
     })
 
-# 啟動 Flask 應用
+def shutdown_service(timeout=None):
+    """
+    優雅關閉：拒絕新的爬蟲 / 預訂請求並等待進行中的請求、背景工作結束，再關閉所有瀏覽器
+    
+    可重複呼叫（gunicorn worker_exit 與 atexit 都會呼叫），只有第一次會執行
+    
+    Args:
+        timeout (float, optional): 等待進行中請求與工作的總秒數，預設為環境變數 SHUTDOWN_DRAIN_TIMEOUT（30）
+    """
+    global _shutdown_done
+    with _shutdown_lock:
+        if _shutdown_done:
+            return
+        _shutdown_done = True
+
+    timeout = float(os.getenv('SHUTDOWN_DRAIN_TIMEOUT', '30')) if timeout is None else timeout
+    deadline = time.time() + timeout
+    print(f"🛑 開始關閉服務 - 最多等待 {timeout:.0f} 秒讓進行中的查詢完成")
+
+    remaining_requests = _route_limiter.drain(timeout)
+    remaining_jobs = _job_queue.shutdown(wait=True, timeout=max(0.0, deadline - time.time()))
+    if remaining_requests or remaining_jobs:
+        print(f"⚠️ 等待逾時：仍有 {remaining_requests} 個請求、{remaining_jobs} 個背景工作未完成")
+
+    if _driver_pool is not None:
+        _driver_pool.close(timeout=max(0.0, deadline - time.time()))
+    _chrome_lifecycle.shutdown()
+    if _http_pool is not None:
+        _http_pool.close()
+    print("✅ 服務已關閉，所有瀏覽器已結束")
+
+
+def create_app():
+    """
+    建立（取得）API 服務：正式環境由 wsgi.py 以 gunicorn 載入，並在行程結束時優雅關閉
+    
+    瀏覽器連線池、快取、背景工作與瀏覽器行程回收都是行程內的全域狀態，每個行程只有一個 app
+    
+    Returns:
+        Flask: API 服務
+    """
+    if not app.config.get('SHUTDOWN_REGISTERED'):
+        atexit.register(shutdown_service)
+        app.config['SHUTDOWN_REGISTERED'] = True
+        # 啟動時即開始掃描，回收先前崩潰的 worker 留下的 Chrome
+        _chrome_lifecycle.start()
+        # 啟動時解析一次 ChromeDriver，之後新開瀏覽器不再檢查版本或連線下載
+        resolve_chromedriver()
+    return app
+
+
+# 開發用：直接執行時以 Flask 內建伺服器啟動；正式環境請使用 gunicorn -c gunicorn.conf.py wsgi:app
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    import signal
+
+    # SIGTERM（docker stop、systemd）比照 Ctrl-C 結束伺服器，再由 atexit 優雅關閉
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    # 不使用 reloader：reloader 會多開一個行程，各自建立瀏覽器連線池
+    create_app().run(host=os.getenv('HOST', '0.0.0.0'), port=int(os.getenv('PORT', '5000')),
+                     debug=os.getenv('FLASK_DEBUG', 'false').lower() in ('1', 'true', 'yes'),
+                     use_reloader=False, threaded=True)
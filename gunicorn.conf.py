@@ -0,0 +1,49 @@
+"""
+Gunicorn 設定
+
+啟動方式: gunicorn -c gunicorn.conf.py wsgi:app
+
+瀏覽器連線池、查詢結果快取與背景工作佇列都在行程內，多開 worker 會各自啟動一組 Chrome、
+快取也不共用，因此預設只用 1 個 worker，以執行緒（gthread）處理並行請求；
+執行緒數依 DRIVER_POOL_SIZE 決定：/run 的並行上限（連線池大小 x 2，見 ROUTE_CONCURRENCY）
+加上 /health、/metrics、/jobs 查詢等不需瀏覽器的請求
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_pool_size = max(1, int(os.getenv('DRIVER_POOL_SIZE', '2')))
+_drain_timeout = float(os.getenv('SHUTDOWN_DRAIN_TIMEOUT', '30'))
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv('GUNICORN_WORKERS', '1'))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS') or _pool_size * 2 + 4)
+
+# gthread 的 timeout 只檢查 worker 是否仍有回應，長時間的 /run/range 不會因此被中斷
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+# 收到 SIGTERM 後等待進行中請求的時間，需涵蓋 shutdown_service() 的等待時間
+graceful_timeout = int(_drain_timeout) + 15
+keepalive = 5
+
+# 不預先載入：背景工作執行緒與連線池必須在 worker 行程內建立，fork 後才不會遺失
+preload_app = False
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def worker_int(worker):
+    """Ctrl-C / SIGQUIT 時同樣結束瀏覽器"""
+    from booking_meeting_room_api import shutdown_service
+    shutdown_service(timeout=0)
+
+
+def worker_exit(server, worker):
+    """worker 停止接收請求後：等待背景工作完成並結束所有瀏覽器"""
+    from booking_meeting_room_api import shutdown_service
+    shutdown_service()
@@ -1,12 +1,12 @@
 from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.common.by import By
 import os
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from dotenv import load_dotenv
 
+from utils.chromedriver import chromedriver_service
+
 load_dotenv()
 
 username = os.getenv('BOOKING_USERNAME')
@@ -26,9 +26,9 @@ options.add_argument('--disable-notifications')
 options.add_experimental_option('useAutomationExtension', False)
 options.add_experimental_option("excludeSwitches", ["enable-automation"])
 
-# 使用 webdriver-manager 自動管理 ChromeDriver
+# ChromeDriver：CHROMEDRIVER_PATH 或版本快取，必要時才由 webdriver-manager 下載
 try:
-    service = Service(ChromeDriverManager().install())
+    service = chromedriver_service()
     driver = webdriver.Chrome(service=service, options=options)
     print("✅ ChromeDriver 初始化成功")
 except Exception as e:
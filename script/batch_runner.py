@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+會議室資料批次查詢工具
+
+取代各建築物各一份的 batch_query_*_2024.sh：以執行緒池平行查詢任意建築物與日期區間，
+每個 (建築物, 日期) 輸出一個 {建築物名稱}_{YYYYMMDD}.csv（格式與原腳本相同，可直接匯入歷史資料庫）
+
+- 速率限制：token bucket 控制每秒送出的查詢數（含重試）
+- 重試：網路錯誤、5xx 與 429 以指數退避重試，429 / 503 依 Retry-After 等待
+- 續跑：完成的項目記錄在輸出目錄的 checkpoint.jsonl，中斷後重新執行會略過
+- 進度：定期顯示已完成數、成功 / 失敗、每分鐘查詢數與預估剩餘時間
+
+使用方式:
+1. 查詢松仁、瑞湖大樓 2024 全年: python script/batch_runner.py --year 2024 --buildings 6 12
+2. 指定日期區間: python script/batch_runner.py --start 2024/03/01 --end 2024/03/31 --buildings 6
+3. 不經過 API 服務，直接在本行程中查詢: python script/batch_runner.py --year 2024 --buildings 6 --mode inprocess
+4. 調整平行數與速率: python script/batch_runner.py --year 2024 --buildings 6 --workers 4 --rate 1.5
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.buildings import BUILDING_CONFIG  # noqa: E402
+
+CHECKPOINT_FILE = 'checkpoint.jsonl'
+ERROR_LOG_FILE = 'batch_error_log.txt'
+CSV_HEADER_PREFIX = '會議室'
+
+
+class TokenBucket:
+    """
+    執行緒安全的 token bucket 速率限制
+
+    Args:
+        rate (float): 每秒補充的 token 數（即長期平均每秒查詢數）
+        burst (int): 最多累積的 token 數
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        取得一個 token，不足時等待
+
+        Returns:
+            float: 等待的秒數
+        """
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class RetryableError(Exception):
+    """可重試的查詢失敗；retry_after 為伺服器要求的等待秒數"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class WorkItem(NamedTuple):
+    building_id: str
+    date: str
+
+
+def date_range(start: str, end: str) -> List[str]:
+    """列出 start 到 end（含）的所有日期 (YYYY/MM/DD)"""
+    current = datetime.strptime(start, '%Y/%m/%d')
+    last = datetime.strptime(end, '%Y/%m/%d')
+    dates = []
+    while current <= last:
+        dates.append(current.strftime('%Y/%m/%d'))
+        current += timedelta(days=1)
+    return dates
+
+
+def output_path(output_dir: str, building_name: str, date: str) -> str:
+    """{建築物名稱}_{YYYYMMDD}.csv，與 batch_query_*.sh 的輸出檔名相同"""
+    return os.path.join(output_dir, f"{building_name}_{date.replace('/', '')}.csv")
+
+
+class Checkpoint:
+    """
+    以 JSON Lines 記錄已完成的項目，中斷後可續跑
+
+    Args:
+        path (str): checkpoint 檔案路徑
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.done: Set[Tuple[str, str]] = set()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # 中斷時寫到一半的最後一行
+                    self.done.add((entry['building_id'], entry['date']))
+
+    def __contains__(self, item: WorkItem) -> bool:
+        return (item.building_id, item.date) in self.done
+
+    def record(self, item: WorkItem, **fields) -> None:
+        with self._lock:
+            self.done.add((item.building_id, item.date))
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'building_id': item.building_id, 'date': item.date, **fields},
+                                   ensure_ascii=False) + '\n')
+
+
+class ProgressMeter:
+    """批次進度與吞吐量統計（執行緒安全）"""
+
+    def __init__(self, total: int, skipped: int = 0):
+        self.total = total
+        self.skipped = skipped
+        self.succeeded = 0
+        self.failed = 0
+        self.retries = 0
+        self.throttled = 0.0
+        self.started = time.monotonic()
+        self._recent: List[float] = []
+        self._lock = threading.Lock()
+
+    def add(self, ok: bool, retries: int = 0, throttled: float = 0.0) -> None:
+        with self._lock:
+            if ok:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            self.retries += retries
+            self.throttled += throttled
+            self._recent.append(time.monotonic())
+
+    @property
+    def processed(self) -> int:
+        return self.succeeded + self.failed
+
+    def snapshot(self, window: float = 60.0) -> Dict[str, float]:
+        """目前的進度、每分鐘完成數（最近 window 秒）與預估剩餘秒數"""
+        with self._lock:
+            now = time.monotonic()
+            self._recent = [stamp for stamp in self._recent if now - stamp <= window]
+            elapsed = now - self.started
+            recent_span = min(window, elapsed) or 1.0
+            per_second = len(self._recent) / recent_span
+            remaining = self.total - self.processed
+            return {
+                'processed': self.processed,
+                'succeeded': self.succeeded,
+                'failed': self.failed,
+                'per_minute': per_second * 60,
+                'eta': remaining / per_second if per_second else float('inf'),
+                'elapsed': elapsed,
+            }
+
+    def report(self) -> None:
+        stats = self.snapshot()
+        percent = stats['processed'] * 100 // self.total if self.total else 100
+        eta = '--' if stats['eta'] == float('inf') else format_duration(stats['eta'])
+        print(f"📈 進度 {percent}% | {stats['processed']}/{self.total} | 成功 {stats['succeeded']} | "
+              f"失敗 {stats['failed']} | {stats['per_minute']:.1f} 筆/分 | 剩餘約 {eta}")
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f'{hours}h{minutes:02d}m{seconds:02d}s' if hours else f'{minutes}m{seconds:02d}s'
+
+
+def retry_after_seconds(response) -> Optional[float]:
+    try:
+        return float(response.headers.get('Retry-After', ''))
+    except ValueError:
+        return None
+
+
+def api_fetcher(base_url: str, engine: Optional[str], timeout: float) -> Callable[[WorkItem], str]:
+    """
+    經由 POST {base_url}/run 查詢
+
+    Returns:
+        Callable[[WorkItem], str]: 回傳 CSV 內容的查詢函式
+    """
+    session = requests.Session()
+
+    def fetch(item: WorkItem) -> str:
+        body = {'date': item.date, 'buildings': [item.building_id]}
+        if engine:
+            body['engine'] = engine
+        try:
+            response = session.post(f'{base_url}/run', json=body, timeout=timeout,
+                                    headers={'Accept': 'text/csv; charset=utf-8'})
+        except requests.RequestException as e:
+            raise RetryableError(f'網路錯誤: {e}')
+        if response.status_code == 429 or response.status_code >= 500:
+            raise RetryableError(f'HTTP {response.status_code}: {response.text[:200]}', retry_after_seconds(response))
+        if response.status_code != 200:
+            raise ValueError(f'HTTP {response.status_code}: {response.text[:200]}')
+        response.encoding = 'utf-8'
+        return response.text.lstrip('\ufeff')
+
+    return fetch
+
+
+def inprocess_fetcher(engine: Optional[str]) -> Callable[[WorkItem], str]:
+    """
+    直接呼叫 booking_meeting_room_api.query_meetings()，不需要啟動 API 服務
+
+    與 API 服務相同經過 create_app()：解析 ChromeDriver 並啟動瀏覽器行程回收；
+    查詢結束後須呼叫 shutdown_service() 結束本行程啟動的瀏覽器
+
+    Returns:
+        Callable[[WorkItem], str]: 回傳 CSV 內容的查詢函式
+    """
+    import booking_meeting_room_api as api
+    from utils.driver_pool import DriverPoolTimeout
+    from utils.http_engine import resolve_engine
+
+    resolved_engine = resolve_engine(engine)
+    api.create_app()
+
+    def fetch(item: WorkItem) -> str:
+        try:
+            return api.query_meetings(item.date, [item.building_id], resolved_engine)['csv']
+        except (api.CrawlError, DriverPoolTimeout) as e:
+            raise RetryableError(str(e))
+
+    return fetch
+
+
+def load_building_names(mode: str, base_url: str) -> Dict[str, str]:
+    """建築物 ID -> 名稱：inprocess 模式取自 utils.buildings，api 模式由 GET /buildings 取得"""
+    if mode == 'inprocess':
+        return dict(BUILDING_CONFIG)
+    response = requests.get(f'{base_url}/buildings', timeout=10)
+    response.raise_for_status()
+    return response.json()['buildings']
+
+
+class BatchRunner:
+    """
+    以執行緒池平行查詢每個 (建築物, 日期) 並寫入 CSV
+
+    Args:
+        fetch (Callable[[WorkItem], str]): 查詢函式，回傳 CSV 內容；可重試的錯誤應拋出 RetryableError
+        output_dir (str): 輸出目錄
+        building_names (Dict[str, str]): 建築物 ID -> 名稱（用於檔名）
+        workers (int): 平行查詢數
+        bucket (TokenBucket): 速率限制
+        retries (int): 每個項目最多重試次數
+        backoff (float): 第一次重試前的等待秒數，之後每次加倍（另加 0~50% 隨機抖動）
+    """
+
+    def __init__(self, fetch: Callable[[WorkItem], str], output_dir: str, building_names: Dict[str, str],
+                 workers: int = 3, bucket: Optional[TokenBucket] = None, retries: int = 3, backoff: float = 2.0):
+        self.fetch = fetch
+        self.output_dir = output_dir
+        self.building_names = building_names
+        self.workers = workers
+        self.bucket = bucket or TokenBucket(0)
+        self.retries = retries
+        self.backoff = backoff
+        self.checkpoint = Checkpoint(os.path.join(output_dir, CHECKPOINT_FILE))
+        self._error_lock = threading.Lock()
+        self.meter: Optional[ProgressMeter] = None
+
+    def log_error(self, item: WorkItem, message: str) -> None:
+        with self._error_lock, open(os.path.join(self.output_dir, ERROR_LOG_FILE), 'a', encoding='utf-8') as f:
+            f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} - {item.building_id} {item.date} - {message}\n")
+
+    def run_item(self, item: WorkItem) -> None:
+        """查詢單一項目，必要時重試，成功後寫入 CSV 並記錄 checkpoint"""
+        building_name = self.building_names.get(item.building_id, item.building_id)
+        attempts = 0
+        throttled = 0.0
+        while True:
+            throttled += self.bucket.acquire()
+            try:
+                content = self.fetch(item)
+                if not content.startswith(CSV_HEADER_PREFIX):
+                    raise RetryableError(f'回應不是 CSV: {content[:100]!r}')
+                break
+            except RetryableError as e:
+                if attempts >= self.retries:
+                    self._finish(item, False, attempts, throttled, str(e))
+                    return
+                delay = e.retry_after if e.retry_after is not None else self.backoff * (2 ** attempts)
+                delay *= 1 + random.random() * 0.5
+                attempts += 1
+                print(f"🔁 {building_name} {item.date} 第 {attempts} 次重試（{delay:.1f} 秒後）: {e}")
+                time.sleep(delay)
+            except Exception as e:
+                self._finish(item, False, attempts, throttled, str(e))
+                return
+
+        path = output_path(self.output_dir, building_name, item.date)
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w', newline='', encoding='utf-8-sig') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+        meetings = max(0, content.count('\n') - 1)
+        self.checkpoint.record(item, meetings=meetings, file=os.path.basename(path))
+        self._finish(item, True, attempts, throttled)
+
+    def _finish(self, item: WorkItem, ok: bool, retries: int, throttled: float, error: str = '') -> None:
+        self.meter.add(ok, retries, throttled)
+        if not ok:
+            print(f"❌ {item.building_id} {item.date} 查詢失敗: {error}")
+            self.log_error(item, error)
+
+    def run(self, items: List[WorkItem], report_interval: float = 10.0) -> ProgressMeter:
+        """
+        執行所有尚未完成的項目
+
+        Returns:
+            ProgressMeter: 統計結果
+        """
+        pending = [item for item in items if item not in self.checkpoint]
+        self.meter = ProgressMeter(len(pending), skipped=len(items) - len(pending))
+        print(f"🚀 共 {len(items)} 項，略過已完成 {self.meter.skipped} 項，待查詢 {len(pending)} 項 - "
+              f"平行數 {self.workers}，速率上限 {self.bucket.rate or '無'} 次/秒")
+
+        stop = threading.Event()
+
+        def monitor():
+            while not stop.wait(report_interval):
+                self.meter.report()
+
+        monitor_thread = threading.Thread(target=monitor, name='batch-progress', daemon=True)
+        monitor_thread.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='batch') as executor:
+                list(executor.map(self.run_item, pending))
+        finally:
+            stop.set()
+            monitor_thread.join()
+        self.meter.report()
+        return self.meter
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批次查詢多個建築物、一段日期區間的會議室資料')
+    period = parser.add_mutually_exclusive_group(required=True)
+    period.add_argument('--year', type=int, help='查詢整年，例如 2024')
+    period.add_argument('--start', help='開始日期 YYYY/MM/DD（搭配 --end）')
+    parser.add_argument('--end', help='結束日期 YYYY/MM/DD')
+    parser.add_argument('--buildings', nargs='+', required=True, help='建築物 ID，例如 6 12')
+    parser.add_argument('--mode', choices=['api', 'inprocess'], default='api',
+                        help='api：呼叫 API 服務的 /run（預設）；inprocess：直接在本行程中查詢')
+    parser.add_argument('--api-url', default=os.getenv('BATCH_API_URL', 'http://localhost:5000'), help='API 服務位址')
+    parser.add_argument('--engine', help='查詢引擎 http 或 selenium，預設依 API 設定')
+    parser.add_argument('--output-dir', help='輸出目錄，預設 ./batch_data_{開始日期}_{結束日期}')
+    parser.add_argument('--workers', type=int, default=3, help='平行查詢數（預設 3）')
+    parser.add_argument('--rate', type=float, default=2.0, help='每秒最多送出的查詢數，0 表示不限制（預設 2）')
+    parser.add_argument('--retries', type=int, default=3, help='每個項目最多重試次數（預設 3）')
+    parser.add_argument('--backoff', type=float, default=2.0, help='第一次重試前等待秒數，之後加倍（預設 2）')
+    parser.add_argument('--timeout', type=float, default=120, help='單次查詢逾時秒數（api 模式）')
+    parser.add_argument('--report-interval', type=float, default=10, help='進度顯示間隔秒數')
+    args = parser.parse_args()
+
+    if args.year:
+        start, end = f'{args.year}/01/01', f'{args.year}/12/31'
+    else:
+        if not args.end:
+            parser.error('--start 需搭配 --end')
+        start, end = args.start, args.end
+    try:
+        dates = date_range(start, end)
+    except ValueError:
+        parser.error('日期格式應為 YYYY/MM/DD')
+
+    output_dir = args.output_dir or f"./batch_data_{start.replace('/', '')}_{end.replace('/', '')}"
+    os.makedirs(output_dir, exist_ok=True)
+    base_url = args.api_url.rstrip('/')
+
+    try:
+        building_names = load_building_names(args.mode, base_url)
+    except Exception as e:
+        print(f"❌ 無法取得建築物列表，請確認 API 服務正在 {base_url} 運行: {e}")
+        sys.exit(1)
+
+    fetch = (inprocess_fetcher(args.engine) if args.mode == 'inprocess'
+             else api_fetcher(base_url, args.engine, args.timeout))
+    runner = BatchRunner(fetch, output_dir, building_names, workers=max(1, args.workers),
+                         bucket=TokenBucket(args.rate, burst=max(1, args.workers)),
+                         retries=args.retries, backoff=args.backoff)
+
+    # 依日期排序，同一天的各建築物相鄰，快取與登入 session 可以重複利用
+    items = [WorkItem(building_id, day) for day in dates for building_id in args.buildings]
+    try:
+        meter = runner.run(items, args.report_interval)
+    finally:
+        if args.mode == 'inprocess':
+            # 結束連線池中的瀏覽器，不留下 Chrome / chromedriver 行程（中斷時也會執行）
+            from booking_meeting_room_api import shutdown_service
+            shutdown_service()
+
+    stats = meter.snapshot()
+    print("📊 執行統計：")
+    print(f"   🏢 建築物: {', '.join(building_names.get(b, b) for b in args.buildings)}")
+    print(f"   📅 日期: {start} ~ {end}（{len(dates)} 天）")
+    print(f"   ✅ 成功: {meter.succeeded}，❌ 失敗: {meter.failed}，⏭️ 略過: {meter.skipped}")
+    print(f"   🔁 重試: {meter.retries} 次，⏳ 速率限制等待: {meter.throttled:.1f} 秒")
+    print(f"   🏁 總耗時: {format_duration(stats['elapsed'])}"
+          + (f"，平均每項 {stats['elapsed'] / meter.processed:.2f} 秒" if meter.processed else ''))
+    print(f"📁 輸出目錄: {output_dir}")
+    if meter.failed:
+        print(f"⚠️ 有 {meter.failed} 項查詢失敗，請檢查 {os.path.join(output_dir, ERROR_LOG_FILE)}；重新執行即可只補查失敗的項目")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+會議資訊解析器效能測試
+比較 utils/extract_meeting_info.py 的單次掃描解析器與舊版實作（逐按鈕反向搜尋會議室）
+在實際存檔頁面上的速度，並確認兩者輸出完全一致
+
+使用方式:
+1. 測試單一檔案: python tool/benchmark_parser.py tmp/6_20250718_morning.html
+2. 測試整個目錄: python tool/benchmark_parser.py archive/
+3. 指定重複次數: python tool/benchmark_parser.py "archive/2024*/*.html" --repeat 20
+"""
+
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.extract_meeting_info import extract_meeting_info  # noqa: E402
+
+
+def legacy_extract_meeting_info(html_content: str) -> List[List[str]]:
+    """舊版解析器（未編譯樣式、每個按鈕以 O(會議室數) 反向搜尋所屬會議室），僅供比較用"""
+    results = []
+
+    date_match = re.search(r'value="(20\d{2}/\d{2}/\d{2})"', html_content)
+    query_date = date_match.group(1) if date_match else "2025/07/18"
+
+    room_pattern = r'<div class="Title ToggleTitle"[^>]*>.*?<div class="Room">([^<]+)</div>'
+    room_matches = re.finditer(room_pattern, html_content, re.DOTALL)
+    button_pattern = r'<button[^>]+class="[^"]*Calendar_block[^"]*meetingRecordBtn[^"]*"[^>]*>(.*?)</button>'
+    button_matches = re.finditer(button_pattern, html_content, re.DOTALL)
+
+    rooms = {}
+    for room_match in room_matches:
+        rooms[room_match.start()] = room_match.group(1).strip()
+    sorted_room_positions = sorted(rooms.keys())
+
+    for button_match in button_matches:
+        button_content = button_match.group(1)
+        button_position = button_match.start()
+
+        room_name = None
+        for i in range(len(sorted_room_positions) - 1, -1, -1):
+            if sorted_room_positions[i] < button_position:
+                room_name = rooms[sorted_room_positions[i]]
+                break
+        if not room_name:
+            continue
+
+        meeting_name_match = re.search(r'<div class="Company textDis">([^<]+)</div>', button_content)
+        if not meeting_name_match:
+            meeting_name_match = re.search(r'<div class="Company text\s*Dis">([^<]+)</div>', button_content)
+        if not meeting_name_match:
+            continue
+        meeting_name = meeting_name_match.group(1).strip()
+
+        department_match = re.search(r'<div class="Department">([^<]+)</div>', button_content)
+        department = department_match.group(1).strip() if department_match else ''
+        section_match = re.search(r'<div class="Section">([^<]+?)(?:\s*<span[^>]*>[^<]*</span>)?</div>', button_content)
+        person = section_match.group(1).strip() if section_match else ''
+
+        button_tag = button_match.group(0)
+        start_time_match = re.search(r'data-starttime="([^"]+)"', button_tag)
+        end_time_match = re.search(r'data-endtime="([^"]+)"', button_tag)
+        if not (start_time_match and end_time_match):
+            continue
+        time_info = f"{query_date} {start_time_match.group(1)}~{end_time_match.group(1)}"
+
+        organizer = f"{department} {person}".strip() if department or person else ''
+        results.append([room_name, time_info, meeting_name, organizer])
+
+    return results
+
+
+def expand_paths(patterns: List[str]) -> List[str]:
+    """展開檔案、目錄與萬用字元，回傳排序後的 HTML 檔案列表"""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files.extend(glob.glob(os.path.join(pattern, '**', '*.html'), recursive=True))
+        else:
+            files.extend(glob.glob(pattern, recursive=True))
+    return sorted(set(files))
+
+
+def time_parser(parser, pages: List[str], repeat: int) -> float:
+    """回傳解析全部頁面一次的最佳耗時（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for html_content in pages:
+            parser(html_content)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比較新舊會議資訊解析器的速度與輸出')
+    parser.add_argument('paths', nargs='+', help='HTML 檔案、目錄或萬用字元')
+    parser.add_argument('--repeat', type=int, default=5, help='重複次數，取最佳值（預設 5）')
+    args = parser.parse_args()
+
+    files = expand_paths(args.paths)
+    if not files:
+        print("❌ 找不到任何 HTML 檔案")
+        sys.exit(1)
+
+    pages = []
+    for html_file in files:
+        with open(html_file, 'r', encoding='utf-8-sig') as f:
+            pages.append(f.read())
+    total_bytes = sum(len(page.encode('utf-8')) for page in pages)
+    print(f"📁 共 {len(pages)} 個頁面，{total_bytes / 1024 / 1024:.2f} MB")
+
+    # 確認輸出一致
+    mismatches = 0
+    meetings = 0
+    for html_file, html_content in zip(files, pages):
+        expected = legacy_extract_meeting_info(html_content)
+        actual = extract_meeting_info(html_content)
+        meetings += len(actual)
+        if expected != actual:
+            mismatches += 1
+            print(f"⚠️ 輸出不一致: {html_file}（舊版 {len(expected)} 筆，新版 {len(actual)} 筆）")
+    print(f"🔍 輸出比對：{len(pages) - mismatches}/{len(pages)} 頁一致，共 {meetings} 筆會議")
+
+    legacy_time = time_parser(legacy_extract_meeting_info, pages, args.repeat)
+    current_time = time_parser(extract_meeting_info, pages, args.repeat)
+    print(f"🐢 舊版解析器: {legacy_time * 1000:.1f} ms（{len(pages) / legacy_time:.0f} 頁/秒）")
+    print(f"🚀 單次掃描解析器: {current_time * 1000:.1f} ms（{len(pages) / current_time:.0f} 頁/秒）")
+    print(f"📊 加速倍數: {legacy_time / current_time:.2f}x")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+瀏覽器內擷取（EXTRACT_MODE=js）與 extract_meeting_info() 的一致性檢查
+以 headless Chrome 開啟存檔的時間表頁面，比對兩種方式取得的會議記錄與會議室列表，
+並比較傳輸量：整份 page_source 與 execute_script 回傳的精簡 JSON
+
+沒有 Chrome 時使用 --offline：優先讀取與頁面同名的 .payload.json（以 --record 在有 Chrome
+的環境錄製的 EXTRACT_MEETINGS_JS 回傳值），沒有錄製檔時以 replay_extract_js() 在 Python 中
+依 EXTRACT_MEETINGS_JS 相同的選擇器走訪 DOM 產生回傳值，再交給 rows_to_meetings() 比對；
+benchmark/bench.py 每次執行前都會以此方式檢查 benchmark/fixtures/
+
+使用方式:
+1. 檢查單一檔案: python tool/check_dom_extract.py tmp/6_20250718_morning.html
+2. 檢查整個目錄: python tool/check_dom_extract.py archive/
+3. 不啟動瀏覽器: python tool/check_dom_extract.py --offline benchmark/fixtures/
+4. 錄製回傳值: python tool/check_dom_extract.py --record benchmark/fixtures/
+
+注意：HTML 實體（例如 &amp;）在瀏覽器中會被解碼，比對時會先將 extract_meeting_info() 的結果解碼
+"""
+
+import argparse
+import glob
+import html
+import json
+import os
+import sys
+import time
+from html.parser import HTMLParser
+from typing import List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.dom_extract import EXTRACT_MEETINGS_JS, rows_to_meetings  # noqa: E402
+from utils.extract_meeting_info import extract_meetings_and_rooms  # noqa: E402
+
+PAYLOAD_SUFFIX = '.payload.json'
+
+# 沒有結束標籤的元素
+_VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param',
+              'source', 'track', 'wbr'}
+_QUERY_DATE_LENGTH = len('2025/07/18')
+
+
+def normalize(meetings):
+    """解碼 HTML 實體並去除前後空白，讓兩種擷取方式可以直接比較"""
+    return [[html.unescape(field).strip() for field in meeting] for meeting in meetings]
+
+
+def normalize_rooms(rooms):
+    """會議室名稱的比較格式（與 normalize() 相同的解碼）"""
+    return [html.unescape(room).strip() for room in rooms]
+
+
+class _Element:
+    """replay_extract_js() 使用的簡化 DOM 節點，子節點為 _Element 或文字（str）"""
+
+    def __init__(self, tag, attrs, parent):
+        self.tag = tag
+        self.attrs = {name: value or '' for name, value in attrs}
+        self.classes = set(self.attrs.get('class', '').split())
+        self.parent = parent
+        self.children = []
+
+    def iter(self):
+        """依文件順序走訪所有後代元素（不含自己）"""
+        for child in self.children:
+            if isinstance(child, _Element):
+                yield child
+                yield from child.iter()
+
+    def text_content(self):
+        return ''.join(child if isinstance(child, str) else child.text_content() for child in self.children)
+
+    def query(self, *classes):
+        """第一個同時具有所有 class 的後代元素，同 querySelector('.A.B')"""
+        return next((el for el in self.iter() if el.classes.issuperset(classes)), None)
+
+    def has_ancestor(self, tag, *classes):
+        node = self.parent
+        while node is not None:
+            if node.tag == tag and node.classes.issuperset(classes):
+                return True
+            node = node.parent
+        return False
+
+
+class _TreeBuilder(HTMLParser):
+    """以 html.parser 建立簡化 DOM；未對應的結束標籤會關閉到最近的同名元素為止"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = _Element('#document', [], None)
+        self._stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        element = _Element(tag, attrs, self._stack[-1])
+        self._stack[-1].children.append(element)
+        if tag not in _VOID_TAGS:
+            self._stack.append(element)
+
+    def handle_startendtag(self, tag, attrs):
+        self._stack[-1].children.append(_Element(tag, attrs, self._stack[-1]))
+
+    def handle_endtag(self, tag):
+        for depth in range(len(self._stack) - 1, 0, -1):
+            if self._stack[depth].tag == tag:
+                del self._stack[depth:]
+                return
+
+    def handle_data(self, data):
+        self._stack[-1].children.append(data)
+
+
+def _is_query_date(value: str) -> bool:
+    return (len(value) == _QUERY_DATE_LENGTH and value.startswith('20') and value[4] == '/' and value[7] == '/'
+            and (value[2:4] + value[5:7] + value[8:]).isdigit())
+
+
+def replay_extract_js(html_content: str) -> Optional[dict]:
+    """
+    在 Python 中重演 EXTRACT_MEETINGS_JS：以相同的選擇器與取值規則走訪 DOM，
+    回傳與 execute_script 相同格式的 {date, rows, rooms}，不需要瀏覽器
+
+    修改 EXTRACT_MEETINGS_JS 時需同步修改此函式，並以 --record 在有 Chrome 的環境重新錄製
+
+    Args:
+        html_content (str): 時間表頁面 HTML
+
+    Returns:
+        Optional[dict]: 回傳值，頁面沒有時間表時為 None（同 JS 的 null）
+    """
+    builder = _TreeBuilder()
+    builder.feed(html_content)
+    builder.close()
+    elements = list(builder.root.iter())
+
+    if not any(el.attrs.get('id') == 'timeTableMeetingRoom' for el in elements):
+        return None
+
+    query_date = next((el.attrs['value'] for el in elements
+                       if el.tag == 'input' and 'value' in el.attrs and _is_query_date(el.attrs['value'])), None)
+
+    def text(root, *classes):
+        el = root.query(*classes)
+        return el.text_content().strip() if el is not None else ''
+
+    rows = []
+    rooms = []
+    room = None
+    for node in elements:
+        if node.tag == 'div' and 'Room' in node.classes and node.has_ancestor('div', 'Title', 'ToggleTitle'):
+            room = node.text_content().strip()
+            if room not in rooms:
+                rooms.append(room)
+            continue
+        if node.tag != 'button' or not node.classes.issuperset(('Calendar_block', 'meetingRecordBtn')):
+            continue
+        if not room:
+            continue
+
+        subject = text(node, 'Company', 'textDis') or text(node, 'Company', 'text', 'Dis')
+        start = node.attrs.get('data-starttime')
+        end = node.attrs.get('data-endtime')
+        if not subject or not start or not end:
+            continue
+
+        person = ''
+        section = node.query('Section')
+        if section is not None and section.children and isinstance(section.children[0], str):
+            person = section.children[0].strip()
+        rows.append([room, start, end, subject, text(node, 'Department'), person])
+    return {'date': query_date, 'rows': rows, 'rooms': rooms}
+
+
+def compare_payload(html_content: str, payload: Optional[dict]) -> List[str]:
+    """
+    比對 EXTRACT_MEETINGS_JS 回傳值與 extract_meetings_and_rooms() 的結果
+
+    Returns:
+        List[str]: 不一致的說明，一致時為空列表
+    """
+    expected_meetings, expected_rooms = extract_meetings_and_rooms(html_content)
+    expected = normalize(expected_meetings)
+    actual = normalize(rows_to_meetings(payload['rows'], payload.get('date'))) if payload else []
+    problems = []
+    if expected != actual:
+        problems.append(f"會議記錄不一致（extract_meeting_info {len(expected)} 筆，瀏覽器內 {len(actual)} 筆）")
+        for left, right in zip(expected, actual):
+            if left != right:
+                problems.append(f"{left}\n   {right}")
+                break
+    actual_rooms = normalize_rooms(payload.get('rooms') or []) if payload else []
+    if normalize_rooms(expected_rooms) != actual_rooms:
+        problems.append(f"會議室列表不一致（extract_meeting_info {len(expected_rooms)} 間，瀏覽器內 {len(actual_rooms)} 間）")
+    return problems
+
+
+def load_payload(html_file: str) -> Tuple[Optional[dict], str]:
+    """
+    取得頁面的 EXTRACT_MEETINGS_JS 回傳值：有錄製檔時讀取錄製檔，否則以 replay_extract_js() 產生
+
+    Returns:
+        Tuple[Optional[dict], str]: (回傳值, 來源 'recorded' 或 'replay')
+    """
+    recorded = html_file + PAYLOAD_SUFFIX
+    if os.path.exists(recorded):
+        with open(recorded, 'r', encoding='utf-8') as f:
+            return json.load(f), 'recorded'
+    with open(html_file, 'r', encoding='utf-8-sig') as f:
+        return replay_extract_js(f.read()), 'replay'
+
+
+def check_offline(files: List[str]) -> int:
+    """
+    不啟動瀏覽器比對每個頁面，只檢查有時間表的頁面
+
+    Returns:
+        int: 不一致的頁面數
+    """
+    mismatches = 0
+    checked = 0
+    for html_file in files:
+        with open(html_file, 'r', encoding='utf-8-sig') as f:
+            html_content = f.read()
+        payload, source = load_payload(html_file)
+        if payload is None and not extract_meetings_and_rooms(html_content)[0]:
+            continue
+        checked += 1
+        problems = compare_payload(html_content, payload)
+        if problems:
+            mismatches += 1
+            print(f"⚠️ 輸出不一致: {html_file}（{source}）")
+            for problem in problems:
+                print(f"   {problem}")
+    print(f"🔍 離線輸出比對：{checked - mismatches}/{checked} 頁一致")
+    return mismatches
+
+
+def expand_paths(patterns):
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files.extend(glob.glob(os.path.join(pattern, '**', '*.html'), recursive=True))
+        else:
+            files.extend(glob.glob(pattern, recursive=True))
+    return sorted(set(files))
+
+
+def check_in_browser(files: List[str], show: bool, record: bool) -> int:
+    """
+    以 headless Chrome 比對每個頁面並統計傳輸量，record 時將回傳值存為 <頁面>.payload.json
+
+    Returns:
+        int: 不一致的頁面數
+    """
+    from selenium import webdriver
+
+    from utils.chromedriver import chromedriver_service
+    from utils.driver_pool import build_chrome_options
+
+    options = build_chrome_options()
+    if not show:
+        options.add_argument('--headless=new')
+    driver = webdriver.Chrome(service=chromedriver_service(), options=options)
+
+    mismatches = 0
+    source_bytes = 0
+    json_bytes = 0
+    source_time = 0.0
+    script_time = 0.0
+    try:
+        for html_file in files:
+            with open(html_file, 'r', encoding='utf-8-sig') as f:
+                html_content = f.read()
+            driver.get('file://' + os.path.abspath(html_file))
+
+            start = time.perf_counter()
+            page_source = driver.page_source
+            source_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            payload = driver.execute_script(EXTRACT_MEETINGS_JS)
+            script_time += time.perf_counter() - start
+
+            source_bytes += len(page_source.encode('utf-8'))
+            json_bytes += len(json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+
+            if record and payload is not None:
+                with open(html_file + PAYLOAD_SUFFIX, 'w', encoding='utf-8') as f:
+                    json.dump(payload, f, ensure_ascii=False, indent=1)
+                print(f"💾 已錄製: {html_file}{PAYLOAD_SUFFIX}")
+
+            problems = compare_payload(html_content, payload)
+            if problems:
+                mismatches += 1
+                print(f"⚠️ 輸出不一致: {html_file}")
+                for problem in problems:
+                    print(f"   {problem}")
+    finally:
+        driver.quit()
+
+    print(f"🔍 輸出比對：{len(files) - mismatches}/{len(files)} 頁一致")
+    print(f"📦 傳輸量：page_source {source_bytes / 1024:.1f} KB，瀏覽器內擷取 {json_bytes / 1024:.1f} KB"
+          f"（{source_bytes / max(1, json_bytes):.1f}x）")
+    print(f"⏱️ 傳輸耗時：page_source {source_time * 1000:.0f} ms，execute_script {script_time * 1000:.0f} ms")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比對瀏覽器內擷取與 extract_meeting_info() 的結果')
+    parser.add_argument('paths', nargs='+', help='HTML 檔案、目錄或萬用字元')
+    parser.add_argument('--show', action='store_true', help='顯示瀏覽器視窗（預設 headless）')
+    parser.add_argument('--offline', action='store_true', help='不啟動瀏覽器，使用錄製檔或 Python 重演的回傳值')
+    parser.add_argument('--record', action='store_true', help='將瀏覽器回傳值存為 <頁面>.payload.json')
+    args = parser.parse_args()
+
+    files = expand_paths(args.paths)
+    if not files:
+        print("❌ 找不到任何 HTML 檔案")
+        sys.exit(1)
+
+    if args.offline:
+        mismatches = check_offline(files)
+    else:
+        mismatches = check_in_browser(files, args.show, args.record)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+會議室可用性索引
+
+由 extract_meeting_info() 的解析結果建立「會議室 -> 依開始時間排序的已預訂時段」索引，
+/book 送出前先檢查欲預訂的時段是否與既有會議重疊，衝突時不必開啟瀏覽器即可回覆；
+/free-slots 以合併後的忙碌區間找出時段內的空檔
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from utils.records import MeetingLike, as_record
+
+
+class BookedSlot(NamedTuple):
+    """會議室中一個已被預訂的時段"""
+    start: int
+    end: int
+    time_info: str
+    subject: str
+    organizer: str
+
+
+class FreeSlot(NamedTuple):
+    """會議室中一段沒有會議的時間（分鐘）"""
+    start: int
+    end: int
+
+    @property
+    def minutes(self) -> int:
+        return self.end - self.start
+
+
+class AvailabilityIndex:
+    """
+    單一建築物、單一日期的會議室已預訂時段索引
+
+    Args:
+        meetings (Iterable[MeetingLike]): MeetingBatch / MeetingRecord 或 [會議室名稱, 時間, 會議名稱, 主辦方] 資料列
+        date (str, optional): 只納入此日期 (YYYY/MM/DD) 的會議
+        rooms (Iterable[str]): 時間表上的所有會議室（包含沒有會議的會議室），決定會議室的排列順序
+    """
+
+    def __init__(self, meetings: Iterable[MeetingLike], date: Optional[str] = None, rooms: Iterable[str] = ()):
+        self.rooms: Dict[str, List[BookedSlot]] = {room: [] for room in rooms}
+        self._busy: Dict[str, List[Tuple[int, int]]] = {}
+        for meeting in meetings:
+            record = as_record(meeting)
+            if record is None or (date and record.date != date):
+                continue
+            self.add(record.room, record.start, record.end, record.time_info, record.subject, record.organizer)
+
+    @classmethod
+    def from_pages(cls, pages, date: Optional[str] = None) -> 'AvailabilityIndex':
+        """由 pipeline 的 ParsedPage 建立"""
+        pages = tuple(pages)
+        return cls((meeting for page in pages for meeting in page.meetings), date,
+                   (room for page in pages for room in page.rooms))
+
+    def add(self, room: str, start: int, end: int, time_info: str = '', subject: str = '', organizer: str = '') -> None:
+        """加入一個已預訂時段（重複的記錄只保留一筆）"""
+        slot = BookedSlot(start, end, time_info, subject, organizer)
+        slots = self.rooms.setdefault(room, [])
+        position = bisect_left(slots, slot)
+        if position < len(slots) and slots[position] == slot:
+            return
+        insort(slots, slot)
+        self._busy.pop(room, None)
+
+    def resolve_room(self, room: str) -> Optional[str]:
+        """完全相符優先；否則接受唯一一個包含該名稱的會議室（例如 3303 -> 3303會議室）"""
+        if room in self.rooms:
+            return room
+        candidates = [name for name in self.rooms if room in name]
+        return candidates[0] if len(candidates) == 1 else None
+
+    def conflicts(self, room: str, start: int, end: int) -> List[BookedSlot]:
+        """
+        查詢與 [start, end) 重疊的已預訂時段
+
+        Returns:
+            List[BookedSlot]: 依開始時間排序的重疊時段；會議室當天沒有任何會議時為空列表
+        """
+        name = self.resolve_room(room)
+        if name is None:
+            return []
+        slots = self.rooms[name]
+        # 開始時間早於 end 的時段才可能重疊
+        candidates = slots[:bisect_left(slots, (end,))]
+        return [slot for slot in candidates if slot.end > start]
+
+    def busy(self, room: str) -> List[Tuple[int, int]]:
+        """
+        會議室已合併的忙碌區間（重疊或相鄰的會議合併為一段）
+
+        Returns:
+            List[Tuple[int, int]]: 依時間排序、互不重疊的 (開始分鐘, 結束分鐘)
+        """
+        merged = self._busy.get(room)
+        if merged is None:
+            merged = []
+            for slot in self.rooms.get(room, ()):
+                if merged and slot.start <= merged[-1][1]:
+                    if slot.end > merged[-1][1]:
+                        merged[-1] = (merged[-1][0], slot.end)
+                else:
+                    merged.append((slot.start, slot.end))
+            self._busy[room] = merged
+        return merged
+
+    def free_slots(self, room: str, start: int, end: int, duration: int = 1) -> List[FreeSlot]:
+        """
+        查詢會議室在 [start, end) 之間至少 duration 分鐘的空檔
+
+        Returns:
+            List[FreeSlot]: 依時間排序的空檔
+        """
+        busy = self.busy(room)
+        # 合併後的區間互不重疊，只有開始時間不晚於 start 的最後一段可能跨過 start，之前的都可略過
+        position = max(0, bisect_right(busy, (start, end)) - 1)
+        free = []
+        cursor = start
+        for busy_start, busy_end in busy[position:]:
+            if busy_start >= end:
+                break
+            if busy_start - cursor >= duration:
+                free.append(FreeSlot(cursor, busy_start))
+            cursor = max(cursor, busy_end)
+        if end - cursor >= duration:
+            free.append(FreeSlot(cursor, end))
+        return free
+
+    def find_free_rooms(self, start: int, end: int, duration: int) -> List[Tuple[str, List[FreeSlot]]]:
+        """
+        找出 [start, end) 之間有連續 duration 分鐘空檔的會議室
+
+        排序：整段時間都空著的會議室優先，其次依最長空檔（長到短）、最早空檔、時間表上的順序
+
+        Returns:
+            List[Tuple[str, List[FreeSlot]]]: (會議室名稱, 空檔)
+        """
+        ranked = []
+        for order, room in enumerate(self.rooms):
+            free = self.free_slots(room, start, end, duration)
+            if not free:
+                continue
+            fully_free = free[0] == (start, end)
+            longest = max(slot.minutes for slot in free)
+            ranked.append(((not fully_free, -longest, free[0].start, order), room, free))
+        ranked.sort(key=lambda item: item[0])
+        return [(room, free) for _, room, free in ranked]
@@ -0,0 +1,17 @@
+"""
+建築物配置
+
+建築物 ID -> 名稱，API、歷史資料庫與批次查詢腳本共用；
+放在 utils 中，命令行工具不必為了這份對應表載入整個 Flask 應用程式
+"""
+
+BUILDING_CONFIG = {
+    '4': '仁愛大樓',
+    '6': '松仁大樓',
+    '10': '國泰證券總公司',
+    '12': '瑞湖大樓',
+    '15': '信義安和大樓',
+    '19': '台中忠明大樓',
+    '20': 'A3置地廣場',
+    '22': '高雄資訊開發中心'
+}
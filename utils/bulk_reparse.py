@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大量重新解析存檔的時間表頁面
+
+解析器修正後，以多個行程平行重新解析整年度的 {建築物}_{YYYYMMDD}_{morning|afternoon}.html，
+每個建築物、每天的上下午頁面合併並去除重複後，輸出為單一 CSV 或 Parquet 檔案；
+取代逐檔啟動 python3 的 utils/2_html_filter_*.sh，速度取決於 CPU 核心數而非直譯器啟動時間
+
+使用方式:
+1. 重新解析整個目錄: python utils/bulk_reparse.py archive/ -o output/reparsed.csv
+2. 指定萬用字元: python utils/bulk_reparse.py "archive/6_2024*_*.html" -o output/songren_2024.csv
+3. 輸出 Parquet（需安裝 pyarrow）: python utils/bulk_reparse.py archive/ -o output/reparsed.parquet
+4. 指定行程數: python utils/bulk_reparse.py archive/ -o output/reparsed.csv --workers 8
+"""
+
+import argparse
+import csv
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+from typing import Iterable, List
+
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.convert_to_csv import CSV_FIELDNAMES  # noqa: E402
+from utils.pipeline import ParsedPage, page_sort_key, parse, read_captures  # noqa: E402
+from utils.records import MeetingBatch  # noqa: E402
+
+# 合併輸出的額外欄位：頁面所屬的建築物（取自檔名）
+BULK_CSV_FIELDNAMES = CSV_FIELDNAMES + ['建築物']
+
+PAGE_PATTERNS = ('*_morning.html', '*_afternoon.html')
+
+
+def expand_paths(patterns: Iterable[str]) -> List[str]:
+    """展開檔案、目錄與萬用字元；目錄只納入 *_morning.html / *_afternoon.html"""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for page_pattern in PAGE_PATTERNS:
+                files.extend(glob.glob(os.path.join(pattern, '**', page_pattern), recursive=True))
+        else:
+            files.extend(glob.glob(pattern, recursive=True))
+    return sorted(set(files))
+
+
+def parse_file(html_file: str) -> ParsedPage:
+    """在子行程中解析單一頁面（模組層級函式，供 ProcessPoolExecutor 序列化）"""
+    return next(parse(read_captures([html_file])))
+
+
+def resolve_chunksize(files: int, workers: int) -> int:
+    """每個行程一次領取的檔案數：讓每個行程約分到 4 批，減少行程間往返又不致分配不均"""
+    return max(1, min(64, files // (workers * 4)))
+
+
+def parse_files(files: List[str], workers: int, chunksize: int) -> List[ParsedPage]:
+    """
+    平行解析所有頁面並顯示進度
+
+    Returns:
+        List[ParsedPage]: 與 files 順序相同的解析結果
+    """
+    total = len(files)
+    report_every = max(1, total // 20)
+    start = time.perf_counter()
+    pages = []
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        results = executor.map(parse_file, files, chunksize=chunksize) if executor else map(parse_file, files)
+        for done, page in enumerate(results, 1):
+            pages.append(page)
+            if done % report_every == 0 or done == total:
+                elapsed = time.perf_counter() - start
+                rate = done / elapsed if elapsed else 0.0
+                remaining = (total - done) / rate if rate else 0.0
+                print(f"⏳ {done}/{total} 個檔案（{done * 100 // total}%）- {rate:.1f} 檔/秒，剩餘約 {remaining:.0f} 秒")
+    finally:
+        if executor:
+            executor.shutdown()
+    return pages
+
+
+def merge_days(pages: List[ParsedPage]):
+    """
+    依建築物、日期合併上下午頁面：去除重複並依會議室排列，與 /run 的每日輸出相同
+
+    Yields:
+        Tuple[str, MeetingBatch, int]: (建築物, 當天的會議, 移除的重複筆數)
+    """
+    pages = sorted(pages, key=lambda page: (page.building_id, page.date, page_sort_key(page)))
+    for (building_id, _), day_pages in groupby(pages, key=lambda page: (page.building_id, page.date)):
+        meetings, duplicates = MeetingBatch.concat(page.meetings for page in day_pages).unique()
+        yield building_id, meetings.grouped_by_room(), duplicates
+
+
+def write_csv(days, output_file: str):
+    """
+    寫入合併的 CSV（UTF-8 BOM，欄位為 /run 的四個欄位加上建築物）
+
+    Returns:
+        Tuple[int, int]: (會議數, 移除的重複筆數)
+    """
+    meetings = 0
+    duplicates = 0
+    with open(output_file, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(BULK_CSV_FIELDNAMES)
+        for building_id, batch, dropped in days:
+            writer.writerows(record.to_row() + [building_id] for record in batch)
+            meetings += len(batch)
+            duplicates += dropped
+    return meetings, duplicates
+
+
+def write_parquet(days, output_file: str):
+    """
+    寫入 Parquet：MeetingBatch 的欄位直接對應為 Parquet 欄位，時間另保存為當天的分鐘數
+
+    Returns:
+        Tuple[int, int]: (會議數, 移除的重複筆數)
+
+    Raises:
+        ImportError: 未安裝 pyarrow
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    buildings = []
+    combined = []
+    duplicates = 0
+    for building_id, batch, dropped in days:
+        buildings.extend([building_id] * len(batch))
+        combined.append(batch)
+        duplicates += dropped
+    meetings = MeetingBatch.concat(combined)
+
+    table = pa.table({
+        'building': pa.array(buildings, pa.string()).dictionary_encode(),
+        'date': pa.array(meetings.dates, pa.string()).dictionary_encode(),
+        'room': pa.array(meetings.rooms, pa.string()).dictionary_encode(),
+        'start_minute': pa.array(meetings.starts, pa.uint16()),
+        'end_minute': pa.array(meetings.ends, pa.uint16()),
+        'subject': pa.array(meetings.subjects, pa.string()),
+        'organizer': pa.array(meetings.organizers, pa.string()).dictionary_encode(),
+    })
+    pq.write_table(table, output_file, compression='zstd')
+    return len(meetings), duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description='以多個行程平行重新解析存檔的時間表頁面，輸出單一 CSV / Parquet')
+    parser.add_argument('paths', nargs='+', help='HTML 檔案、目錄或萬用字元')
+    parser.add_argument('-o', '--output', required=True, help='輸出檔案（.csv 或 .parquet）')
+    parser.add_argument('--format', choices=['csv', 'parquet'], help='輸出格式，預設依副檔名判斷')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='解析行程數，預設為 CPU 核心數')
+    parser.add_argument('--chunksize', type=int, help='每個行程一次領取的檔案數，預設自動決定')
+    args = parser.parse_args()
+
+    fmt = args.format or ('parquet' if args.output.endswith('.parquet') else 'csv')
+    if fmt == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("❌ 輸出 Parquet 需要 pyarrow，請先執行 pip install pyarrow，或改用 .csv 輸出")
+            sys.exit(1)
+
+    files = expand_paths(args.paths)
+    if not files:
+        print("❌ 找不到任何 HTML 檔案")
+        sys.exit(1)
+
+    workers = max(1, min(args.workers, len(files)))
+    chunksize = args.chunksize or resolve_chunksize(len(files), workers)
+    total_bytes = sum(os.path.getsize(html_file) for html_file in files)
+    print(f"🚀 開始解析 {len(files)} 個檔案（{total_bytes / 1024 / 1024:.1f} MB）- {workers} 個行程，每批 {chunksize} 個")
+
+    start = time.perf_counter()
+    pages = parse_files(files, workers, chunksize)
+    parse_elapsed = time.perf_counter() - start
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    writer = write_parquet if fmt == 'parquet' else write_csv
+    meetings, duplicates = writer(merge_days(pages), args.output)
+    elapsed = time.perf_counter() - start
+
+    print("📊 效能統計：")
+    print(f"   📄 檔案: {len(files)} 個，{len(files) / parse_elapsed:.1f} 檔/秒，"
+          f"{total_bytes / 1024 / 1024 / parse_elapsed:.1f} MB/秒")
+    print(f"   📝 會議記錄: {meetings} 筆（移除重複 {duplicates} 筆）")
+    print(f"   ⚙️ 解析耗時: {parse_elapsed:.2f} 秒")
+    print(f"   🏁 總耗時: {elapsed:.2f} 秒")
+    print(f"✅ 輸出檔案：{args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,404 @@
+"""
+Chrome 行程生命週期管理
+
+連線池中的每個瀏覽器都登記為一個 session（chromedriver 行程及其底下的 Chrome 行程樹），
+背景執行緒定期掃描行程表：
+1. 借出後（或最近一次 touch 後）超過時間上限、或整個行程樹記憶體超過上限的 session 直接結束行程樹
+   （chromedriver 底下所有子孫行程，不論名稱：nacl_helper、headless shell 等改名的行程也包含在內）
+2. 帶有本服務標記、卻不屬於任何登記中 session 的行程（quit 失敗、worker 被強制結束後留下的
+   孤兒 chrome / chromedriver，以及脫離行程樹的 chrome_crashpad_handler）在寬限時間後結束
+
+行程以環境變數 BOOKING_API_OWNER（建立者的 PID）標記，只會結束本服務啟動的瀏覽器，
+不影響同一台機器上其他 worker 仍在使用或使用者自行開啟的 Chrome；
+有安裝 psutil 時以 psutil 讀取行程表，否則讀取 Linux 的 /proc，兩者皆無時不做掃描
+"""
+
+import os
+import signal
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Set
+
+try:
+    import psutil
+except ImportError:  # 選用套件
+    psutil = None
+
+# 標記本服務啟動的 chromedriver / Chrome 的環境變數（值為建立者的 PID）
+OWNER_ENV = 'BOOKING_API_OWNER'
+
+# chrome_crashpad_handler 啟動時會脫離 Chrome 的行程樹，改以啟動時間對應到同時啟動的 session
+_DETACHED_HELPER = 'crashpad'
+_HELPER_MATCH_SECONDS = 60
+
+
+class ChromeProcess(NamedTuple):
+    """行程表中的一個行程"""
+    pid: int
+    ppid: int
+    name: str
+    started_at: float
+    rss: int  # 位元組
+    owner: Optional[int]  # OWNER_ENV 標記的 PID，未標記為 None
+
+
+def _scan_psutil() -> Dict[int, ChromeProcess]:
+    processes = {}
+    for proc in psutil.process_iter(['pid', 'ppid', 'name', 'create_time', 'memory_info', 'status']):
+        info = proc.info
+        if info.get('status') == psutil.STATUS_ZOMBIE:
+            continue
+        try:
+            owner = proc.environ().get(OWNER_ENV)
+        except (psutil.AccessDenied, psutil.NoSuchProcess, psutil.ZombieProcess):
+            owner = None
+        memory = info.get('memory_info')
+        processes[info['pid']] = ChromeProcess(
+            info['pid'], info.get('ppid') or 0, info.get('name') or '', info.get('create_time') or 0.0,
+            memory.rss if memory else 0, int(owner) if owner and owner.isdigit() else None,
+        )
+    return processes
+
+
+def _boot_time() -> float:
+    with open('/proc/stat', 'r') as f:
+        for line in f:
+            if line.startswith('btime'):
+                return float(line.split()[1])
+    return 0.0
+
+
+def _scan_proc() -> Dict[int, ChromeProcess]:
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    clock_ticks = os.sysconf('SC_CLK_TCK')
+    boot_time = _boot_time()
+    processes = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'r', errors='replace') as f:
+                stat = f.read()
+            name = stat[stat.index('(') + 1:stat.rindex(')')]
+            # ')' 之後依序為 state、ppid ...；starttime 與 rss 為 stat 的第 22、24 個欄位
+            fields = stat[stat.rindex(')') + 2:].split()
+            if fields[0] == 'Z':
+                continue  # 已結束、等待父行程回收的行程
+            owner = None
+            with open(f'/proc/{entry}/environ', 'rb') as f:
+                for item in f.read().split(b'\0'):
+                    if item.startswith(OWNER_ENV.encode() + b'='):
+                        value = item.split(b'=', 1)[1]
+                        owner = int(value) if value.isdigit() else None
+                        break
+        except (OSError, ValueError):
+            continue  # 行程已結束或沒有讀取權限
+        processes[int(entry)] = ChromeProcess(
+            int(entry), int(fields[1]), name, boot_time + int(fields[19]) / clock_ticks,
+            int(fields[21]) * page_size, owner,
+        )
+    return processes
+
+
+def scan_processes() -> Dict[int, ChromeProcess]:
+    """
+    讀取目前所有行程（不以名稱過濾，瀏覽器的輔助行程不一定叫 chrome）
+
+    Returns:
+        Dict[int, ChromeProcess]: PID -> 行程；不支援的平台回傳空 dict
+    """
+    if psutil is not None:
+        return _scan_psutil()
+    if os.path.isdir('/proc'):
+        return _scan_proc()
+    return {}
+
+
+def process_tree(root: int, processes: Dict[int, ChromeProcess]) -> Set[int]:
+    """root 及其所有子孫行程 PID（完整走訪子行程樹，不論行程名稱）"""
+    children: Dict[int, List[int]] = {}
+    for proc in processes.values():
+        children.setdefault(proc.ppid, []).append(proc.pid)
+    tree = set()
+    stack = [root]
+    while stack:
+        pid = stack.pop()
+        if pid in tree:
+            continue
+        tree.add(pid)
+        stack.extend(children.get(pid, ()))
+    return tree
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def kill_processes(pids) -> int:
+    """以 SIGKILL 結束行程，回傳成功送出訊號的數量（已結束的行程略過）"""
+    killed = 0
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGKILL)
+            killed += 1
+        except (ProcessLookupError, PermissionError):
+            pass
+    return killed
+
+
+def driver_pid(driver) -> Optional[int]:
+    """WebDriver 對應的 chromedriver 行程 PID（取不到時為 None）"""
+    process = getattr(getattr(driver, 'service', None), 'process', None)
+    return getattr(process, 'pid', None)
+
+
+class ChromeSession:
+    """
+    登記中的一個瀏覽器：chromedriver PID、借出時間、最近一次掃描的行程樹，
+    以及脫離行程樹、依啟動時間歸屬於此 session 的輔助行程（crashpad handler）
+    """
+
+    def __init__(self, driver, pid: Optional[int]):
+        self.driver = driver
+        self.pid = pid
+        self.created_at = time.time()
+        self.checked_out_at: Optional[float] = None
+        self.pids: Set[int] = {pid} if pid else set()
+        self.helpers: Set[int] = set()
+        self.rss = 0
+
+
+class ChromeLifecycle:
+    """
+    瀏覽器 session 的登記、資源上限與孤兒行程回收
+
+    Args:
+        max_memory_mb (float): 每個 session 行程樹的記憶體（RSS）上限，0 表示不限制
+        max_session_seconds (float): 借出後沒有進展（touch）的時間上限，0 表示不限制
+        reap_interval (float): 背景掃描間隔秒數
+        orphan_grace (float): 未登記的本服務行程存在超過此秒數才視為洩漏
+            （避免誤殺正在啟動、尚未完成登記的瀏覽器）
+    """
+
+    def __init__(self, max_memory_mb: float = 1536, max_session_seconds: float = 900,
+                 reap_interval: float = 30, orphan_grace: float = 120):
+        self.max_memory_mb = max_memory_mb
+        self.max_session_seconds = max_session_seconds
+        self.reap_interval = reap_interval
+        self.orphan_grace = orphan_grace
+
+        self._sessions: Dict[int, ChromeSession] = {}  # id(driver) -> session
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.supported = psutil is not None or os.path.isdir('/proc')
+        self.live_processes = 0    # 最近一次掃描時屬於登記中 session 的行程數
+        self.leaked_processes = 0  # 最近一次掃描時發現的洩漏 / 孤兒行程數
+        self.reaped = 0
+        self.killed = {'memory': 0, 'time': 0}
+
+    @classmethod
+    def from_env(cls) -> 'ChromeLifecycle':
+        """依環境變數 CHROME_MAX_MEMORY_MB / CHROME_MAX_SESSION_SECONDS / CHROME_REAPER_INTERVAL / CHROME_ORPHAN_GRACE 建立"""
+        return cls(
+            max_memory_mb=float(os.getenv('CHROME_MAX_MEMORY_MB', '1536')),
+            max_session_seconds=float(os.getenv('CHROME_MAX_SESSION_SECONDS', '900')),
+            reap_interval=float(os.getenv('CHROME_REAPER_INTERVAL', '30')),
+            orphan_grace=float(os.getenv('CHROME_ORPHAN_GRACE', '120')),
+        )
+
+    @staticmethod
+    def owner_env() -> Dict[str, str]:
+        """啟動 chromedriver 時使用的環境變數（加上本行程的標記，Chrome 子行程會繼承）"""
+        return {**os.environ, OWNER_ENV: str(os.getpid())}
+
+    def register(self, driver) -> None:
+        """登記新啟動的瀏覽器"""
+        with self._lock:
+            self._sessions[id(driver)] = ChromeSession(driver, driver_pid(driver))
+
+    def checkout(self, driver) -> None:
+        """瀏覽器被借出，開始計算本次使用時間"""
+        with self._lock:
+            session = self._sessions.get(id(driver))
+            if session is not None:
+                session.checked_out_at = time.time()
+
+    def touch(self, driver) -> None:
+        """
+        長時間借用的瀏覽器（/run/range 逐日查詢）每完成一段工作即重新計時，
+        時間上限只用來結束卡住的借用，不會中斷仍有進展的長區間查詢
+        """
+        self.checkout(driver)
+
+    def checkin(self, driver) -> None:
+        """瀏覽器歸還"""
+        with self._lock:
+            session = self._sessions.get(id(driver))
+            if session is not None:
+                session.checked_out_at = None
+
+    def over_memory(self, driver) -> bool:
+        """依最近一次掃描的結果，判斷瀏覽器的行程樹是否超過記憶體上限（歸還時據此回收）"""
+        if self.max_memory_mb <= 0:
+            return False
+        with self._lock:
+            session = self._sessions.get(id(driver))
+            return session is not None and session.rss > self.max_memory_mb * 1024 * 1024
+
+    def quit(self, driver) -> None:
+        """
+        取消登記並結束瀏覽器；quit 失敗（chromedriver 無回應等）時直接結束整個行程樹
+        """
+        with self._lock:
+            session = self._sessions.pop(id(driver), None)
+        try:
+            driver.quit()
+            return
+        except Exception as e:
+            print(f"⚠️ 關閉瀏覽器失敗: {e}")
+        if session is not None and session.pid and self.supported:
+            processes = scan_processes()
+            killed = kill_processes(process_tree(session.pid, processes) | (session.helpers & processes.keys()))
+            if killed:
+                print(f"🔪 強制結束瀏覽器行程樹 - {killed} 個行程")
+
+    @staticmethod
+    def _claim_helpers(processes: Dict[int, ChromeProcess], sessions: List[ChromeSession]) -> None:
+        """
+        將本行程啟動、脫離行程樹的 crashpad handler 歸屬於啟動時間最接近的 session
+        （瀏覽器啟動後才登記，handler 的啟動時間略早於 session.created_at）
+        """
+        me = os.getpid()
+        for session in sessions:
+            session.helpers &= processes.keys()
+        claimed = set().union(*(session.helpers for session in sessions))
+        for proc in processes.values():
+            if proc.owner != me or _DETACHED_HELPER not in proc.name or proc.pid in claimed:
+                continue
+            candidates = [session for session in sessions
+                          if abs(session.created_at - proc.started_at) <= _HELPER_MATCH_SECONDS]
+            if candidates:
+                min(candidates, key=lambda session: abs(session.created_at - proc.started_at)).helpers.add(proc.pid)
+
+    def _enforce_limits(self, processes: Dict[int, ChromeProcess], now: float) -> Set[int]:
+        """更新各 session 的行程樹與記憶體，結束借出中超過上限者，回傳登記中 session 的所有 PID"""
+        tracked = set()
+        with self._lock:
+            sessions = list(self._sessions.values())
+        self._claim_helpers(processes, sessions)
+        for session in sessions:
+            if not session.pid:
+                continue
+            session.pids = process_tree(session.pid, processes) if session.pid in processes else set()
+            if session.pids:
+                session.pids |= session.helpers
+            session.rss = sum(processes[pid].rss for pid in session.pids)
+            tracked |= session.pids
+            if session.checked_out_at is None or not session.pids:
+                continue
+
+            reason = None
+            if self.max_session_seconds > 0 and now - session.checked_out_at > self.max_session_seconds:
+                reason = 'time'
+                detail = f"借出 {now - session.checked_out_at:.0f} 秒"
+            elif self.max_memory_mb > 0 and session.rss > self.max_memory_mb * 1024 * 1024:
+                reason = 'memory'
+                detail = f"記憶體 {session.rss / 1024 / 1024:.0f} MB"
+            if reason:
+                # 借用中的請求會因瀏覽器消失而失敗，連線池隨即回收這個瀏覽器
+                kill_processes(session.pids)
+                self.killed[reason] += 1
+                print(f"🔪 瀏覽器超過上限（{detail}），已結束 {len(session.pids)} 個行程")
+        return tracked
+
+    def _find_leaked(self, processes: Dict[int, ChromeProcess], tracked: Set[int], now: float,
+                     grace: float) -> List[int]:
+        me = os.getpid()
+        leaked = []
+        for proc in processes.values():
+            # 未歸屬任何 session 的 crashpad handler 也一併回收（寬限時間內可能仍在等待歸屬）
+            if proc.owner is None or proc.pid in tracked:
+                continue
+            if proc.owner == me:
+                if now - proc.started_at >= grace:
+                    leaked.append(proc.pid)
+            elif not _pid_alive(proc.owner):
+                leaked.append(proc.pid)  # 建立者（例如被強制結束的 worker）已不存在
+        return leaked
+
+    def reap(self, grace: Optional[float] = None) -> int:
+        """
+        掃描一次行程表：套用各 session 的時間與記憶體上限，並結束洩漏 / 孤兒行程
+
+        Args:
+            grace (float, optional): 未登記行程的寬限秒數，預設為 orphan_grace；關閉服務時傳入 0
+
+        Returns:
+            int: 被結束的洩漏 / 孤兒行程數
+        """
+        if not self.supported:
+            return 0
+        now = time.time()
+        processes = scan_processes()
+        tracked = self._enforce_limits(processes, now)
+        leaked = self._find_leaked(processes, tracked, now, self.orphan_grace if grace is None else grace)
+        reaped = kill_processes(leaked)
+
+        with self._lock:
+            self.live_processes = len(tracked)
+            self.leaked_processes = len(leaked)
+            self.reaped += reaped
+        if reaped:
+            print(f"🧹 回收 {reaped} 個洩漏的瀏覽器行程")
+        return reaped
+
+    def start(self) -> None:
+        """啟動背景掃描執行緒（不支援的平台只印出提示）"""
+        if self._thread is not None:
+            return
+        if not self.supported:
+            print("⚠️ 無法讀取行程表（未安裝 psutil 且沒有 /proc），不啟用瀏覽器行程回收")
+            return
+
+        def _loop():
+            while not self._stop.wait(self.reap_interval):
+                try:
+                    self.reap()
+                except Exception as e:
+                    print(f"⚠️ 瀏覽器行程掃描失敗: {e}")
+
+        self._thread = threading.Thread(target=_loop, name='chrome-reaper', daemon=True)
+        self._thread.start()
+
+    def shutdown(self) -> int:
+        """停止背景掃描，並立即結束本服務留下的所有未登記行程（連線池關閉後呼叫）"""
+        self._stop.set()
+        try:
+            return self.reap(grace=0)
+        except Exception as e:
+            print(f"⚠️ 瀏覽器行程掃描失敗: {e}")
+            return 0
+
+    def stats(self) -> dict:
+        """回傳登記中的 session 數、最近一次掃描的存活 / 洩漏行程數與累計回收數"""
+        with self._lock:
+            return {
+                'supported': self.supported,
+                'sessions': len(self._sessions),
+                'checked_out': sum(1 for session in self._sessions.values() if session.checked_out_at is not None),
+                'live_processes': self.live_processes,
+                'leaked_processes': self.leaked_processes,
+                'memory_mb': round(sum(session.rss for session in self._sessions.values()) / 1024 / 1024, 1),
+                'reaped': self.reaped,
+                'killed': dict(self.killed),
+                'max_memory_mb': self.max_memory_mb,
+                'max_session_seconds': self.max_session_seconds,
+            }
@@ -0,0 +1,126 @@
+"""
+ChromeDriver 執行檔的解析與快取
+
+ChromeDriverManager().install() 每次都會檢查版本、讀寫 ~/.wdm，甚至連線下載，
+在離線主機上直接失敗；改為每個行程只解析一次（API 啟動時），順序為：
+1. 環境變數 CHROMEDRIVER_PATH 指定的執行檔
+2. 磁碟上的版本快取（CHROMEDRIVER_CACHE）：記錄上次解析的路徑與當時的 Chrome 版本，
+   Chrome 版本未變且檔案仍存在時直接使用，不需連線
+3. webdriver-manager 下載 / 解析，成功後寫入版本快取
+都失敗時交給 Selenium 自行在 PATH 中尋找 chromedriver
+"""
+
+import json
+import os
+import subprocess
+import threading
+import time
+from typing import Dict, Optional
+
+from selenium.webdriver.chrome.service import Service
+
+DEFAULT_CHROME_BINARY = '/usr/bin/google-chrome'
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'booking_api', 'chromedriver.json')
+
+_UNRESOLVED = object()
+_resolved = _UNRESOLVED  # 解析結果：執行檔路徑，或 None（交給 Selenium 尋找）
+_resolve_lock = threading.Lock()
+
+
+def chrome_version(binary: str = DEFAULT_CHROME_BINARY) -> Optional[str]:
+    """
+    已安裝的 Chrome 版本（例如 126.0.6478.126），無法取得時為 None
+    """
+    try:
+        output = subprocess.run([binary, '--version'], capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    for token in output.split():
+        if token[:1].isdigit() and '.' in token:
+            return token
+    return None
+
+
+def _is_executable(path: Optional[str]) -> bool:
+    return bool(path) and os.path.isfile(path) and os.access(path, os.X_OK)
+
+
+def _read_cache(cache_path: str) -> dict:
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(cache_path: str, path: str, version: Optional[str]) -> None:
+    try:
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'path': path, 'chrome_version': version, 'resolved_at': time.time()}, f)
+    except OSError as e:
+        print(f"⚠️ 無法寫入 ChromeDriver 版本快取 {cache_path}: {e}")
+
+
+def _resolve(chrome_binary: str) -> Optional[str]:
+    override = os.getenv('CHROMEDRIVER_PATH')
+    if override:
+        if not _is_executable(override):
+            raise FileNotFoundError(f'CHROMEDRIVER_PATH 指定的 ChromeDriver 不存在或無法執行: {override}')
+        print(f"🧭 使用 CHROMEDRIVER_PATH 指定的 ChromeDriver: {override}")
+        return override
+
+    cache_path = os.getenv('CHROMEDRIVER_CACHE') or DEFAULT_CACHE_PATH
+    cached = _read_cache(cache_path)
+    version = chrome_version(chrome_binary)
+    if _is_executable(cached.get('path')) and (version is None or cached.get('chrome_version') == version):
+        print(f"🧭 使用快取的 ChromeDriver: {cached['path']}（Chrome {cached.get('chrome_version') or '版本未知'}）")
+        return cached['path']
+
+    try:
+        from webdriver_manager.chrome import ChromeDriverManager
+        path = ChromeDriverManager().install()
+    except Exception as e:
+        # 離線時 Chrome 已更新但無法下載新版，仍先沿用舊的執行檔
+        if _is_executable(cached.get('path')):
+            print(f"⚠️ 無法更新 ChromeDriver（{e}），沿用快取的 {cached['path']}")
+            return cached['path']
+        print(f"⚠️ 無法取得 ChromeDriver（{e}），改由 Selenium 在 PATH 中尋找")
+        return None
+
+    _write_cache(cache_path, path, version)
+    print(f"🧭 ChromeDriver 已解析並寫入快取: {path}（Chrome {version or '版本未知'}）")
+    return path
+
+
+def resolve_chromedriver(chrome_binary: str = DEFAULT_CHROME_BINARY, refresh: bool = False) -> Optional[str]:
+    """
+    取得 ChromeDriver 執行檔路徑，每個行程只解析一次
+
+    Args:
+        chrome_binary (str): Chrome 執行檔，用來判斷版本快取是否仍有效
+        refresh (bool): 忽略本行程已解析的結果重新解析
+
+    Returns:
+        Optional[str]: 執行檔路徑；None 表示交給 Selenium 在 PATH 中尋找
+
+    Raises:
+        FileNotFoundError: CHROMEDRIVER_PATH 指定的檔案不存在或無法執行
+    """
+    global _resolved
+    with _resolve_lock:
+        if _resolved is _UNRESOLVED or refresh:
+            _resolved = _resolve(chrome_binary)
+        return _resolved
+
+
+def chromedriver_service(env: Optional[Dict[str, str]] = None) -> Service:
+    """
+    以已解析的 ChromeDriver 建立 Service（不會再檢查版本或連線）
+
+    每個 Service 對應一個 chromedriver 行程，每個瀏覽器各自建立；重複使用的是解析結果
+
+    Args:
+        env (Dict[str, str], optional): chromedriver 的環境變數，預設沿用目前的環境
+    """
+    return Service(resolve_chromedriver(), env=env)
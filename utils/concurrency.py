@@ -0,0 +1,154 @@
+"""
+各路由的並行請求上限
+
+爬蟲與預訂路由都需要借用瀏覽器，同時進來的請求超過連線池能消化的數量時，
+多出來的請求只會在 checkout 等待到逾時並佔住 WSGI 執行緒；改為在進入路由前檢查上限，
+額滿時立即回應 429 與 Retry-After（依該路由最近的平均耗時估算），
+關閉服務時則拒絕新請求並等待進行中的請求結束
+"""
+
+import math
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+
+class RouteLimiter:
+    """
+    以路由規則（例如 /run）為單位的並行上限
+
+    Args:
+        limits (Dict[str, int]): 路由規則 -> 最多同時處理的請求數；未列出的路由不限制
+        wait (float): 額滿時最多等待空位的秒數，0 表示立即拒絕
+        default_retry_after (float): 尚無耗時資料時回應的 Retry-After 秒數
+    """
+
+    # 平均耗時的平滑係數（指數移動平均）
+    SMOOTHING = 0.2
+
+    def __init__(self, limits: Dict[str, int], wait: float = 0, default_retry_after: float = 5):
+        self.limits = {route: max(1, limit) for route, limit in limits.items()}
+        self.wait = wait
+        self.default_retry_after = default_retry_after
+        self._active: Dict[str, int] = {route: 0 for route in self.limits}
+        self._avg_duration: Dict[str, float] = {}
+        self._cond = threading.Condition()
+        self._draining = False
+
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls, pool_size: int) -> 'RouteLimiter':
+        """
+        依瀏覽器連線池大小決定預設上限，可用環境變數 ROUTE_CONCURRENCY 覆寫
+        （例如 "/run=4,/book=1"，0 表示不限制），並讀取 ROUTE_LIMIT_WAIT / ROUTE_RETRY_AFTER
+
+        預設 /run、/free-slots 為連線池大小的兩倍（快取命中的請求不需要瀏覽器），
+        /run/range、/book 與 /book/batch 會長時間佔用瀏覽器，與連線池大小相同
+        """
+        pool_size = max(1, pool_size)
+        limits = {
+            '/run': pool_size * 2,
+            '/free-slots': pool_size * 2,
+            '/run/range': pool_size,
+            '/book': pool_size,
+            '/book/batch': pool_size,
+        }
+        for item in (os.getenv('ROUTE_CONCURRENCY') or '').split(','):
+            if '=' not in item:
+                continue
+            route, limit = item.split('=', 1)
+            if int(limit) > 0:
+                limits[route.strip()] = int(limit)
+            else:
+                limits.pop(route.strip(), None)
+        return cls(
+            limits,
+            wait=float(os.getenv('ROUTE_LIMIT_WAIT', '0')),
+            default_retry_after=float(os.getenv('ROUTE_RETRY_AFTER', '5')),
+        )
+
+    @property
+    def draining(self) -> bool:
+        return self._draining
+
+    def acquire(self, route: str) -> bool:
+        """
+        取得路由的處理名額；不受限制的路由（/health、/metrics 等）一律成功，關閉服務時也不受影響
+
+        Returns:
+            bool: 是否取得名額（服務關閉中或額滿時為 False）
+        """
+        limit = self.limits.get(route)
+        if limit is None:
+            return True
+        deadline = time.time() + self.wait
+        with self._cond:
+            while True:
+                if self._draining:
+                    self.rejected += 1
+                    return False
+                if self._active[route] < limit:
+                    self._active[route] += 1
+                    return True
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.rejected += 1
+                    return False
+                self._cond.wait(remaining)
+
+    def release(self, route: str, elapsed: Optional[float] = None) -> None:
+        """歸還名額並更新該路由的平均耗時"""
+        if route not in self.limits:
+            return
+        with self._cond:
+            self._active[route] -= 1
+            if elapsed is not None:
+                previous = self._avg_duration.get(route)
+                self._avg_duration[route] = elapsed if previous is None else \
+                    previous + self.SMOOTHING * (elapsed - previous)
+            self._cond.notify_all()
+
+    def retry_after(self, route: str) -> int:
+        """建議的重試秒數：該路由最近的平均耗時（至少 1 秒）"""
+        with self._cond:
+            return max(1, math.ceil(self._avg_duration.get(route, self.default_retry_after)))
+
+    def in_flight(self) -> int:
+        with self._cond:
+            return sum(self._active.values())
+
+    def drain(self, timeout: float) -> int:
+        """
+        停止接受受限路由的新請求（之後 acquire 一律失敗），並等待進行中的請求結束
+
+        Returns:
+            int: 逾時後仍在處理的請求數
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            self._draining = True
+            self._cond.notify_all()
+            while sum(self._active.values()):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return sum(self._active.values())
+
+    def stats(self) -> dict:
+        """回傳各路由的上限、處理中請求數與平均耗時"""
+        with self._cond:
+            return {
+                'draining': self._draining,
+                'rejected': self.rejected,
+                'routes': {
+                    route: {
+                        'limit': limit,
+                        'active': self._active[route],
+                        'avg_seconds': round(self._avg_duration[route], 3) if route in self._avg_duration else None,
+                    }
+                    for route, limit in self.limits.items()
+                },
+            }
@@ -1,11 +1,26 @@
-from collections import defaultdict
 import csv
+import io
+
+from utils.records import MeetingBatch
+
+CSV_FIELDNAMES = ['會議室', '會議時間', '會議名稱', '借用人']
+
 def read_file(file_path):
     with open(file_path, 'r', encoding='utf-8-sig') as file:
         return file.readlines()
 
 def process_files(file_list):
-    meeting_data = defaultdict(list)
+    """
+    讀取每頁的 TSV（會議室名稱\t時間\t會議名稱\t主辦方）並依會議室合併
+    
+    時間欄位無法解析（不是 YYYY/MM/DD HH:MM~HH:MM）的資料列無法放入 MeetingBatch，
+    會印出筆數與內容，不會無聲地遺失
+    
+    Returns:
+        MeetingBatch: 依會議室第一次出現的順序排列、已去除重複的會議記錄
+    """
+    meetings = MeetingBatch()
+    skipped = []
     
     # 處理每個檔案
     for file_path in file_list:
@@ -15,61 +30,49 @@ def process_files(file_list):
             if not line:  # 跳過空行
                 continue
                 
-            # 處理TSV格式：會議室名稱\t時間\t會議名稱\t主辦方
+            # 處理TSV格式：會議室名稱\t時間\t會議名稱\t主辦方（只有3個欄位時主辦方為空）
             parts = line.split('\t')
-            if len(parts) >= 4:
-                room_name = parts[0].strip()
-                time_info = parts[1].strip()
-                meeting_name = parts[2].strip()
-                organizer = parts[3].strip()
-                
-                # 將會議記錄加到對應的會議室，保持原有格式以兼容現有的write_output_csv函數
-                meeting_data[room_name].extend([time_info, meeting_name, organizer])
-            elif len(parts) >= 3:
-                # 處理只有3個欄位的情況
-                room_name = parts[0].strip()
-                time_info = parts[1].strip()
-                meeting_name = parts[2].strip()
-                organizer = ""  # 空的主辦方
-                
-                meeting_data[room_name].extend([time_info, meeting_name, organizer])
+            if len(parts) >= 3 and not meetings.extend([parts[:4]]):
+                skipped.append((file_path, line))
+    
+    if skipped:
+        print(f"⚠️ 略過 {len(skipped)} 筆時間格式無法解析的記錄：")
+        for file_path, line in skipped:
+            print(f"   {file_path}: {line}")
     
-    return meeting_data
+    # 跨越中午的會議同時出現在上午與下午的檔案中
+    meetings, duplicates = meetings.unique()
+    if duplicates:
+        print(f"🔁 移除 {duplicates} 筆重複的會議記錄")
+    return meetings.grouped_by_room()
 
-def write_output(meeting_data, output_file):
+def write_output(meetings, output_file):
     with open(output_file, 'w', encoding='utf-8-sig') as f:
-        for room, details in meeting_data.items():
+        for room, indexes in meetings.room_order().items():
             f.write(room + '\n')
+            details = []
+            for index in indexes:
+                record = meetings[index]
+                details.extend([record.time_info, record.subject, record.organizer])
             f.write('\n'.join(details) + '\n')
-def write_output_csv(meeting_data, csv_filename):
+
+def render_csv(meetings):
+    """將依會議室排列的 MeetingBatch 轉為 CSV 內容（含標題列）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_FIELDNAMES)
+    writer.writerows(record.to_row() for record in meetings)
+    return buffer.getvalue()
+
+def write_output_csv(meetings, csv_filename):
     with open(csv_filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
-        fieldnames = ['會議室', '會議時間', '會議名稱', '借用人']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        for room, meeting_info in meeting_data.items():
-            # 確保有足夠的資料來處理
-            for i in range(0, len(meeting_info), 3):
-                # 安全地取得每個欄位，如果不存在則使用空字串
-                time_info = meeting_info[i] if i < len(meeting_info) else ''
-                meeting_name = meeting_info[i + 1] if i + 1 < len(meeting_info) else ''
-                organizer = meeting_info[i + 2] if i + 2 < len(meeting_info) else ''
-                
-                # 只有當至少有時間資訊時才寫入記錄
-                if time_info:
-                    row = {
-                        '會議室': room,
-                        '會議時間': time_info,
-                        '會議名稱': meeting_name,
-                        '借用人': organizer
-                    }
-                    writer.writerow(row)
+        csvfile.write(render_csv(meetings))
 
 # # 主程式邏輯
 # file_list = ['2_page_source_afternoon', '1_page_source_morning']  # 你的兩個檔案
 # output_file = 'combined_output.txt'  # 輸出檔案
 # output_csv = 'combined.csv'
-# meeting_data = process_files(sorted(file_list))
-# write_output(meeting_data, output_file)
-# write_output_csv(meeting_data, output_csv)
+# meetings = process_files(sorted(file_list))
+# write_output(meetings, output_file)
+# write_output_csv(meetings, output_csv)
 # print(f"檔案已合併並輸出至 {output_file}")
@@ -0,0 +1,117 @@
+"""
+瀏覽器內的會議資料擷取
+
+以一次 execute_script 在頁面中依文件順序走訪會議室標題（.Room）與會議按鈕（.meetingRecordBtn），
+只回傳精簡的 [會議室, 開始, 結束, 會議名稱, 部門, 人員] 陣列與會議室列表，
+不必將整份 page_source 傳回 API 主機再以正規表示式解析
+"""
+
+import os
+from typing import List, NamedTuple, Optional
+
+# 擷取規則與 extract_meeting_info() 相同：
+#   - 查詢日期取頁面中第一個 value 為 20YY/MM/DD 的 input
+#   - 每個會議按鈕歸屬於它之前最近的會議室標題
+#   - 沒有會議名稱或起訖時間的按鈕略過
+#   - 人員取 .Section 開頭的文字（不含後面的分機 span）
+#   - rooms 依頁面順序列出所有會議室標題（不重複，包含當天沒有會議的會議室）
+# 頁面上沒有 #timeTableMeetingRoom 時回傳 null
+# 修改時需同步修改 tool/check_dom_extract.py 的 replay_extract_js()（benchmark/bench.py 以它做離線比對）
+EXTRACT_MEETINGS_JS = """
+    if (!document.getElementById('timeTableMeetingRoom')) return null;
+
+    var queryDate = null;
+    var inputs = document.querySelectorAll('input[value]');
+    for (var i = 0; i < inputs.length && !queryDate; i++) {
+        var value = inputs[i].getAttribute('value');
+        if (/^20\\d{2}\\/\\d{2}\\/\\d{2}$/.test(value)) queryDate = value;
+    }
+
+    function text(root, selector) {
+        var el = root.querySelector(selector);
+        return el ? el.textContent.trim() : '';
+    }
+
+    var rows = [];
+    var rooms = [];
+    var room = null;
+    var nodes = document.querySelectorAll('div.Title.ToggleTitle div.Room, button.Calendar_block.meetingRecordBtn');
+    for (var j = 0; j < nodes.length; j++) {
+        var node = nodes[j];
+        if (node.tagName !== 'BUTTON') {
+            room = node.textContent.trim();
+            if (rooms.indexOf(room) < 0) rooms.push(room);
+            continue;
+        }
+        if (!room) continue;
+
+        var subject = text(node, '.Company.textDis') || text(node, '.Company.text.Dis');
+        var start = node.getAttribute('data-starttime');
+        var end = node.getAttribute('data-endtime');
+        if (!subject || !start || !end) continue;
+
+        var person = '';
+        var section = node.querySelector('.Section');
+        if (section && section.firstChild && section.firstChild.nodeType === Node.TEXT_NODE) {
+            person = section.firstChild.textContent.trim();
+        }
+        rows.push([room, start, end, subject, text(node, '.Department'), person]);
+    }
+    return {date: queryDate, rows: rows, rooms: rooms};
+"""
+
+# 與 extract_meeting_info() 找不到查詢日期時的預設值一致
+DEFAULT_QUERY_DATE = '2025/07/18'
+
+
+class ExtractedPage(NamedTuple):
+    """瀏覽器內擷取的一頁：會議記錄（格式同 extract_meeting_info()）與時間表上的所有會議室"""
+    meetings: List[List[str]]
+    rooms: List[str]
+
+
+def rows_to_meetings(rows: List[List[str]], query_date: Optional[str] = None) -> List[List[str]]:
+    """
+    將瀏覽器回傳的精簡資料列轉為 extract_meeting_info() 的輸出格式
+
+    Args:
+        rows (List[List[str]]): [會議室, 開始, 結束, 會議名稱, 部門, 人員]
+        query_date (str, optional): 查詢日期 (YYYY/MM/DD)
+
+    Returns:
+        List[List[str]]: [會議室名稱, 時間, 會議名稱, 主辦方]
+    """
+    query_date = query_date or DEFAULT_QUERY_DATE
+    meetings = []
+    for room, start, end, subject, department, person in rows:
+        organizer = f"{department} {person}".strip() if department or person else ''
+        meetings.append([room, f"{query_date} {start}~{end}", subject, organizer])
+    return meetings
+
+
+def payload_to_page(payload: Optional[dict]) -> Optional[ExtractedPage]:
+    """將 EXTRACT_MEETINGS_JS 的回傳值轉為 ExtractedPage，頁面沒有時間表（null）時為 None"""
+    if payload is None:
+        return None
+    return ExtractedPage(rows_to_meetings(payload['rows'], payload.get('date')), list(payload.get('rooms') or []))
+
+
+def extract_meetings_in_page(driver) -> Optional[ExtractedPage]:
+    """
+    在瀏覽器中擷取目前頁面的會議記錄與會議室列表
+
+    Returns:
+        Optional[ExtractedPage]: 擷取結果，頁面沒有時間表時為 None
+    """
+    return payload_to_page(driver.execute_script(EXTRACT_MEETINGS_JS))
+
+
+def resolve_extract_mode() -> str:
+    """
+    依環境變數 EXTRACT_MODE 決定 Selenium 擷取方式，預設 html
+
+    Returns:
+        str: 'html'（傳回 page_source 後解析）或 'js'（在瀏覽器內擷取）
+    """
+    mode = (os.getenv('EXTRACT_MODE') or 'html').lower()
+    return mode if mode in ('html', 'js') else 'html'
@@ -0,0 +1,395 @@
+"""
+Chrome WebDriver 連線池
+
+維護一組已登入的 Chrome 實例，讓 /run 與 /book 借用後歸還，
+避免每個請求都重新啟動瀏覽器並登入
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from urllib3.exceptions import HTTPError as DriverConnectionError
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from utils.chrome_lifecycle import ChromeLifecycle
+from utils.chromedriver import chromedriver_service
+from utils.metrics import span
+
+DEFAULT_BOOKING_BASE_URL = 'https://booking.cathayholdings.com'
+BOOKING_INDEX_PATH = '/frontend/mrm101w/index?'
+
+# 借用區塊內拋出時代表瀏覽器本身已不可用的例外：WebDriver 錯誤（含 Selenium 逾時）、
+# 其他逾時，以及 chromedriver 行程已結束時連線失敗的 urllib3 錯誤；
+# 其他例外（會議室名稱錯誤、參數錯誤等）與瀏覽器狀態無關，瀏覽器照常歸還
+BROKEN_DRIVER_ERRORS = (WebDriverException, TimeoutError, DriverConnectionError)
+
+
+def booking_index_url() -> str:
+    """查詢頁網址；可用環境變數 BOOKING_BASE_URL 指向本機測試站台"""
+    return os.getenv('BOOKING_BASE_URL', DEFAULT_BOOKING_BASE_URL).rstrip('/') + BOOKING_INDEX_PATH
+
+
+class DriverPoolTimeout(Exception):
+    """在等待時間內借不到可用的瀏覽器"""
+
+
+def build_chrome_options() -> webdriver.ChromeOptions:
+    """建立查詢與預訂共用的 Chrome 啟動選項"""
+    options = webdriver.ChromeOptions()
+    # Chrome 瀏覽器路徑 (macOS)
+    # options.binary_location = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
+    # ubuntu
+    options.binary_location = "/usr/bin/google-chrome"
+    # 效能優化選項
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--disable-extensions')
+    options.add_argument('--disable-images')  # 不載入圖片，節省時間
+    options.add_argument('--disable-logging')
+    options.add_argument('--disable-notifications')
+    options.add_experimental_option('useAutomationExtension', False)
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    return options
+
+
+def create_driver(env: Optional[Dict[str, str]] = None) -> webdriver.Chrome:
+    """
+    啟動一個新的 Chrome（ChromeDriver 只在第一次啟動時解析，見 utils.chromedriver）
+
+    Args:
+        env (Dict[str, str], optional): chromedriver 的環境變數（Chrome 會繼承），預設沿用目前的環境
+    """
+    return webdriver.Chrome(service=chromedriver_service(env), options=build_chrome_options())
+
+
+def login(driver: webdriver.Chrome, username: str, password: str, timeout: int = 10) -> None:
+    """
+    在目前的瀏覽器中登入預約系統，完成後停留在 mrm101w/index 查詢頁
+
+    Args:
+        driver: Chrome WebDriver
+        username (str): 帳號
+        password (str): 密碼
+        timeout (int): 等待登入元素與查詢頁的秒數
+
+    Raises:
+        selenium.common.exceptions.TimeoutException: 登入失敗或頁面載入超時
+    """
+    with span('login'):
+        driver.get(booking_index_url())
+        driver.implicitly_wait(3)
+
+        email = WebDriverWait(driver, timeout).until(
+            EC.presence_of_element_located((By.NAME, 'username'))
+        )
+        email.send_keys(username)
+        driver.find_element(By.ID, 'KEY').send_keys(password)
+        driver.find_element(By.ID, 'btnLogin').click()
+
+        # 等待查詢頁元素出現，確認登入成功
+        WebDriverWait(driver, timeout).until(
+            EC.presence_of_element_located((By.ID, 'startDate'))
+        )
+
+
+class PooledDriver:
+    """連線池中的一個瀏覽器及其使用統計"""
+
+    def __init__(self, driver: webdriver.Chrome):
+        self.driver = driver
+        self.created_at = time.time()
+        self.uses = 0
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+
+class DriverPool:
+    """
+    已登入 Chrome 的連線池
+
+    Args:
+        username (str): 預約系統帳號
+        password (str): 預約系統密碼
+        size (int): 最多同時存在的瀏覽器數量
+        max_age (float): 瀏覽器存活秒數上限，超過即回收
+        max_uses (int): 每個瀏覽器最多被借用次數，超過即回收
+        checkout_timeout (float): 借用時最多等待秒數
+        lifecycle (ChromeLifecycle, optional): 瀏覽器行程的登記與資源上限，預設依環境變數建立
+    """
+
+    def __init__(self, username: str, password: str, size: int = 2, max_age: float = 1800,
+                 max_uses: int = 50, checkout_timeout: float = 120, lifecycle: Optional[ChromeLifecycle] = None):
+        self.username = username
+        self.password = password
+        self.size = max(1, size)
+        self.max_age = max_age
+        self.max_uses = max_uses
+        self.checkout_timeout = checkout_timeout
+        self.lifecycle = lifecycle or ChromeLifecycle.from_env()
+
+        self._idle: List[PooledDriver] = []
+        self._in_use: List[PooledDriver] = []  # 借出中的瀏覽器（關閉連線池時逾時仍未歸還者會被強制結束）
+        self._live = 0  # 閒置 + 借出中的瀏覽器數量
+        self._cond = threading.Condition()
+        self._closed = False
+        self._probe_thread: Optional[threading.Thread] = None
+
+        self.hits = 0     # 借到暖機中瀏覽器的次數
+        self.misses = 0   # 需要新開瀏覽器的次數
+        self.recycled = 0
+
+    @classmethod
+    def from_env(cls, username: str, password: str, lifecycle: Optional[ChromeLifecycle] = None) -> 'DriverPool':
+        """依環境變數 DRIVER_POOL_SIZE / DRIVER_MAX_AGE / DRIVER_MAX_USES / DRIVER_CHECKOUT_TIMEOUT 建立連線池"""
+        return cls(
+            username,
+            password,
+            size=int(os.getenv('DRIVER_POOL_SIZE', '2')),
+            max_age=float(os.getenv('DRIVER_MAX_AGE', '1800')),
+            max_uses=int(os.getenv('DRIVER_MAX_USES', '50')),
+            checkout_timeout=float(os.getenv('DRIVER_CHECKOUT_TIMEOUT', '120')),
+            lifecycle=lifecycle,
+        )
+
+    def _expired(self, entry: PooledDriver) -> bool:
+        return entry.age > self.max_age or entry.uses >= self.max_uses or self.lifecycle.over_memory(entry.driver)
+
+    def _new_entry(self) -> PooledDriver:
+        start = time.time()
+        with span('driver_start'):
+            driver = create_driver(self.lifecycle.owner_env())
+        self.lifecycle.register(driver)
+        try:
+            login(driver, self.username, self.password)
+        except Exception:
+            self._quit(driver)
+            raise
+        print(f"🚀 連線池新增瀏覽器並登入 - 耗時 {time.time() - start:.2f} 秒")
+        return PooledDriver(driver)
+
+    def _quit(self, driver: webdriver.Chrome) -> None:
+        self.lifecycle.quit(driver)
+
+    def _discard(self, entry: PooledDriver) -> None:
+        self._quit(entry.driver)
+        with self._cond:
+            self._live -= 1
+            self.recycled += 1
+            self._cond.notify()
+
+    @staticmethod
+    def _logged_in(driver: webdriver.Chrome) -> bool:
+        """導向 mrm101w/index，並以查詢頁的 startDate 欄位判斷 session 是否仍有效"""
+        driver.get(booking_index_url())
+        driver.implicitly_wait(0)
+        try:
+            return bool(driver.find_elements(By.ID, 'startDate'))
+        finally:
+            driver.implicitly_wait(3)
+
+    def _reset(self, entry: PooledDriver) -> bool:
+        """
+        將瀏覽器導回 mrm101w/index；若 session 已過期則重新登入
+
+        Returns:
+            bool: 瀏覽器是否可用
+        """
+        driver = entry.driver
+        try:
+            if not self._logged_in(driver):
+                print("🔐 瀏覽器 session 已過期，重新登入")
+                login(driver, self.username, self.password)
+            return True
+        except Exception as e:
+            print(f"⚠️ 瀏覽器重置失敗，將回收: {e}")
+            return False
+
+    def _acquire(self) -> PooledDriver:
+        entry = self._acquire_entry()
+        with self._cond:
+            self._in_use.append(entry)
+        self.lifecycle.checkout(entry.driver)
+        return entry
+
+    def _acquire_entry(self) -> PooledDriver:
+        deadline = time.time() + self.checkout_timeout
+        while True:
+            stale = None
+            create = False
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError('連線池已關閉')
+                if self._idle:
+                    entry = self._idle.pop()
+                    if self._expired(entry):
+                        stale = entry
+                    else:
+                        self.hits += 1
+                elif self._live < self.size:
+                    self._live += 1
+                    self.misses += 1
+                    create = True
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise DriverPoolTimeout(f'等待瀏覽器超過 {self.checkout_timeout} 秒')
+                    self._cond.wait(remaining)
+                    continue
+
+            if stale is not None:
+                self._discard(stale)
+                continue
+
+            if create:
+                try:
+                    return self._new_entry()
+                except Exception:
+                    with self._cond:
+                        self._live -= 1
+                        self._cond.notify()
+                    raise
+
+            # 借出前重置到查詢頁
+            if self._reset(entry):
+                return entry
+            self._discard(entry)
+
+    def _release(self, entry: PooledDriver, broken: bool) -> None:
+        entry.uses += 1
+        self.lifecycle.checkin(entry.driver)
+        with self._cond:
+            if entry in self._in_use:
+                self._in_use.remove(entry)
+            if self._closed:
+                self._cond.notify_all()  # 喚醒等待歸還的 close()
+        if broken or self._closed or self._expired(entry):
+            self._discard(entry)
+            return
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    @contextmanager
+    def checkout(self):
+        """
+        借用一個已登入且位於 mrm101w/index 的瀏覽器
+
+        區塊內拋出 BROKEN_DRIVER_ERRORS 時，該瀏覽器會被回收而不會放回連線池；
+        其他例外照常拋出，瀏覽器歸還後於下次借出前導回查詢頁
+
+        Yields:
+            webdriver.Chrome: 已登入的瀏覽器
+        """
+        with span('pool_checkout'):
+            entry = self._acquire()
+        broken = False
+        try:
+            yield entry.driver
+        except BROKEN_DRIVER_ERRORS:
+            broken = True
+            raise
+        finally:
+            self._release(entry, broken)
+
+    def touch(self, driver: webdriver.Chrome) -> None:
+        """借用中的瀏覽器仍有進展，重新計算 CHROME_MAX_SESSION_SECONDS 的借用時間"""
+        self.lifecycle.touch(driver)
+
+    def probe(self) -> int:
+        """
+        健康檢查：回收閒置中超過存活時間、借用次數、記憶體上限或登入 session 已失效的瀏覽器
+
+        Returns:
+            int: 被回收的瀏覽器數量
+        """
+        with self._cond:
+            candidates = list(self._idle)
+            self._idle.clear()
+
+        recycled = 0
+        for entry in candidates:
+            healthy = not self._expired(entry)
+            if healthy:
+                try:
+                    healthy = self._logged_in(entry.driver)
+                except Exception:
+                    healthy = False
+            if healthy:
+                with self._cond:
+                    self._idle.append(entry)
+                    self._cond.notify()
+            else:
+                self._discard(entry)
+                recycled += 1
+        if recycled:
+            print(f"🩺 健康檢查回收 {recycled} 個瀏覽器")
+        return recycled
+
+    def start_health_probe(self, interval: float = 60) -> None:
+        """啟動背景健康檢查執行緒"""
+        if self._probe_thread is not None:
+            return
+
+        def _loop():
+            while not self._closed:
+                time.sleep(interval)
+                try:
+                    self.probe()
+                except Exception as e:
+                    print(f"⚠️ 健康檢查失敗: {e}")
+
+        self._probe_thread = threading.Thread(target=_loop, name='driver-pool-probe', daemon=True)
+        self._probe_thread.start()
+
+    def close(self, timeout: float = 0) -> int:
+        """
+        關閉連線池：結束所有閒置瀏覽器，借出中的瀏覽器歸還時即結束
+
+        Args:
+            timeout (float): 等待借出中瀏覽器歸還的秒數，逾時後強制結束
+
+        Returns:
+            int: 逾時被強制結束的瀏覽器數量
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for entry in idle:
+            self._discard(entry)
+
+        with self._cond:
+            while self._in_use and time.time() < deadline:
+                self._cond.wait(deadline - time.time())
+            stuck = list(self._in_use)
+        # 借用中的執行緒之後歸還時會再次 quit 並扣除 live 數，這裡只負責結束瀏覽器行程
+        for entry in stuck:
+            self._quit(entry.driver)
+        if stuck:
+            print(f"⚠️ 關閉連線池時強制結束 {len(stuck)} 個仍在使用中的瀏覽器")
+        return len(stuck)
+
+    def stats(self) -> dict:
+        """回傳連線池使用統計"""
+        with self._cond:
+            return {
+                'size': self.size,
+                'live': self._live,
+                'idle': len(self._idle),
+                'hits': self.hits,
+                'misses': self.misses,
+                'recycled': self.recycled,
+            }
@@ -5,98 +5,116 @@
 從HTML文件中提取會議室名稱和預訂資訊
 """
 
+import argparse
 import re
 import sys
 import os
 from typing import List, Tuple
 
 
+# 預先編譯的解析樣式
+# 查詢日期（頁面中第一個日期欄位的值）
+_DATE_PATTERN = re.compile(r'value="(20\d{2}/\d{2}/\d{2})"')
+# 會議室標題與會議按鈕合併為單一樣式，依文件順序一次掃描
+_TOKEN_PATTERN = re.compile(
+    r'<div class="Title ToggleTitle"[^>]*>.*?<div class="Room">(?P<room>[^<]+)</div>'
+    r'|<button[^>]+class="[^"]*Calendar_block[^"]*meetingRecordBtn[^"]*"[^>]*>(?P<content>.*?)</button>',
+    re.DOTALL
+)
+_MEETING_NAME_PATTERN = re.compile(r'<div class="Company textDis">([^<]+)</div>')
+_MEETING_NAME_SPACED_PATTERN = re.compile(r'<div class="Company text\s*Dis">([^<]+)</div>')
+_DEPARTMENT_PATTERN = re.compile(r'<div class="Department">([^<]+)</div>')
+_SECTION_PATTERN = re.compile(r'<div class="Section">([^<]+?)(?:\s*<span[^>]*>[^<]*</span>)?</div>')
+_START_TIME_PATTERN = re.compile(r'data-starttime="([^"]+)"')
+_END_TIME_PATTERN = re.compile(r'data-endtime="([^"]+)"')
+
+
 def extract_meeting_info(html_content: str) -> List[List[str]]:
     """
     從HTML內容中提取會議室預訂資訊
     
+    依文件順序單次掃描會議室標題與會議按鈕，每個按鈕歸屬於它之前最近的會議室
+    
     Args:
         html_content (str): HTML檔案內容
         
     Returns:
         List[List[str]]: 會議室預訂資訊列表，每個元素包含 [會議室名稱, 時間, 會議名稱, 主辦方]
     """
+    return extract_meetings_and_rooms(html_content)[0]
+
+
+def extract_meetings_and_rooms(html_content: str) -> Tuple[List[List[str]], List[str]]:
+    """
+    與 extract_meeting_info() 相同的單次掃描，同時列出時間表上的所有會議室
+    （會議室標題本來就在同一次掃描中比對，不需另外掃描整份頁面）
+    
+    Args:
+        html_content (str): HTML檔案內容
+        
+    Returns:
+        Tuple[List[List[str]], List[str]]: (會議室預訂資訊列表, 依頁面順序不重複的會議室名稱（包含當天沒有會議的會議室）)
+    """
     results = []
+    rooms = {}
     
     # 首先從HTML中提取查詢日期
-    date_pattern = r'value="(20\d{2}/\d{2}/\d{2})"'
-    date_match = re.search(date_pattern, html_content)
+    date_match = _DATE_PATTERN.search(html_content)
     query_date = date_match.group(1) if date_match else "2025/07/18"  # 預設值
     
-    # 找到所有會議室標題區域
-    room_pattern = r'<div class="Title ToggleTitle"[^>]*>.*?<div class="Room">([^<]+)</div>'
-    room_matches = re.finditer(room_pattern, html_content, re.DOTALL)
-    
-    # 找到所有會議按鈕（這是實際的會議記錄，不是重複的彈出窗口）
-    button_pattern = r'<button[^>]+class="[^"]*Calendar_block[^"]*meetingRecordBtn[^"]*"[^>]*>(.*?)</button>'
-    button_matches = re.finditer(button_pattern, html_content, re.DOTALL)
-    
-    # 提取會議室資訊
-    rooms = {}
-    for room_match in room_matches:
-        room_name = room_match.group(1).strip()
-        room_position = room_match.start()
-        rooms[room_position] = room_name
-    
-    # 排序會議室位置
-    sorted_room_positions = sorted(rooms.keys())
+    # 目前所在的會議室（最近的前一個會議室標題）
+    room_name = None
     
-    # 處理每個會議按鈕
-    for button_match in button_matches:
-        button_content = button_match.group(1)
-        button_position = button_match.start()
-        
-        # 找到這個按鈕屬於哪個會議室（最近的前一個會議室）
-        room_name = None
-        for i in range(len(sorted_room_positions) - 1, -1, -1):
-            if sorted_room_positions[i] < button_position:
-                room_name = rooms[sorted_room_positions[i]]
-                break
+    for token in _TOKEN_PATTERN.finditer(html_content):
+        if token.group('room') is not None:
+            room_name = token.group('room').strip()
+            rooms.setdefault(room_name, None)
+            continue
         
         if not room_name:
             continue
-            
-        # 從按鈕內容中提取會議資訊
-        meeting_name_match = re.search(r'<div class="Company textDis">([^<]+)</div>', button_content)
+        
+        # 從按鈕內容中提取會議資訊（以 pos/endpos 限定範圍，不另外切出子字串）
+        content_start, content_end = token.span('content')
+        meeting_name_match = _MEETING_NAME_PATTERN.search(html_content, content_start, content_end)
         if not meeting_name_match:
             # 嘗試帶空格的版本
-            meeting_name_match = re.search(r'<div class="Company text\s*Dis">([^<]+)</div>', button_content)
+            meeting_name_match = _MEETING_NAME_SPACED_PATTERN.search(html_content, content_start, content_end)
         if not meeting_name_match:
             continue
-            
-        meeting_name = meeting_name_match.group(1).strip()
         
-        # 提取部門資訊
-        department_match = re.search(r'<div class="Department">([^<]+)</div>', button_content)
-        department = department_match.group(1).strip() if department_match else ''
+        # 從按鈕屬性中提取時間資訊
+        start_time_match = _START_TIME_PATTERN.search(html_content, token.start(), token.end())
+        end_time_match = _END_TIME_PATTERN.search(html_content, token.start(), token.end())
+        if not (start_time_match and end_time_match):
+            continue
+        time_info = f"{query_date} {start_time_match.group(1)}~{end_time_match.group(1)}"
         
-        # 提取人員資訊
-        section_match = re.search(r'<div class="Section">([^<]+?)(?:\s*<span[^>]*>[^<]*</span>)?</div>', button_content)
+        # 提取部門與人員資訊
+        department_match = _DEPARTMENT_PATTERN.search(html_content, content_start, content_end)
+        department = department_match.group(1).strip() if department_match else ''
+        section_match = _SECTION_PATTERN.search(html_content, content_start, content_end)
         person = section_match.group(1).strip() if section_match else ''
         
-        # 從按鈕屬性中提取時間資訊
-        button_tag = button_match.group(0)
-        start_time_match = re.search(r'data-starttime="([^"]+)"', button_tag)
-        end_time_match = re.search(r'data-endtime="([^"]+)"', button_tag)
-        
-        if start_time_match and end_time_match:
-            start_time = start_time_match.group(1)
-            end_time = end_time_match.group(1)
-            time_info = f"{query_date} {start_time}~{end_time}"
-        else:
-            continue
-            
         # 組合主辦方資訊
         organizer = f"{department} {person}".strip() if department or person else ''
         
-        results.append([room_name, time_info, meeting_name, organizer])
+        results.append([room_name, time_info, meeting_name_match.group(1).strip(), organizer])
     
-    return results
+    return results, list(rooms)
+
+
+def extract_room_names(html_content: str) -> List[str]:
+    """
+    依頁面順序列出時間表上的所有會議室名稱（包含當天沒有會議的會議室）
+    
+    Args:
+        html_content (str): HTML檔案內容
+        
+    Returns:
+        List[str]: 不重複的會議室名稱
+    """
+    return extract_meetings_and_rooms(html_content)[1]
 
 
 def process_html_file(html_file_path: str, output_file_path: str = None) -> List[List[str]]:
@@ -164,12 +182,22 @@ def process_multiple_files(html_files: List[str]) -> List[List[str]]:
 
 def main():
     """命令行接口"""
-    if len(sys.argv) < 2:
-        print("使用方法：python3 extract_meeting_info.py file1.html [file2.html ...]")
-        print("範例：python3 extract_meeting_info.py tmp/6_20250718_afternoon.html")
-        sys.exit(1)
-    
-    html_files = sys.argv[1:]
+    parser = argparse.ArgumentParser(
+        description="從會議室時間表 HTML 中提取預訂資訊",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+使用範例:
+  python3 extract_meeting_info.py tmp/6_20250718_afternoon.html              # 每個檔案輸出同名 TSV
+  python3 extract_meeting_info.py tmp/*.html --csv output/combined.csv       # 在記憶體中合併輸出單一 CSV
+  python3 extract_meeting_info.py tmp/*.html --csv combined.csv --tsv        # 合併輸出 CSV，同時保留 TSV
+        """
+    )
+    parser.add_argument("html_files", nargs='+', help="HTML 檔案路徑")
+    parser.add_argument("--csv", dest="csv_file", help="合併輸出的 CSV 檔案路徑（不產生中間 TSV 檔案）")
+    parser.add_argument("--tsv", action="store_true", help="搭配 --csv 使用時，仍為每個 HTML 輸出 TSV 檔案")
+    args = parser.parse_args()
+
+    html_files = args.html_files
     
     # 檢查所有檔案是否存在
     for html_file in html_files:
@@ -178,7 +206,21 @@ def main():
             sys.exit(1)
     
     print(f"開始處理 {len(html_files)} 個HTML檔案...")
-    
+
+    if args.csv_file:
+        # 以 collect -> parse -> merge -> render 流程直接在記憶體中處理
+        if __package__ in (None, ''):
+            sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from utils.pipeline import read_captures, render_csv, run_pipeline
+
+        result = run_pipeline(read_captures(html_files))
+        with open(args.csv_file, 'w', newline='', encoding='utf-8-sig') as f:
+            f.write(render_csv(result.meetings))
+        print(f"\n總結：成功處理 {result.pages} 個檔案，提取 {result.total_meetings} 筆會議室預訂記錄")
+        print(f"輸出檔案：{args.csv_file}")
+        if not args.tsv:
+            return
+
     # 處理所有檔案
     total_meetings = 0
     for html_file in html_files:
@@ -0,0 +1,326 @@
+"""
+歷史會議記錄資料庫
+
+將 extract_meeting_info() 的解析結果或既有的每日 CSV（例如 松仁大樓_20240101.csv）
+匯入本機 SQLite，並在會議室、日期與借用人欄位上建立索引，
+查詢一整年的資料只需一次索引查詢，不必再逐一讀取、解析上百個 CSV
+
+使用方式:
+1. 匯入 CSV: python utils/history_store.py ingest output/*.csv --db output/history.db
+2. 匯入存檔頁面: python utils/history_store.py ingest tmp/*.html --db output/history.db
+3. 查詢: python utils/history_store.py query --room 1003會議室 --from 2024/01/01 --to 2024/12/31
+"""
+
+import argparse
+import csv
+import glob
+import os
+import re
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.buildings import BUILDING_CONFIG  # noqa: E402
+from utils.records import MeetingLike, as_record  # noqa: E402
+from utils.result_cache import normalize_date  # noqa: E402
+
+# 批次查詢腳本輸出的檔名，例如 松仁大樓_20240101.csv
+_CSV_FILE_PATTERN = re.compile(r'(?P<building>[^_/\\]+)_(?P<date>\d{8})\.csv$')
+
+HISTORY_FIELDS = ['building_id', 'building_name', 'room', 'date', 'start_time', 'end_time', 'subject', 'organizer']
+
+# building 為去重用的建築物鍵：可對應到 BUILDING_CONFIG 時為建築物 ID，否則為原始名稱
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meetings (
+    id INTEGER PRIMARY KEY,
+    building TEXT NOT NULL DEFAULT '',
+    building_id TEXT NOT NULL DEFAULT '',
+    building_name TEXT NOT NULL DEFAULT '',
+    room TEXT NOT NULL,
+    date TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    subject TEXT NOT NULL DEFAULT '',
+    organizer TEXT NOT NULL DEFAULT '',
+    source TEXT NOT NULL DEFAULT '',
+    UNIQUE (building, room, date, start_time, end_time, subject, organizer)
+);
+CREATE INDEX IF NOT EXISTS idx_meetings_room_date ON meetings (room, date);
+CREATE INDEX IF NOT EXISTS idx_meetings_date ON meetings (date);
+CREATE INDEX IF NOT EXISTS idx_meetings_organizer_date ON meetings (organizer, date);
+CREATE INDEX IF NOT EXISTS idx_meetings_building_date ON meetings (building, date);
+"""
+
+# 舊版資料表（以 building_id 與 building_name 兩欄去重）的索引，移轉時先移除
+_LEGACY_INDEXES = ('idx_meetings_room_date', 'idx_meetings_date', 'idx_meetings_organizer_date',
+                   'idx_meetings_building_date')
+
+# 借用人開頭相符時的範圍上界（讓 (organizer, date) 索引可用於前綴查詢）
+_PREFIX_END = '\U0010ffff'
+
+# 借用人比對方式：contains 為部分相符（預設，需掃描全表），prefix 為開頭相符（使用索引）
+ORGANIZER_MATCH_MODES = ('contains', 'prefix')
+
+
+class HistoryStore:
+    """
+    以 SQLite 保存的歷史會議記錄
+
+    重複匯入同一筆會議（同建築物、會議室、時間、名稱與借用人）會被忽略，可安全地重複匯入；
+    API 結果只帶建築物 ID、CSV 只帶名稱，寫入前先以 buildings 對應為同一個建築物鍵，
+    同一筆會議不論從哪個來源匯入都只保存一次
+
+    Args:
+        path (str): SQLite 資料庫檔案路徑
+        buildings (Dict[str, str], optional): 建築物 ID -> 名稱（BUILDING_CONFIG）
+    """
+
+    def __init__(self, path: str, buildings: Optional[Dict[str, str]] = None):
+        self.path = path
+        self.buildings = dict(buildings or {})
+        self._ids = {name: building_id for building_id, name in self.buildings.items()}
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._migrate(conn)
+            conn.executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls, buildings: Optional[Dict[str, str]] = None) -> Optional['HistoryStore']:
+        """依環境變數 HISTORY_DB_PATH 建立；未設定時回傳 None（停用歷史資料庫）"""
+        path = os.getenv('HISTORY_DB_PATH')
+        return cls(path, buildings) if path else None
+
+    def _canonical(self, building_id: str = '', building_name: str = '') -> Tuple[str, str, str]:
+        """
+        將建築物 ID 或名稱對應為 (建築物鍵, ID, 名稱)，未知的建築物以名稱（或 ID）為鍵
+        """
+        building_id = building_id or self._ids.get(building_name, '')
+        building_name = building_name or self.buildings.get(building_id, '')
+        return building_id or building_name, building_id, building_name
+
+    def _migrate(self, conn) -> None:
+        """將舊版資料表（以 building_id、building_name 兩欄去重）轉為以建築物鍵去重，並合併重複的記錄"""
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(meetings)')]
+        if not columns or 'building' in columns:
+            return
+        conn.execute('ALTER TABLE meetings RENAME TO meetings_legacy')
+        for index in _LEGACY_INDEXES:
+            conn.execute(f'DROP INDEX IF EXISTS {index}')
+        conn.executescript(_SCHEMA)
+        rows = [(*self._canonical(building_id, building_name), *rest) for building_id, building_name, *rest in
+                conn.execute('SELECT building_id, building_name, room, date, start_time, end_time, subject, '
+                             'organizer, source FROM meetings_legacy ORDER BY id')]
+        conn.executemany(
+            'INSERT OR IGNORE INTO meetings (building, building_id, building_name, room, date, start_time, '
+            'end_time, subject, organizer, source) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            rows
+        )
+        conn.execute('DROP TABLE meetings_legacy')
+        print(f"🗃️ 歷史資料庫已轉換為新版格式 - {len(rows)} 筆舊記錄，合併後 "
+              f"{conn.execute('SELECT COUNT(*) FROM meetings').fetchone()[0]} 筆")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def ingest_meetings(self, meetings: Iterable[MeetingLike], building_id: str = '', building_name: str = '',
+                        source: str = '') -> int:
+        """
+        匯入會議記錄
+
+        Args:
+            meetings (Iterable[MeetingLike]): MeetingBatch / MeetingRecord，或 [會議室名稱, 時間, 會議名稱, 主辦方]
+                格式的資料列（extract_meeting_info() 的輸出或 CSV 的資料列）
+            building_id (str): 建築物 ID
+            building_name (str): 建築物名稱
+            source (str): 資料來源（檔名或 api）
+
+        Returns:
+            int: 新增的記錄數
+        """
+        building = self._canonical(building_id, building_name)
+        rows = []
+        for meeting in meetings:
+            record = as_record(meeting)
+            if record is None:
+                continue
+            rows.append((*building, record.room, record.date, record.start_time, record.end_time,
+                         record.subject, record.organizer, source))
+        if not rows:
+            return 0
+
+        with self._lock, self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO meetings (building, building_id, building_name, room, date, start_time, '
+                'end_time, subject, organizer, source) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                rows
+            )
+            return conn.total_changes - before
+
+    def ingest_csv(self, csv_file: str, building_name: Optional[str] = None) -> int:
+        """
+        匯入 /run 輸出的 CSV；未指定建築物時由檔名 {建築物名稱}_{YYYYMMDD}.csv 推得
+
+        Returns:
+            int: 新增的記錄數
+        """
+        if building_name is None:
+            match = _CSV_FILE_PATTERN.search(csv_file)
+            building_name = match.group('building') if match else ''
+        with open(csv_file, 'r', newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            next(reader, None)  # 標題列
+            return self.ingest_meetings(reader, building_name=building_name, source=os.path.basename(csv_file))
+
+    def ingest_html(self, html_files: Iterable[str]) -> int:
+        """
+        解析存檔的時間表頁面（檔名 {建築物}_{YYYYMMDD}_{morning|afternoon}.html）並匯入
+
+        Returns:
+            int: 新增的記錄數
+        """
+        from utils.pipeline import parse, read_captures
+
+        added = 0
+        html_files = list(html_files)
+        for html_file, page in zip(html_files, parse(read_captures(html_files))):
+            added += self.ingest_meetings(page.meetings, building_id=page.building_id,
+                                          source=os.path.basename(html_file))
+        return added
+
+    def query(self, room: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None,
+              building: Optional[str] = None, organizer: Optional[str] = None,
+              limit: Optional[int] = None, organizer_match: str = 'contains') -> List[dict]:
+        """
+        查詢歷史會議記錄，依日期、會議室與開始時間排序
+
+        Args:
+            room (str, optional): 會議室名稱（完全相符）
+            date_from (str, optional): 開始日期（含），YYYY/MM/DD 或 YYYY-MM-DD
+            date_to (str, optional): 結束日期（含），YYYY/MM/DD 或 YYYY-MM-DD
+            building (str, optional): 建築物 ID 或名稱
+            organizer (str, optional): 借用人（例如公司或部門名稱）
+            limit (int, optional): 最多回傳筆數
+            organizer_match (str): 'contains' 部分相符（預設），或 'prefix' 開頭相符（使用索引，適合大型資料庫）
+
+        Returns:
+            List[dict]: 會議記錄，欄位見 HISTORY_FIELDS
+        """
+        clauses = []
+        params = []
+        if room:
+            clauses.append('room = ?')
+            params.append(room)
+        if date_from:
+            clauses.append('date >= ?')
+            params.append(normalize_date(date_from))
+        if date_to:
+            clauses.append('date <= ?')
+            params.append(normalize_date(date_to))
+        if building:
+            clauses.append('building = ?')
+            params.append(building if building in self.buildings else self._canonical(building_name=building)[0])
+        if organizer and organizer_match == 'prefix':
+            clauses.append('organizer >= ? AND organizer < ?')
+            params.extend([organizer, organizer + _PREFIX_END])
+        elif organizer:
+            clauses.append('organizer LIKE ?')
+            params.append(f'%{organizer}%')
+
+        sql = f'SELECT {", ".join(HISTORY_FIELDS)} FROM meetings'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY date, room, start_time'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+
+        with self._connect() as conn:
+            return [dict(zip(HISTORY_FIELDS, row)) for row in conn.execute(sql, params)]
+
+    def stats(self) -> dict:
+        """回傳資料庫筆數與日期範圍"""
+        with self._connect() as conn:
+            count, first, last = conn.execute('SELECT COUNT(*), MIN(date), MAX(date) FROM meetings').fetchone()
+        return {'path': self.path, 'meetings': count, 'from': first, 'to': last}
+
+
+def expand_paths(patterns: Iterable[str]) -> List[str]:
+    """展開檔案、目錄與萬用字元，回傳排序後的 CSV / HTML 檔案列表"""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for ext in ('*.csv', '*.html'):
+                files.extend(glob.glob(os.path.join(pattern, '**', ext), recursive=True))
+        else:
+            files.extend(glob.glob(pattern, recursive=True))
+    return sorted(set(files))
+
+
+def main():
+    """命令行接口"""
+    parser = argparse.ArgumentParser(description='歷史會議記錄資料庫')
+    parser.add_argument('--db', default=os.getenv('HISTORY_DB_PATH', 'output/history.db'),
+                        help='SQLite 資料庫路徑（預設為環境變數 HISTORY_DB_PATH 或 output/history.db）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = subparsers.add_parser('ingest', help='匯入 CSV 或存檔的 HTML 頁面')
+    ingest_parser.add_argument('paths', nargs='+', help='CSV / HTML 檔案、目錄或萬用字元')
+    ingest_parser.add_argument('--building', help='CSV 的建築物名稱（預設由檔名推得）')
+
+    query_parser = subparsers.add_parser('query', help='查詢歷史記錄並輸出 CSV')
+    query_parser.add_argument('--room', help='會議室名稱')
+    query_parser.add_argument('--from', dest='date_from', help='開始日期 YYYY/MM/DD 或 YYYY-MM-DD')
+    query_parser.add_argument('--to', dest='date_to', help='結束日期 YYYY/MM/DD 或 YYYY-MM-DD')
+    query_parser.add_argument('--building', help='建築物 ID 或名稱')
+    query_parser.add_argument('--organizer', help='借用人（公司或部門名稱，部分相符）')
+    query_parser.add_argument('--organizer-match', choices=ORGANIZER_MATCH_MODES, default='contains',
+                              help='借用人比對方式：contains 部分相符（預設）或 prefix 開頭相符（使用索引）')
+    query_parser.add_argument('--limit', type=int, help='最多回傳筆數')
+
+    args = parser.parse_args()
+    # 與 API 使用相同的建築物對應，CSV（只有名稱）與 API / 存檔頁面（只有 ID）的記錄才會合併
+    store = HistoryStore(args.db, BUILDING_CONFIG)
+
+    if args.command == 'ingest':
+        files = expand_paths(args.paths)
+        if not files:
+            print("❌ 找不到任何 CSV 或 HTML 檔案")
+            sys.exit(1)
+        csv_files = [f for f in files if f.endswith('.csv')]
+        html_files = [f for f in files if f.endswith('.html')]
+        added = 0
+        for csv_file in csv_files:
+            added += store.ingest_csv(csv_file, args.building)
+        if html_files:
+            added += store.ingest_html(html_files)
+        stats = store.stats()
+        print(f"✅ 匯入 {len(csv_files)} 個 CSV、{len(html_files)} 個 HTML，新增 {added} 筆記錄")
+        print(f"📚 資料庫共 {stats['meetings']} 筆（{stats['from']} ~ {stats['to']}）：{args.db}")
+        return
+
+    rows = store.query(room=args.room, date_from=args.date_from, date_to=args.date_to,
+                       building=args.building, organizer=args.organizer, limit=args.limit,
+                       organizer_match=args.organizer_match)
+    writer = csv.DictWriter(sys.stdout, fieldnames=HISTORY_FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+if __name__ == '__main__':
+    main()
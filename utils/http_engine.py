@@ -0,0 +1,328 @@
+"""
+無瀏覽器的 HTTP 查詢引擎
+
+以 requests Session（連線池 + Cookie）重播查詢頁的表單：登入後直接送出
+startDate / endDate / searchBeanBuildingPK / selectedTimePeriod，取得上午與下午的 HTML，
+交由 extract_meeting_info() 解析，不需啟動 Chrome
+"""
+
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.driver_pool import booking_index_url
+from utils.metrics import span
+from utils.waits import is_timetable_page
+
+PERIODS = ('MORNING', 'AFTERNOON')
+
+
+class HttpEngineError(Exception):
+    """HTTP 引擎無法完成登入或查詢"""
+
+
+class HttpPoolTimeout(HttpEngineError):
+    """在等待時間內借不到可用的 HTTP session"""
+
+
+class HtmlForm:
+    """從頁面解析出的表單：action、method 與預設欄位值"""
+
+    def __init__(self, action: str, method: str):
+        self.action = action
+        self.method = method
+        self.fields: Dict[str, str] = {}
+        self.names: set = set()  # 表單內所有欄位名稱（含按鈕）
+
+    def payload(self, **overrides) -> Dict[str, str]:
+        data = dict(self.fields)
+        data.update(overrides)
+        return data
+
+
+class _FormParser(HTMLParser):
+    """收集頁面上所有 <form> 的欄位，模擬瀏覽器送出時的預設值"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.forms: List[HtmlForm] = []
+        self._form: Optional[HtmlForm] = None
+        self._select: Optional[str] = None
+        self._select_first: Optional[str] = None
+        self._option_value: Optional[str] = None
+        self._option_text: List[str] = []
+        self._textarea: Optional[str] = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {k: (v if v is not None else '') for k, v in attrs}
+        if tag == 'form':
+            self._form = HtmlForm(attrs.get('action', ''), attrs.get('method', 'get').lower())
+            self.forms.append(self._form)
+            return
+        if self._form is None:
+            return
+
+        name = attrs.get('name')
+        if tag == 'input' and name:
+            self._form.names.add(name)
+            input_type = attrs.get('type', 'text').lower()
+            if input_type in ('submit', 'button', 'image', 'reset', 'file'):
+                return
+            if input_type in ('checkbox', 'radio') and 'checked' not in attrs:
+                return
+            self._form.fields[name] = attrs.get('value', 'on' if input_type in ('checkbox', 'radio') else '')
+        elif tag == 'button' and name:
+            self._form.names.add(name)
+        elif tag == 'select' and name:
+            self._form.names.add(name)
+            self._select = name
+            self._select_first = None
+        elif tag == 'option' and self._select:
+            self._option_value = attrs.get('value')
+            self._option_text = []
+            if 'selected' in attrs:
+                self._form.fields[self._select] = attrs.get('value', '')
+        elif tag == 'textarea' and name:
+            self._form.names.add(name)
+            self._textarea = name
+            self._form.fields[name] = ''
+
+    def handle_data(self, data):
+        if self._select and self._option_value is None:
+            self._option_text.append(data)
+        elif self._textarea and self._form is not None:
+            self._form.fields[self._textarea] += data
+
+    def handle_endtag(self, tag):
+        if tag == 'form':
+            self._form = None
+        elif tag == 'option' and self._select and self._form is not None:
+            value = self._option_value if self._option_value is not None else ''.join(self._option_text).strip()
+            if self._select_first is None:
+                self._select_first = value
+                # 沒有 selected 的下拉選單以第一個選項為預設值
+                self._form.fields.setdefault(self._select, value)
+            self._option_value = None
+        elif tag == 'select':
+            self._select = None
+        elif tag == 'textarea':
+            self._textarea = None
+
+
+def parse_forms(html_content: str) -> List[HtmlForm]:
+    """
+    解析頁面中的所有表單
+
+    Args:
+        html_content (str): HTML 內容
+
+    Returns:
+        List[HtmlForm]: 表單列表（依出現順序）
+    """
+    parser = _FormParser()
+    parser.feed(html_content)
+    parser.close()
+    return parser.forms
+
+
+def _find_form(forms: List[HtmlForm], field_name: str) -> Optional[HtmlForm]:
+    for form in forms:
+        if field_name in form.names:
+            return form
+    return None
+
+
+class HttpBookingSession:
+    """
+    一個已登入的 HTTP Session，重播查詢表單取得會議室時間表
+
+    Args:
+        username (str): 預約系統帳號
+        password (str): 預約系統密碼
+        timeout (float): 每個請求的逾時秒數
+    """
+
+    def __init__(self, username: str, password: str, timeout: float = 15):
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.index_url = booking_index_url()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=2)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._search_form: Optional[HtmlForm] = None
+        self._search_url: Optional[str] = None
+
+    def _send(self, form: HtmlForm, base_url: str, payload: Dict[str, str]) -> requests.Response:
+        url = urljoin(base_url, form.action) if form.action else base_url
+        if form.method == 'post':
+            resp = self.session.post(url, data=payload, timeout=self.timeout)
+        else:
+            resp = self.session.get(url, params=payload, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp
+
+    def _remember_search_form(self, resp: requests.Response) -> bool:
+        form = _find_form(parse_forms(resp.text), 'startDate')
+        if form is None:
+            return False
+        self._search_form = form
+        self._search_url = resp.url
+        return True
+
+    def login(self) -> None:
+        """
+        登入預約系統並記下查詢表單
+
+        Raises:
+            HttpEngineError: 找不到登入表單或登入後未出現查詢頁
+        """
+        with span('http_login'):
+            resp = self.session.get(self.index_url, timeout=self.timeout)
+            resp.raise_for_status()
+            if self._remember_search_form(resp):
+                return  # Cookie 仍有效，已在查詢頁
+
+            login_form = _find_form(parse_forms(resp.text), 'username')
+            if login_form is None:
+                raise HttpEngineError('找不到登入表單')
+
+            payload = login_form.payload(username=self.username, KEY=self.password)
+            resp = self._send(login_form, resp.url, payload)
+            if not self._remember_search_form(resp):
+                # 部分登入流程會先導向其他頁面，再回到查詢頁確認
+                resp = self.session.get(self.index_url, timeout=self.timeout)
+                resp.raise_for_status()
+                if not self._remember_search_form(resp):
+                    raise HttpEngineError('登入失敗或未取得查詢頁')
+
+    def fetch_period(self, date: str, building_id: str, period: str) -> str:
+        """
+        送出查詢表單並回傳指定時段的頁面
+
+        Args:
+            date (str): 查詢日期 (YYYY/MM/DD)
+            building_id (str): 建築物 ID
+            period (str): MORNING 或 AFTERNOON
+
+        Returns:
+            str: 時間表頁面 HTML
+
+        Raises:
+            HttpEngineError: 無法重新登入，或回應不是時間表頁面（錯誤頁、維護頁、沒有時間表的查詢頁）
+        """
+        for attempt in range(2):
+            if self._search_form is None:
+                self.login()
+            payload = self._search_form.payload(
+                startDate=date,
+                endDate=date,
+                searchBeanBuildingPK=building_id,
+                selectedTimePeriod=period,
+            )
+            with span('http_page_fetch'):
+                resp = self._send(self._search_form, self._search_url, payload)
+            if _find_form(parse_forms(resp.text), 'username') is not None:
+                # 被導回登入頁：session 過期，重新登入後再試一次
+                self._search_form = None
+                continue
+            # 與 Selenium 路徑的 page_complete() 相同的檢查，讓呼叫端退回 Selenium 而不是把空結果寫入快取
+            if not is_timetable_page(resp.text):
+                raise HttpEngineError(f'建築物 {building_id} {date} {period} 的回應不是時間表頁面')
+            return resp.text
+        raise HttpEngineError('查詢時 session 已失效且無法重新登入')
+
+    def fetch_building(self, date: str, building_id: str) -> Tuple[str, str]:
+        """
+        取得單一建築物上午與下午的頁面
+
+        Returns:
+            Tuple[str, str]: (上午頁面, 下午頁面)
+        """
+        morning, afternoon = (self.fetch_period(date, building_id, period) for period in PERIODS)
+        return morning, afternoon
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class HttpSessionPool:
+    """
+    已登入 HttpBookingSession 的簡易連線池
+
+    Args:
+        username (str): 預約系統帳號
+        password (str): 預約系統密碼
+        size (int): 最多同時存在的 session 數量
+        checkout_timeout (float): 所有 session 都被借出時最多等待秒數
+    """
+
+    def __init__(self, username: str, password: str, size: int = 4, checkout_timeout: float = 30):
+        self.username = username
+        self.password = password
+        self.size = max(1, size)
+        self.checkout_timeout = checkout_timeout
+        self._idle: 'queue.LifoQueue[HttpBookingSession]' = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> HttpBookingSession:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return HttpBookingSession(self.username, self.password)
+        try:
+            return self._idle.get(timeout=self.checkout_timeout)
+        except queue.Empty:
+            raise HttpPoolTimeout(f'等待 HTTP session 超過 {self.checkout_timeout} 秒')
+
+    @contextmanager
+    def checkout(self):
+        """
+        借用一個 HTTP session；區塊內拋出例外時會丟棄並重建該 session
+
+        Raises:
+            HttpPoolTimeout: 等待時間內借不到可用的 session
+        """
+        session = self._acquire()
+        try:
+            yield session
+        except Exception:
+            session.close()
+            session = HttpBookingSession(self.username, self.password)
+            raise
+        finally:
+            self._idle.put(session)
+
+    def close(self) -> None:
+        """關閉所有閒置的 session"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def resolve_engine(requested: Optional[str] = None) -> str:
+    """
+    決定本次查詢使用的引擎：請求參數優先，其次為環境變數 SCRAPER_ENGINE，預設 selenium
+
+    Returns:
+        str: 'http' 或 'selenium'
+    """
+    engine = (requested or os.getenv('SCRAPER_ENGINE') or 'selenium').lower()
+    return engine if engine in ('http', 'selenium') else 'selenium'
@@ -0,0 +1,200 @@
+"""
+背景查詢工作佇列
+
+POST /jobs 建立工作後立即回傳 job id，由固定數量的工作執行緒依序執行爬蟲，
+呼叫端再以 GET /jobs/<id> 查詢狀態與結果；參數相同且仍在執行中的工作會合併為同一個，
+負載由工作數上限控制，而不是靠 Flask 請求逾時
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, wait as futures_wait
+from typing import Callable, Dict, Optional, Tuple
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+class JobQueueFull(Exception):
+    """等待中的工作已達上限"""
+
+
+class Job:
+    """一個背景查詢工作及其狀態"""
+
+    def __init__(self, key: str, params: dict):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.params = params
+        self.status = JOB_QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result = None
+        self.error: Optional[str] = None
+
+    @property
+    def in_flight(self) -> bool:
+        return self.status in (JOB_QUEUED, JOB_RUNNING)
+
+    def to_dict(self) -> dict:
+        """工作狀態（不含結果內容）"""
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'params': self.params,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'error': self.error,
+        }
+
+
+class JobQueue:
+    """
+    有上限的程序內工作佇列
+
+    Args:
+        workers (int): 同時執行的工作數
+        max_pending (int): 排隊與執行中工作的總數上限
+        retention (float): 完成的工作保留秒數，逾時後無法再查詢
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 50, retention: float = 3600):
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+        self._jobs: Dict[str, Job] = {}
+        self._in_flight: Dict[str, Job] = {}  # 參數鍵 -> 執行中的工作
+        self._futures: Dict[str, Future] = {}  # 工作 id -> 尚未結束的 Future
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.submitted = 0
+        self.deduplicated = 0
+
+    @classmethod
+    def from_env(cls) -> 'JobQueue':
+        """依環境變數 JOB_WORKERS / JOB_MAX_PENDING / JOB_RETENTION 建立佇列"""
+        return cls(
+            workers=int(os.getenv('JOB_WORKERS', '2')),
+            max_pending=int(os.getenv('JOB_MAX_PENDING', '50')),
+            retention=float(os.getenv('JOB_RETENTION', '3600')),
+        )
+
+    def _purge(self) -> None:
+        """移除超過保留時間的已完成工作（呼叫端需持有鎖）"""
+        expire_before = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if not job.in_flight and job.finished_at < expire_before]:
+            del self._jobs[job_id]
+
+    def submit(self, key: str, fn: Callable[[], object], params: Optional[dict] = None) -> Tuple[Job, bool]:
+        """
+        建立工作；若已有相同參數鍵的工作在排隊或執行中，直接回傳該工作
+
+        Args:
+            key (str): 參數鍵，相同鍵的執行中工作會被合併
+            fn (Callable[[], object]): 實際執行的函式，回傳值即為工作結果
+            params (dict, optional): 顯示於狀態中的請求參數
+
+        Returns:
+            Tuple[Job, bool]: (工作, 是否為新建立的工作)
+
+        Raises:
+            JobQueueFull: 排隊與執行中的工作已達上限，或佇列已關閉
+        """
+        with self._lock:
+            if self._closed:
+                raise JobQueueFull('服務即將關閉，不再接受新工作')
+            self._purge()
+            existing = self._in_flight.get(key)
+            if existing is not None:
+                self.deduplicated += 1
+                return existing, False
+            if len(self._in_flight) >= self.max_pending:
+                raise JobQueueFull(f'等待中的工作已達上限 {self.max_pending}')
+
+            job = Job(key, params or {})
+            self._jobs[job.id] = job
+            self._in_flight[key] = job
+            self.submitted += 1
+            self._futures[job.id] = self._executor.submit(self._run, job, fn)
+        return job, True
+
+    def _run(self, job: Job, fn: Callable[[], object]) -> None:
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = fn()
+            job.status = JOB_DONE
+        except Exception as e:
+            job.error = str(e)
+            job.status = JOB_FAILED
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                if self._in_flight.get(job.key) is job:
+                    del self._in_flight[job.key]
+                self._futures.pop(job.id, None)
+            print(f"🧾 工作 {job.id[:8]} {job.status} - 耗時 {job.finished_at - job.started_at:.2f} 秒")
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait: bool = True, timeout: Optional[float] = None) -> int:
+        """
+        停止接受新工作、取消尚未開始的工作（標記為 failed），並等待執行中的工作結束
+
+        Args:
+            wait (bool): 是否等待執行中的工作
+            timeout (float, optional): 最多等待秒數，None 表示等到全部結束
+
+        Returns:
+            int: 逾時後仍在執行的工作數
+        """
+        with self._lock:
+            self._closed = True
+            pending = list(self._futures.items())
+        cancelled = 0
+        for job_id, future in pending:
+            if future.cancel():
+                cancelled += 1
+                with self._lock:
+                    job = self._jobs.get(job_id)
+                    self._futures.pop(job_id, None)
+                    if job is not None:
+                        job.status = JOB_FAILED
+                        job.error = '服務關閉，工作已取消'
+                        job.finished_at = time.time()
+                        if self._in_flight.get(job.key) is job:
+                            del self._in_flight[job.key]
+        if cancelled:
+            print(f"🧾 服務關閉，取消 {cancelled} 個尚未開始的工作")
+        self._executor.shutdown(wait=False)
+
+        with self._lock:
+            running = list(self._futures.values())
+        if wait and running:
+            futures_wait(running, timeout=timeout)
+        return sum(1 for future in running if not future.done())
+
+    def stats(self) -> dict:
+        """回傳佇列使用統計"""
+        with self._lock:
+            running = sum(1 for job in self._in_flight.values() if job.status == JOB_RUNNING)
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'queued': len(self._in_flight) - running,
+                'running': running,
+                'retained': len(self._jobs),
+                'submitted': self.submitted,
+                'deduplicated': self.deduplicated,
+            }
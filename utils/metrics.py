@@ -0,0 +1,236 @@
+"""
+各階段耗時與計數的量測
+
+以具名的 span（driver_start、login、date_set、building_select、period_switch、page_fetch、
+parse、merge、render 等）包住爬蟲與處理流程的每個步驟，耗時累積為直方圖，
+例外次數累積為計數器；GET /metrics 以 Prometheus 文字格式輸出，取代只印在 stdout 的耗時統計
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+# 指標名稱前綴
+NAMESPACE = 'booking'
+
+# 直方圖的預設上界（秒）：涵蓋毫秒級的解析到數十秒的瀏覽器啟動與登入
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Prometheus 文字格式的 Content-Type
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(values: Dict[str, object]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in values.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """固定上界的累計直方圖（與 Prometheus histogram 相同，bucket 為小於等於上界的次數）"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最後一格為 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """[(上界, 小於等於上界的次數)]，最後一項上界為 +Inf"""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class MetricFamily(NamedTuple):
+    """由外部統計（連線池、快取等）在輸出時產生的指標"""
+    name: str
+    kind: str  # counter 或 gauge
+    help: str
+    samples: List[Tuple[Dict[str, object], float]]
+
+
+class Metrics:
+    """
+    執行緒安全的直方圖與計數器集合
+
+    Args:
+        buckets (Sequence[float]): 直方圖上界（秒），由小到大
+        enabled (bool): 為 False 時 span / observe / inc 不做任何記錄
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, enabled: bool = True):
+        self.buckets = tuple(sorted(buckets))
+        self.enabled = enabled
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'Metrics':
+        """依環境變數 METRICS_ENABLED / METRICS_BUCKETS（逗號分隔的秒數）建立"""
+        buckets = os.getenv('METRICS_BUCKETS')
+        return cls(
+            buckets=tuple(float(value) for value in buckets.split(',') if value.strip()) if buckets else DEFAULT_BUCKETS,
+            enabled=os.getenv('METRICS_ENABLED', 'true').lower() not in ('0', 'false', 'no'),
+        )
+
+    def describe(self, name: str, help_text: str) -> None:
+        """設定指標的 HELP 說明"""
+        self._help[name] = help_text
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        """在直方圖 name 中記錄一次耗時"""
+        if not self.enabled:
+            return
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        """計數器 name 加上 amount"""
+        if not self.enabled:
+            return
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    @contextmanager
+    def span(self, stage: str):
+        """
+        量測區塊耗時，記錄到 stage_duration_seconds{stage=...}；
+        區塊拋出例外時另外累加 stage_errors_total{stage=...} 後再拋出
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc('stage_errors_total', stage=stage)
+            raise
+        finally:
+            self.observe('stage_duration_seconds', time.perf_counter() - start, stage=stage)
+
+    def stage_summary(self) -> Dict[str, dict]:
+        """
+        各階段的次數與平均耗時（供 /health 等 JSON 輸出）
+
+        Returns:
+            Dict[str, dict]: 階段名稱 -> {count, avg, errors}
+        """
+        with self._lock:
+            durations = dict(self._histograms.get('stage_duration_seconds', {}))
+            errors = dict(self._counters.get('stage_errors_total', {}))
+            summary = {}
+            for labels, histogram in durations.items():
+                stage = dict(labels).get('stage', '')
+                summary[stage] = {
+                    'count': histogram.count,
+                    'avg': round(histogram.sum / histogram.count, 4) if histogram.count else 0.0,
+                    'errors': int(errors.get(labels, 0)),
+                }
+            return summary
+
+    def render(self, families: Iterable[MetricFamily] = ()) -> str:
+        """
+        以 Prometheus 文字格式輸出所有直方圖、計數器與外部統計
+
+        Args:
+            families (Iterable[MetricFamily]): 輸出時才取得的外部統計
+
+        Returns:
+            str: /metrics 的回應內容
+        """
+        lines = []
+        with self._lock:
+            for name in sorted(self._histograms):
+                full_name = f'{NAMESPACE}_{name}'
+                lines.append(f'# HELP {full_name} {self._help.get(name, name)}')
+                lines.append(f'# TYPE {full_name} histogram')
+                for labels, histogram in sorted(self._histograms[name].items()):
+                    for bound, count in histogram.cumulative():
+                        lines.append(f'{full_name}_bucket{_format_labels(labels, (("le", _format_value(bound)),))} {count}')
+                    lines.append(f'{full_name}_sum{_format_labels(labels)} {histogram.sum!r}')
+                    lines.append(f'{full_name}_count{_format_labels(labels)} {histogram.count}')
+            for name in sorted(self._counters):
+                full_name = f'{NAMESPACE}_{name}'
+                lines.append(f'# HELP {full_name} {self._help.get(name, name)}')
+                lines.append(f'# TYPE {full_name} counter')
+                for labels, value in sorted(self._counters[name].items()):
+                    lines.append(f'{full_name}{_format_labels(labels)} {_format_value(value)}')
+
+        for family in families:
+            full_name = f'{NAMESPACE}_{family.name}'
+            lines.append(f'# HELP {full_name} {family.help}')
+            lines.append(f'# TYPE {full_name} {family.kind}')
+            for labels, value in family.samples:
+                lines.append(f'{full_name}{_format_labels(_labels(labels))} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+# 整個行程共用的量測（爬蟲、連線池、處理流程與 API 都記錄到這裡）
+_metrics = Metrics.from_env()
+_metrics.describe('stage_duration_seconds', 'Duration of crawl / processing stages in seconds')
+_metrics.describe('stage_errors_total', 'Exceptions raised inside a stage')
+
+
+def get_metrics() -> Metrics:
+    """取得行程共用的 Metrics"""
+    return _metrics
+
+
+def span(stage: str):
+    """在共用的 Metrics 中量測一個階段，用法：with span('login'): ..."""
+    return _metrics.span(stage)
+
+
+def inc(name: str, amount: float = 1, **labels) -> None:
+    """累加共用 Metrics 中的計數器"""
+    _metrics.inc(name, amount, **labels)
+
+
+def observe(name: str, seconds: float, **labels) -> None:
+    """在共用 Metrics 的直方圖中記錄一次耗時"""
+    _metrics.observe(name, seconds, **labels)
+
@@ -0,0 +1,208 @@
+"""
+會議室資料處理流程
+
+collect -> parse -> merge（含去除重複）-> render 四個階段直接在記憶體中傳遞資料，
+不再經過 ./tmp 的 HTML / TSV 檔案；需要除錯時才將中間產物寫入指定目錄
+"""
+
+import os
+import re
+import uuid
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional, Union
+
+from utils.convert_to_csv import CSV_FIELDNAMES, render_csv
+from utils.dom_extract import ExtractedPage
+from utils.extract_meeting_info import extract_meetings_and_rooms
+from utils.metrics import inc, span
+from utils.records import MeetingBatch
+
+PERIODS = ('MORNING', 'AFTERNOON')
+
+# 例如 6_20250718_morning.html
+_CAPTURE_FILE_PATTERN = re.compile(r'(?P<building>[^_/\\]+)_(?P<date>\d{8})_(?P<period>morning|afternoon)\.html$')
+
+
+@dataclass
+class PageCapture:
+    """單一建築物、單一時段的時間表頁面；瀏覽器內擷取時只有 meetings 與 rooms 而沒有 html"""
+    building_id: str
+    building_name: str
+    date: str
+    period: str
+    html: str = ''
+    meetings: Optional[List[List[str]]] = None
+    rooms: Optional[List[str]] = None
+
+
+@dataclass
+class ParsedPage:
+    """
+    單一頁面解析出的會議記錄；
+    rooms 為時間表上的所有會議室（包含當天沒有會議的會議室），
+    unparsed 為時間格式無法解析、未放入 meetings 的原始資料列
+    """
+    building_id: str
+    building_name: str
+    date: str
+    period: str
+    meetings: MeetingBatch = field(default_factory=MeetingBatch)
+    rooms: List[str] = field(default_factory=list)
+    unparsed: List[List[str]] = field(default_factory=list)
+
+
+@dataclass
+class PipelineResult:
+    """合併後的會議資料（依會議室排列）與統計"""
+    meetings: MeetingBatch
+    pages: int = 0
+    total_meetings: int = 0  # 去除重複後的會議數
+    duplicates: int = 0  # 合併時移除的重複會議數
+    unparsed: int = 0  # 時間格式無法解析而未輸出的會議數
+    parsed_pages: List[ParsedPage] = field(default_factory=list)  # 本次新解析的頁面
+
+
+def page_sort_key(page) -> str:
+    """PageCapture / ParsedPage 的排序鍵，與原本 tmp 檔名 {building}_{period} 的排序一致"""
+    return f'{page.building_id}_{page.period.lower()}'
+
+
+PageData = Union[str, ExtractedPage, List[List[str]]]
+
+
+def _capture(building_id: str, building_name: str, date: str, period: str, data: PageData) -> PageCapture:
+    if isinstance(data, str):
+        return PageCapture(building_id, building_name, date, period, html=data)
+    if isinstance(data, ExtractedPage):
+        return PageCapture(building_id, building_name, date, period, meetings=data.meetings, rooms=data.rooms)
+    return PageCapture(building_id, building_name, date, period, meetings=data)
+
+
+def collect(building_id: str, building_name: str, date: str, morning: PageData,
+            afternoon: PageData) -> List[PageCapture]:
+    """
+    將爬蟲取得的上下午頁面包裝為 PageCapture
+
+    Args:
+        morning / afternoon: 頁面 HTML，或瀏覽器內已擷取的 ExtractedPage
+
+    Returns:
+        List[PageCapture]: [上午, 下午]
+    """
+    return [
+        _capture(building_id, building_name, date, 'MORNING', morning),
+        _capture(building_id, building_name, date, 'AFTERNOON', afternoon),
+    ]
+
+
+def parse(captures: Iterable[PageCapture]) -> Iterator[ParsedPage]:
+    """
+    逐頁以單次掃描解析會議記錄與會議室列表；已在瀏覽器內擷取的頁面直接沿用
+
+    時間無法解析的資料列放在 ParsedPage.unparsed，並印出內容、累加 errors_total{kind="unparseable_meeting"}
+    """
+    for capture in captures:
+        with span('parse'):
+            if capture.meetings is not None:
+                rows, rooms = capture.meetings, list(capture.rooms or [])
+            else:
+                rows, rooms = extract_meetings_and_rooms(capture.html)
+            unparsed = []
+            meetings = MeetingBatch()
+            meetings.extend(rows, rejected=unparsed)
+        if unparsed:
+            inc('errors_total', len(unparsed), kind='unparseable_meeting')
+            print(f"⚠️ {capture.building_name or capture.building_id} {capture.date} {capture.period} "
+                  f"略過 {len(unparsed)} 筆時間格式無法解析的記錄：")
+            for row in unparsed:
+                print(f"   {row}")
+        yield ParsedPage(capture.building_id, capture.building_name, capture.date, capture.period, meetings, rooms,
+                         unparsed)
+
+
+def merge(parsed_pages: Iterable[ParsedPage]) -> PipelineResult:
+    """
+    依會議室合併所有頁面的會議記錄，格式與 convert_to_csv.process_files() 相同
+
+    Returns:
+        PipelineResult: 合併結果
+    """
+    parsed_pages = list(parsed_pages)
+    with span('merge'):
+        unique, duplicates = MeetingBatch.concat([page.meetings for page in parsed_pages]).unique()
+        grouped = unique.grouped_by_room()
+    return PipelineResult(grouped, len(parsed_pages), len(unique), duplicates,
+                          unparsed=sum(len(page.unparsed) for page in parsed_pages))
+
+
+def read_captures(html_files: Iterable[str]) -> List[PageCapture]:
+    """
+    讀取已存檔的時間表頁面；檔名符合 {建築物}_{YYYYMMDD}_{morning|afternoon}.html 時會帶入對應資訊
+
+    Args:
+        html_files (Iterable[str]): HTML 檔案路徑
+
+    Returns:
+        List[PageCapture]: 頁面列表
+    """
+    captures = []
+    for html_file in html_files:
+        with open(html_file, 'r', encoding='utf-8-sig') as f:
+            html_content = f.read()
+        match = _CAPTURE_FILE_PATTERN.search(html_file)
+        if match:
+            raw_date = match.group('date')
+            captures.append(PageCapture(match.group('building'), match.group('building'),
+                                        f'{raw_date[:4]}/{raw_date[4:6]}/{raw_date[6:]}',
+                                        match.group('period').upper(), html_content))
+        else:
+            captures.append(PageCapture('', '', '', '', html_content))
+    return captures
+
+
+def dump_debug(debug_dir: str, captures: List[PageCapture], parsed_pages: List[ParsedPage],
+               result: PipelineResult) -> str:
+    """
+    將原始 HTML、每頁 TSV 與合併 CSV 寫入除錯目錄（每次呼叫使用獨立子目錄，避免並行請求互相覆蓋）
+
+    Returns:
+        str: 本次寫入的子目錄
+    """
+    run_dir = os.path.join(debug_dir, uuid.uuid4().hex[:12])
+    os.makedirs(run_dir, exist_ok=True)
+    for capture, page in zip(captures, parsed_pages):
+        base = os.path.join(run_dir, f'{capture.building_id}_{capture.date.replace("/", "")}_{capture.period.lower()}')
+        if capture.html:
+            with open(f'{base}.html', 'w', encoding='utf-8-sig') as f:
+                f.write(capture.html)
+        with open(base, 'w', encoding='utf-8') as f:
+            for record in page.meetings:
+                f.write('\t'.join(record.to_row()) + '\n')
+    with open(os.path.join(run_dir, 'combined.csv'), 'w', newline='', encoding='utf-8-sig') as f:
+        f.write(render_csv(result.meetings))
+    return run_dir
+
+
+def run_pipeline(captures: List[PageCapture], debug_dir: Optional[str] = None,
+                 cached_pages: Optional[List[ParsedPage]] = None) -> PipelineResult:
+    """
+    執行 parse -> merge，並在指定 debug_dir 時保存中間產物
+
+    Args:
+        captures (List[PageCapture]): collect 階段取得的頁面
+        debug_dir (str, optional): 除錯輸出目錄，未指定則完全不寫檔
+        cached_pages (List[ParsedPage], optional): 快取中已解析的頁面，依 page_sort_key 與新頁面一起合併
+
+    Returns:
+        PipelineResult: 合併結果
+    """
+    parsed_pages = list(parse(captures))
+    if cached_pages:
+        result = merge(sorted([*cached_pages, *parsed_pages], key=page_sort_key))
+    else:
+        result = merge(parsed_pages)
+    result.parsed_pages = parsed_pages
+    if debug_dir:
+        run_dir = dump_debug(debug_dir, captures, parsed_pages, result)
+        print(f"🐛 除錯檔案已寫入：{run_dir}")
+    return result
@@ -0,0 +1,217 @@
+"""
+會議記錄的資料模型
+
+MeetingRecord 為單筆會議（時間已拆成整數分鐘），MeetingBatch 以欄為單位保存多筆會議：
+字串欄位經 sys.intern 共用、時間存在 array 中，解析、合併、CSV / JSON 輸出、歷史資料庫與
+可用性索引共用同一份資料，不必各自重新拆解「YYYY/MM/DD HH:MM~HH:MM」字串
+"""
+
+import re
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+
+# 會議時間，例如 2024/01/01 08:30~18:30
+_TIME_INFO_PATTERN = re.compile(r'(?P<date>\d{4}/\d{1,2}/\d{1,2})\s+(?P<start>\d{1,2}:\d{2})\s*~\s*(?P<end>\d{1,2}:\d{2})')
+
+
+def to_minutes(value: str) -> int:
+    """
+    將 HH:MM 轉為當天的分鐘數
+
+    Raises:
+        ValueError: 格式錯誤
+    """
+    hours, minutes = value.strip().split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def format_minutes(value: int) -> str:
+    """將分鐘數轉回 HH:MM"""
+    return f'{value // 60:02d}:{value % 60:02d}'
+
+
+def parse_time_info(time_info: str) -> Optional[Tuple[str, int, int]]:
+    """
+    拆解會議時間欄位
+
+    Returns:
+        Optional[Tuple[str, int, int]]: (日期 YYYY/MM/DD, 開始分鐘, 結束分鐘)，格式不符時為 None
+    """
+    match = _TIME_INFO_PATTERN.search(time_info)
+    if not match:
+        return None
+    year, month, day = match.group('date').split('/')
+    return f'{year}/{int(month):02d}/{int(day):02d}', to_minutes(match.group('start')), to_minutes(match.group('end'))
+
+
+class MeetingRecord(NamedTuple):
+    """單筆會議；start / end 為當天的分鐘數"""
+    room: str
+    date: str
+    start: int
+    end: int
+    subject: str = ''
+    organizer: str = ''
+
+    @classmethod
+    def from_row(cls, row: Iterable[str]) -> Optional['MeetingRecord']:
+        """
+        由 [會議室名稱, 時間, 會議名稱, 主辦方] 建立（extract_meeting_info() 的輸出或 CSV 資料列）
+
+        Returns:
+            Optional[MeetingRecord]: 沒有會議室名稱或時間格式不符時為 None
+        """
+        room, time_info, subject, organizer = (list(row) + [''] * 4)[:4]
+        parsed = parse_time_info(time_info or '')
+        if not room or parsed is None:
+            return None
+        return cls(room.strip(), parsed[0], parsed[1], parsed[2], (subject or '').strip(), (organizer or '').strip())
+
+    @property
+    def start_time(self) -> str:
+        return format_minutes(self.start)
+
+    @property
+    def end_time(self) -> str:
+        return format_minutes(self.end)
+
+    @property
+    def time_info(self) -> str:
+        """會議時間欄位，例如 2024/01/01 08:30~18:30"""
+        return f'{self.date} {self.start_time}~{self.end_time}'
+
+    def to_row(self) -> List[str]:
+        """轉回 [會議室名稱, 時間, 會議名稱, 主辦方]"""
+        return [self.room, self.time_info, self.subject, self.organizer]
+
+
+MeetingLike = Union[MeetingRecord, Iterable[str]]
+
+
+def as_record(meeting: MeetingLike) -> Optional[MeetingRecord]:
+    """接受 MeetingRecord 或 [會議室名稱, 時間, 會議名稱, 主辦方] 資料列"""
+    return meeting if isinstance(meeting, MeetingRecord) else MeetingRecord.from_row(meeting)
+
+
+class MeetingBatch:
+    """
+    以欄為單位保存的會議記錄
+
+    會議室、日期、會議名稱與主辦方字串經 sys.intern 共用，開始 / 結束分鐘存在 array('H')，
+    一整年逐日累積的記錄不會為每筆會議各自保留一份字串與 list
+    """
+
+    __slots__ = ('rooms', 'dates', 'starts', 'ends', 'subjects', 'organizers')
+
+    def __init__(self, records: Iterable[MeetingLike] = ()):
+        self.rooms: List[str] = []
+        self.dates: List[str] = []
+        self.starts = array('H')
+        self.ends = array('H')
+        self.subjects: List[str] = []
+        self.organizers: List[str] = []
+        self.extend(records)
+
+    def append(self, record: MeetingRecord) -> None:
+        self.rooms.append(sys.intern(record.room))
+        self.dates.append(sys.intern(record.date))
+        self.starts.append(record.start)
+        self.ends.append(record.end)
+        self.subjects.append(sys.intern(record.subject))
+        self.organizers.append(sys.intern(record.organizer))
+
+    def extend(self, records: Iterable[MeetingLike], rejected: Optional[List[MeetingLike]] = None) -> int:
+        """
+        加入多筆會議；資料列格式不符（沒有會議室或時間無法解析）時略過
+
+        Args:
+            records (Iterable[MeetingLike]): 會議記錄或資料列
+            rejected (List[MeetingLike], optional): 提供時收集被略過的原始資料列，讓呼叫端回報而不是無聲遺失
+
+        Returns:
+            int: 加入的筆數
+        """
+        added = 0
+        for meeting in records:
+            record = as_record(meeting)
+            if record is not None:
+                self.append(record)
+                added += 1
+            elif rejected is not None:
+                rejected.append(meeting)
+        return added
+
+    def __len__(self) -> int:
+        return len(self.rooms)
+
+    def __getitem__(self, index: int) -> MeetingRecord:
+        return MeetingRecord(self.rooms[index], self.dates[index], self.starts[index], self.ends[index],
+                             self.subjects[index], self.organizers[index])
+
+    def __iter__(self) -> Iterator[MeetingRecord]:
+        return map(MeetingRecord, self.rooms, self.dates, self.starts, self.ends, self.subjects, self.organizers)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, MeetingBatch) and list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return f'MeetingBatch({len(self)} meetings)'
+
+    def room_order(self) -> Dict[str, List[int]]:
+        """
+        依會議室分組的列索引
+
+        Returns:
+            Dict[str, List[int]]: 會議室名稱（依第一次出現的順序） -> 該會議室記錄的索引（保持原順序）
+        """
+        groups: Dict[str, List[int]] = {}
+        for index, room in enumerate(self.rooms):
+            groups.setdefault(room, []).append(index)
+        return groups
+
+    def grouped_by_room(self) -> 'MeetingBatch':
+        """依會議室第一次出現的順序重新排列，同一會議室的記錄保持原順序（合併輸出的格式）"""
+        grouped = MeetingBatch()
+        for indexes in self.room_order().values():
+            for index in indexes:
+                grouped.append(self[index])
+        return grouped
+
+    def unique(self, seen: Optional[Set[MeetingRecord]] = None) -> Tuple['MeetingBatch', int]:
+        """
+        移除重複的會議（會議室、日期、起訖時間、會議名稱與主辦方都相同），保留第一次出現的順序
+
+        跨越中午的會議會同時出現在上午與下午的頁面，合併前以雜湊集合在線性時間內去除
+
+        Args:
+            seen (Set[MeetingRecord], optional): 已輸出過的會議；串流時跨頁面共用，會原地更新
+
+        Returns:
+            Tuple[MeetingBatch, int]: (去除重複後的會議, 移除的筆數)
+        """
+        seen = set() if seen is None else seen
+        unique = MeetingBatch()
+        for record in self:
+            if record in seen:
+                continue
+            seen.add(record)
+            unique.append(record)
+        return unique, len(self) - len(unique)
+
+    def to_rows(self) -> List[List[str]]:
+        """轉回 [會議室名稱, 時間, 會議名稱, 主辦方] 資料列"""
+        return [record.to_row() for record in self]
+
+    @classmethod
+    def concat(cls, batches: Iterable['MeetingBatch']) -> 'MeetingBatch':
+        """依序串接多個 batch"""
+        combined = cls()
+        for batch in batches:
+            combined.rooms.extend(batch.rooms)
+            combined.dates.extend(batch.dates)
+            combined.starts.extend(batch.starts)
+            combined.ends.extend(batch.ends)
+            combined.subjects.extend(batch.subjects)
+            combined.organizers.extend(batch.organizers)
+        return combined
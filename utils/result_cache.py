@@ -0,0 +1,153 @@
+"""
+查詢結果快取
+
+以 (建築物, 日期) 為鍵保存已解析的上下午會議記錄，讓 /run 重複查詢同一天時不必再爬取；
+過去日期的資料不會再變動，可保存較久，今天與未來日期則只保存短時間。
+/book 預訂成功後會使對應的建築物與日期失效
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Iterable, Optional, Tuple
+
+# 快取狀態（回應標頭 X-Cache 的值）
+CACHE_HIT = 'HIT'
+CACHE_MISS = 'MISS'
+CACHE_PARTIAL = 'PARTIAL'
+
+
+def normalize_date(value: str) -> str:
+    """將 2025/7/1、2025-07-01 等寫法統一為 YYYY/MM/DD，無法解析時原樣回傳"""
+    for fmt in ('%Y/%m/%d', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt).strftime('%Y/%m/%d')
+        except (TypeError, ValueError):
+            continue
+    return value
+
+
+def cache_status(hits: int, total: int) -> str:
+    """
+    依命中數決定快取狀態
+
+    Returns:
+        str: HIT（全部命中）、MISS（全部未命中）或 PARTIAL
+    """
+    if total and hits == total:
+        return CACHE_HIT
+    return CACHE_PARTIAL if hits else CACHE_MISS
+
+
+class ResultCache:
+    """
+    以 (建築物 ID, 日期) 為鍵、具 LRU 上限與 TTL 的結果快取
+
+    Args:
+        size (int): 最多保存的項目數量，0 表示停用快取
+        ttl_past (float): 過去日期的保存秒數
+        ttl_current (float): 今天與未來日期的保存秒數
+    """
+
+    def __init__(self, size: int = 512, ttl_past: float = 86400, ttl_current: float = 120):
+        self.size = max(0, size)
+        self.ttl_past = ttl_past
+        self.ttl_current = ttl_current
+        self._entries: 'OrderedDict[Tuple[str, str], Tuple[float, object]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> 'ResultCache':
+        """依環境變數 RESULT_CACHE_SIZE / RESULT_CACHE_TTL_PAST / RESULT_CACHE_TTL_CURRENT 建立快取"""
+        return cls(
+            size=int(os.getenv('RESULT_CACHE_SIZE', '512')),
+            ttl_past=float(os.getenv('RESULT_CACHE_TTL_PAST', '86400')),
+            ttl_current=float(os.getenv('RESULT_CACHE_TTL_CURRENT', '120')),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def ttl_for(self, query_date: str) -> float:
+        """過去日期使用 ttl_past，今天與未來日期（或無法解析的日期）使用 ttl_current"""
+        try:
+            day = datetime.strptime(query_date, '%Y/%m/%d').date()
+        except (TypeError, ValueError):
+            return self.ttl_current
+        return self.ttl_past if day < date.today() else self.ttl_current
+
+    def _lookup(self, key: Tuple[str, str], count: bool) -> Optional[object]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.time():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return None
+            if count:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return entry[1]
+
+    def get(self, building_id: str, query_date: str) -> Optional[object]:
+        """取得快取值；不存在或已過期時回傳 None"""
+        if not self.enabled:
+            return None
+        return self._lookup((building_id, normalize_date(query_date)), count=True)
+
+    def peek(self, building_id: str, query_date: str) -> bool:
+        """檢查是否有有效的快取值，不影響命中統計與 LRU 順序"""
+        if not self.enabled:
+            return False
+        return self._lookup((building_id, normalize_date(query_date)), count=False) is not None
+
+    def put(self, building_id: str, query_date: str, value: object) -> None:
+        """保存一筆結果，超過上限時淘汰最久未使用的項目"""
+        if not self.enabled:
+            return
+        query_date = normalize_date(query_date)
+        key = (building_id, query_date)
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_for(query_date), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, building_id: str, query_dates: Iterable[str]) -> int:
+        """
+        使指定建築物、日期的快取失效
+
+        Returns:
+            int: 被移除的項目數量
+        """
+        removed = 0
+        with self._lock:
+            for query_date in query_dates:
+                if self._entries.pop((building_id, normalize_date(query_date)), None) is not None:
+                    removed += 1
+            self.invalidations += removed
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """回傳快取使用統計"""
+        with self._lock:
+            return {
+                'size': self.size,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+            }
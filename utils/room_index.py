@@ -0,0 +1,143 @@
+"""
+會議室預訂按鈕索引
+
+從目前頁面的 #timeTableMeetingRoom 建立「會議室名稱 -> 預訂按鈕定位」對照表，
+取代寫死的 songren_room_xpath / meeting_room_xpath；每個建築物的索引快取一段時間，
+查不到會議室時（版面變動或索引過期）會重新從頁面建立
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from selenium.webdriver.common.by import By
+
+# 時間表由「標題 div（含 .Room）」與「時段 div（第一個 button 為預訂按鈕）」交錯組成，
+# 回傳 {會議室名稱: 時段 div 在同層 div 中的序號（從 1 起算，等同 XPath 的 div[n]）}
+_ROOM_INDEX_JS = """
+    var table = document.getElementById('timeTableMeetingRoom');
+    if (!table) return null;
+    var index = {};
+    var position = 0;
+    var pendingRoom = null;
+    for (var child = table.firstElementChild; child; child = child.nextElementSibling) {
+        if (child.tagName !== 'DIV') continue;
+        position += 1;
+        var room = child.querySelector('.Room');
+        if (room && child.classList.contains('Title')) {
+            pendingRoom = room.textContent.trim();
+            continue;
+        }
+        if (pendingRoom !== null && child.querySelector(':scope > button')) {
+            if (!(pendingRoom in index)) index[pendingRoom] = position;
+        }
+        pendingRoom = null;
+    }
+    return index;
+"""
+
+# 確認第 arguments[0] 個時段 div 的前一個 div 仍是名為 arguments[1] 的會議室（版面是否變動）
+_VERIFY_ROOM_JS = """
+    var row = document.querySelector('#timeTableMeetingRoom > div:nth-of-type(' + arguments[0] + ')');
+    var title = row && row.previousElementSibling;
+    var room = title && title.querySelector('.Room');
+    return !!room && room.textContent.trim() === arguments[1];
+"""
+
+
+class UnknownRoomError(Exception):
+    """建築物的時間表中找不到指定的會議室"""
+
+    def __init__(self, room: str, available: List[str]):
+        self.room = room
+        self.available = available
+        super().__init__(f'找不到會議室: {room}')
+
+
+def button_locator(position: int) -> Tuple[str, str]:
+    """時段 div 序號對應的預訂按鈕定位（以 id 為起點的 CSS 子選擇器，不需掃描整頁）"""
+    return By.CSS_SELECTOR, f'#timeTableMeetingRoom > div:nth-of-type({position}) > button:nth-of-type(1)'
+
+
+class RoomIndex:
+    """
+    各建築物的會議室預訂按鈕索引
+
+    Args:
+        ttl (float): 索引保存秒數
+    """
+
+    def __init__(self, ttl: float = 3600):
+        self.ttl = ttl
+        self._indexes: Dict[str, Tuple[float, Dict[str, int]]] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.refreshes = 0
+
+    @classmethod
+    def from_env(cls) -> 'RoomIndex':
+        """依環境變數 ROOM_INDEX_TTL 建立"""
+        return cls(ttl=float(os.getenv('ROOM_INDEX_TTL', '3600')))
+
+    def _cached(self, building_id: str) -> Optional[Dict[str, int]]:
+        with self._lock:
+            entry = self._indexes.get(building_id)
+            if entry is None or entry[0] < time.time():
+                return None
+            return entry[1]
+
+    def refresh(self, driver, building_id: str) -> Dict[str, int]:
+        """
+        從目前頁面（已選好該建築物）重新建立索引
+
+        Returns:
+            Dict[str, int]: 會議室名稱 -> 時段 div 序號
+        """
+        index = driver.execute_script(_ROOM_INDEX_JS) or {}
+        with self._lock:
+            self._indexes[building_id] = (time.time() + self.ttl, index)
+            self.refreshes += 1
+        print(f"🗂️ 已建立建築物 {building_id} 的會議室索引 - {len(index)} 間")
+        return index
+
+    @staticmethod
+    def _match(index: Dict[str, int], room: str) -> Optional[Tuple[str, int]]:
+        """
+        完全相符優先；否則接受唯一一個包含該名稱的會議室（例如 3303 -> 3303會議室）
+
+        Returns:
+            Optional[Tuple[str, int]]: (完整會議室名稱, 時段 div 序號)
+        """
+        if room in index:
+            return room, index[room]
+        candidates = [name for name in index if room in name]
+        return (candidates[0], index[candidates[0]]) if len(candidates) == 1 else None
+
+    def locate(self, driver, building_id: str, room: str) -> Tuple[str, str]:
+        """
+        取得會議室預訂按鈕的定位；索引不存在、過期、查不到或版面已變動時從頁面重建一次
+
+        Returns:
+            Tuple[str, str]: (By, 選擇器)
+
+        Raises:
+            UnknownRoomError: 重建索引後仍找不到該會議室
+        """
+        index = self._cached(building_id)
+        match = self._match(index, room) if index is not None else None
+        if match is not None and driver.execute_script(_VERIFY_ROOM_JS, match[1], match[0]):
+            with self._lock:
+                self.hits += 1
+            return button_locator(match[1])
+
+        index = self.refresh(driver, building_id)
+        match = self._match(index, room)
+        if match is None:
+            raise UnknownRoomError(room, sorted(index))
+        return button_locator(match[1])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'buildings': len(self._indexes), 'hits': self.hits, 'refreshes': self.refreshes}
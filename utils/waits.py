@@ -0,0 +1,190 @@
+"""
+事件驅動的頁面等待
+
+以 MutationObserver 監看 #timeTableMeetingRoom，切換上下午或送出表單後，
+只要時間表重新載入或內容變動並穩定下來就立即返回，取代固定的 time.sleep；
+每個步驟的耗時由 StepTimer 記錄
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+TIMETABLE_ID = 'timeTableMeetingRoom'
+
+# 在時間表（找不到時為 body）上掛載 MutationObserver，回傳本次等待的識別碼
+_ARM_OBSERVER_JS = """
+    var token = Math.random().toString(36).slice(2);
+    var state = {token: token, mutations: 0, last: performance.now()};
+    window.__timetableWait = state;
+    if (window.__timetableObserver) window.__timetableObserver.disconnect();
+    var target = document.getElementById(arguments[0]) || document.body;
+    window.__timetableObserver = new MutationObserver(function (records) {
+        state.mutations += records.length;
+        state.last = performance.now();
+    });
+    window.__timetableObserver.observe(target, {childList: true, subtree: true, characterData: true, attributes: true});
+    return token;
+"""
+
+# 回傳等待狀態：
+#   reloaded - 已換成新頁面且時間表存在（原本掛載的識別碼消失）
+#   mutated  - 同一頁面內時間表有變動，且已穩定 arguments[1] 毫秒
+#   settled  - 沒有變動，且已穩定 arguments[1] 毫秒
+#   loading / pending - 尚未就緒
+_OBSERVER_STATUS_JS = """
+    var ready = document.readyState === 'complete' && !!document.getElementById(arguments[2]);
+    var state = window.__timetableWait;
+    if (!state || state.token !== arguments[0]) return ready ? 'reloaded' : 'loading';
+    if (!ready || performance.now() - state.last < arguments[1]) return 'pending';
+    return state.mutations > 0 ? 'mutated' : 'settled';
+"""
+
+
+class StepTimer:
+    """記錄每個步驟的耗時，用於找出等待時間花在哪裡"""
+
+    def __init__(self, label: str = ''):
+        self.label = label
+        self.steps: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def step(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((name, time.perf_counter() - start))
+
+    def totals(self) -> Dict[str, float]:
+        """各步驟名稱的累計耗時（秒）"""
+        totals: Dict[str, float] = {}
+        for name, elapsed in self.steps:
+            totals[name] = totals.get(name, 0.0) + elapsed
+        return totals
+
+    def summary(self) -> str:
+        return '，'.join(f'{name} {elapsed:.2f}s' for name, elapsed in self.steps)
+
+    def report(self) -> None:
+        if self.steps:
+            print(f"⏱️ {self.label} 步驟耗時：{self.summary()}")
+
+
+class PageWaiter:
+    """
+    時間表頁面的等待設定與實作
+
+    Args:
+        timeout (float): 等待時間表更新的秒數上限
+        settle_ms (float): 內容無變動多久（毫秒）視為穩定
+        poll_interval (float): 檢查間隔秒數
+        submit_timeout (float): 預訂送出後等待頁面回應的秒數上限
+    """
+
+    def __init__(self, timeout: float = 10, settle_ms: float = 150, poll_interval: float = 0.05,
+                 submit_timeout: float = 15):
+        self.timeout = timeout
+        self.settle_ms = settle_ms
+        self.poll_interval = poll_interval
+        self.submit_timeout = submit_timeout
+
+    @classmethod
+    def from_env(cls) -> 'PageWaiter':
+        """依環境變數 WAIT_TIMEOUT / WAIT_SETTLE_MS / WAIT_POLL_INTERVAL / BOOKING_SUBMIT_TIMEOUT 建立"""
+        return cls(
+            timeout=float(os.getenv('WAIT_TIMEOUT', '10')),
+            settle_ms=float(os.getenv('WAIT_SETTLE_MS', '150')),
+            poll_interval=float(os.getenv('WAIT_POLL_INTERVAL', '0.05')),
+            submit_timeout=float(os.getenv('BOOKING_SUBMIT_TIMEOUT', '15')),
+        )
+
+    def _wait_for(self, driver, token: str, accepted: Tuple[str, ...], timeout: float) -> bool:
+        try:
+            WebDriverWait(driver, timeout, poll_frequency=self.poll_interval).until(
+                lambda d: d.execute_script(_OBSERVER_STATUS_JS, token, self.settle_ms, TIMETABLE_ID) in accepted
+            )
+            return True
+        except TimeoutException:
+            return False
+
+    def settled(self, driver, timeout: float = None) -> bool:
+        """
+        等待目前頁面載入完成且時間表在 settle_ms 內沒有變動
+
+        Returns:
+            bool: 是否在時限內穩定
+        """
+        token = driver.execute_script(_ARM_OBSERVER_JS, TIMETABLE_ID)
+        return self._wait_for(driver, token, ('reloaded', 'mutated', 'settled'),
+                              self.timeout if timeout is None else timeout)
+
+    def after(self, driver, action: Callable[[], object], timeout: float = None) -> bool:
+        """
+        執行 action（例如點擊上下午按鈕）並等待時間表重新載入或內容變動後穩定
+
+        Returns:
+            bool: 時間表是否在時限內更新；False 表示頁面沒有反應
+        """
+        token = driver.execute_script(_ARM_OBSERVER_JS, TIMETABLE_ID)
+        action()
+        return self._wait_for(driver, token, ('reloaded', 'mutated'), self.timeout if timeout is None else timeout)
+
+    def replaced(self, driver, action: Callable[[], object], timeout: float = None) -> bool:
+        """
+        執行 action（例如切換建築物下拉選單）後，先等舊的時間表被替換（元素失效，或同一頁面內
+        內容有變動），再等新的時間表穩定；與 submission() 相同，先確認舊頁面已離開再等待穩定，
+        避免表單尚未送出時看到安靜的舊頁面就返回
+
+        Returns:
+            bool: 時間表是否在時限內更新並穩定；False 表示頁面沒有反應
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.time() + timeout
+        try:
+            old_root = driver.find_element(By.ID, TIMETABLE_ID)
+        except WebDriverException:
+            old_root = None
+        token = driver.execute_script(_ARM_OBSERVER_JS, TIMETABLE_ID)
+        action()
+
+        def left_old_page(d):
+            if old_root is not None and EC.staleness_of(old_root)(d):
+                return True
+            return d.execute_script(_OBSERVER_STATUS_JS, token, 0, TIMETABLE_ID) in ('reloaded', 'mutated')
+
+        try:
+            WebDriverWait(driver, timeout, poll_frequency=self.poll_interval).until(left_old_page)
+        except TimeoutException:
+            return False
+        return self.settled(driver, max(0.1, deadline - time.time()))
+
+    def submission(self, driver, element) -> bool:
+        """
+        等待表單送出：按鈕所在頁面被替換後，再等待新頁面載入完成
+
+        Returns:
+            bool: 是否在 submit_timeout 內完成
+        """
+        deadline = time.time() + self.submit_timeout
+        try:
+            WebDriverWait(driver, self.submit_timeout, poll_frequency=self.poll_interval).until(
+                EC.staleness_of(element)
+            )
+            WebDriverWait(driver, max(0.1, deadline - time.time()), poll_frequency=self.poll_interval).until(
+                lambda d: d.execute_script('return document.readyState') == 'complete'
+            )
+            return True
+        except (TimeoutException, WebDriverException):
+            return False
+
+
+def is_timetable_page(html_content: str) -> bool:
+    """頁面原始碼是否包含會議室時間表（取代以頁面長度判斷是否完整）"""
+    return bool(html_content) and f'id="{TIMETABLE_ID}"' in html_content
@@ -0,0 +1,9 @@
+"""
+WSGI 進入點
+
+正式環境：gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+from booking_meeting_room_api import create_app
+
+app = create_app()